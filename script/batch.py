@@ -0,0 +1,100 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from rsa1024 import NttRsa1024_32b
+from rsa2048 import NttRsa2048_32b
+from rsa3072 import NttRsa3072_32b
+from rsa4096 import NttRsa4096_32b
+
+# Batch exponentiation on a process pool
+#
+# NttRsa is pure Python and holds the GIL for a whole exponentiation, so
+# independent exponentiations are spread over worker processes. Every worker
+# builds its NttRsa instance once and keeps the contexts of the moduli in
+# the LRU cache of the instance. The jobs are grouped by modulus and sent in
+# chunks, so a worker reuses the context within a chunk and small jobs are
+# not dominated by the IPC.
+
+PARAMS = {
+    1024: NttRsa1024_32b,
+    2048: NttRsa2048_32b,
+    3072: NttRsa3072_32b,
+    4096: NttRsa4096_32b,
+}
+
+# NttRsa instance of the worker process, built by _init_worker
+_worker_rsa = None
+
+
+def _init_worker(bits: int, kernel: str):
+    global _worker_rsa
+    _worker_rsa = PARAMS[bits](kernel=kernel)
+
+
+def _run_chunk(p: int, jobs: list[tuple[int, int, int]],
+               sliding: bool) -> list[tuple[int, int]]:
+    """Exponentiate the jobs [(index, a, e)] under modulus p in the worker
+    Output: [(index, a^e mod p)]
+    """
+    ctx = _worker_rsa.context(p)
+    return [(i, _worker_rsa.expmod(a % p, e, ctx, sliding=sliding))
+            for i, a, e in jobs]
+
+
+def chunks(jobs: list[tuple[int, int, int]], chunksize: int = None,
+           workers: int = 1) -> list[tuple]:
+    """Group the jobs [(a, e, p)] by modulus and split the groups into
+    chunks of at most chunksize jobs, by default every group is spread over
+    about 4 chunks per worker
+    Output: [(p, [(index, a, e)])]
+    """
+    groups = {}
+    for i, (a, e, p) in enumerate(jobs):
+        groups.setdefault(p, []).append((i, a, e))
+    ret = []
+    for p, group in groups.items():
+        size = chunksize
+        if size is None:
+            size = max(1, -(-len(group) // (4 * workers)))
+        for start in range(0, len(group), size):
+            ret.append((p, group[start:start + size]))
+    return ret
+
+
+def expmod_batch(jobs: list[tuple[int, int, int]], workers: int = None,
+                 bits: int = 2048, kernel: str = "reference",
+                 sliding: bool = False, chunksize: int = None) -> list[int]:
+    """Exponentiate independent jobs on a process pool
+    Input: jobs [(a, e, p)], number of worker processes (default all cores),
+           the parameter set and kernel of the workers, sliding window for
+           non-secret exponents, jobs per chunk (default spreads every
+           modulus over about 4 chunks per worker)
+    Output: [a^e mod p] in the order of jobs
+
+    With one worker the jobs run in the calling process.
+    """
+    if bits not in PARAMS:
+        raise ValueError(f"Unsupported parameter set {bits}")
+    for _, _, p in jobs:
+        if p % 2 == 0 or p.bit_length() > bits:
+            raise ValueError(f"Modulus must be odd and at most {bits} bits")
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    results = [None] * len(jobs)
+    tasks = chunks(jobs, chunksize, workers)
+    if workers == 1:
+        _init_worker(bits, kernel)
+        for p, chunk in tasks:
+            for i, c in _run_chunk(p, chunk, sliding):
+                results[i] = c
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(bits, kernel)) as pool:
+        futures = [pool.submit(_run_chunk, p, chunk, sliding)
+                   for p, chunk in tasks]
+        for future in futures:
+            for i, c in future.result():
+                results[i] = c
+    return results
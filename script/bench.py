@@ -0,0 +1,250 @@
+"""Benchmark of the NTT-RSA pipeline stages
+
+  python bench.py run [-o result.json] [--params 1024,2048] [--stages ...]
+                      [--kernels reference,fermat,lazy,merged,karatsuba]
+  python bench.py compare baseline.json result.json [--threshold 0.1]
+
+run measures every stage of every available parameter set and backend,
+together with the references: pow() and the Python integer Montgomery
+multiplication, and schoolbook multiplication of the chunk polynomials.
+compare exits with 1 when a stage is slower than the baseline by more than
+threshold.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from rsa1024 import NttRsa1024_32b
+from rsa2048 import NttRsa2048_32b, NttRsa2048_64b
+from rsa3072 import NttRsa3072_32b
+from rsa4096 import NttRsa4096_32b
+
+try:
+    import numpy
+except ImportError:  # numpy is optional
+    numpy = None
+
+PARAMS = {
+    "1024": NttRsa1024_32b,
+    "2048": NttRsa2048_32b,
+    "2048-64b": NttRsa2048_64b,
+    "3072": NttRsa3072_32b,
+    "4096": NttRsa4096_32b,
+}
+
+STAGES = [
+    "chunk", "dechunk", "ntt_q1", "ntt_q2", "intt_q1", "intt_q2",
+    "mul_q1", "mul_q2", "crts", "lower", "square", "multiply",
+    "expmod_public", "expmod_private",
+    # references
+    "pow_public", "pow_private", "int_multiply", "schoolbook_polymul",
+]
+
+
+def schoolbook_polymul(a: list[int], b: list[int]) -> list[int]:
+    """Product of two chunk polynomials modulo x^n - 1, the reference of
+    ntt, mul and intt on both channels followed by crts"""
+    n = len(a)
+    c = [0] * n
+    for i, x in enumerate(a):
+        if x == 0:
+            continue
+        for j, y in enumerate(b):
+            c[(i + j) % n] += x * y
+    return c
+
+
+def configurations(params: list[str], backends: list[str],
+                   kernels: list[str] = ("reference",)) -> list[tuple]:
+    """(name, NttRsa instance) of every available parameter set, backend
+    and kernel, the kernels only apply to the python backend. Backends and
+    kernels a parameter set does not list are skipped."""
+    ret = []
+    for param in params:
+        cls = PARAMS[param]
+        for backend in backends:
+            if backend not in cls.backends:
+                continue
+            if backend == "numpy":
+                if numpy is not None:
+                    ret.append((f"{param}/numpy", cls(backend="numpy")))
+                continue
+            for kernel in kernels:
+                if kernel not in cls.kernels:
+                    continue
+                name = f"{param}/{backend}"
+                if kernel != "reference":
+                    name += f"/{kernel}"
+                ret.append((name, cls(backend=backend, kernel=kernel)))
+    return ret
+
+
+def workloads(rsa, stages: list[str]) -> dict:
+    """Build a function without argument for each stage"""
+    p = random.getrandbits(rsa.N - 1) | 1
+    rsa.setp(p)
+    a = random.getrandbits(rsa.N - 1) % p
+    b = random.getrandbits(rsa.N - 1) % p
+    d = random.getrandbits(rsa.N - 1)
+    e = 65537
+    rinv = pow(1 << rsa.N, -1, p)
+    al = rsa.chunk(a)
+    bl = rsa.chunk(b)
+    lowl = rsa.lower(al)
+    ah1 = rsa.ntt_q1(al)
+    ah2 = rsa.ntt_q2(al)
+    bh1 = rsa.ntt_q1(bl)
+    bh2 = rsa.ntt_q2(bl)
+    cl1 = rsa.intt_q1(ah1)
+    cl2 = rsa.intt_q2(ah2)
+
+    funcs = {
+        "chunk": lambda: rsa.chunk(a),
+        "dechunk": lambda: rsa.dechunk(al),
+        "ntt_q1": lambda: rsa.ntt_q1(al),
+        "ntt_q2": lambda: rsa.ntt_q2(al),
+        "intt_q1": lambda: rsa.intt_q1(ah1),
+        "intt_q2": lambda: rsa.intt_q2(ah2),
+        "mul_q1": lambda: rsa.mul_q1(ah1, bh1),
+        "mul_q2": lambda: rsa.mul_q2(ah2, bh2),
+        "crts": lambda: rsa.crts(cl1, cl2),
+        "lower": lambda: rsa.lower(lowl),
+        "square": lambda: rsa.square(a),
+        "multiply": lambda: rsa.multiply(a, b),
+        "expmod_public": lambda: rsa.expmod_public(a, e),
+        "expmod_private": lambda: rsa.expmod_private(a, d),
+        "pow_public": lambda: pow(a, e, p),
+        "pow_private": lambda: pow(a, d, p),
+        "int_multiply": lambda: a * b * rinv % p,
+        "schoolbook_polymul": lambda: schoolbook_polymul(al, bl),
+    }
+    return {stage: funcs[stage] for stage in stages}
+
+
+def measure(func, repeat: int, min_time: float) -> dict:
+    """Median seconds per call of func
+    The number of calls per repeat grows until a repeat takes min_time"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    times.sort()
+    return {"seconds": times[len(times) // 2], "number": number,
+            "repeat": repeat}
+
+
+def run(params: list[str], backends: list[str], stages: list[str],
+        repeat: int = 3, min_time: float = 0.2, log=None,
+        kernels: list[str] = ("reference",)) -> dict:
+    """Run the benchmark, return the result to be saved as JSON"""
+    result = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    for name, rsa in configurations(params, backends, kernels):
+        entry = result["results"][name] = {}
+        for stage, func in workloads(rsa, stages).items():
+            entry[stage] = measure(func, repeat, min_time)
+            if log is not None:
+                log(f"{name:16} {stage:20} {entry[stage]['seconds'] * 1e6:14.1f} us")
+    return result
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[tuple]:
+    """Compare two results of run
+    Output: list of (name, stage, baseline seconds, current seconds, ratio)
+            of the stages slower than baseline by more than threshold
+    """
+    regressions = []
+    for name, stages in current["results"].items():
+        base_stages = baseline["results"].get(name, {})
+        for stage, cur in stages.items():
+            base = base_stages.get(stage)
+            if base is None:
+                continue
+            ratio = cur["seconds"] / base["seconds"]
+            if ratio > 1 + threshold:
+                regressions.append(
+                    (name, stage, base["seconds"], cur["seconds"], ratio))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark of NTT-RSA stages")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="run the benchmark")
+    p_run.add_argument("-o", "--output", help="write result JSON to file")
+    p_run.add_argument("--params", default=",".join(PARAMS),
+                       help="comma separated parameter sets")
+    p_run.add_argument("--backends", default="python,numpy",
+                       help="comma separated backends")
+    p_run.add_argument("--kernels", default="reference",
+                       help="comma separated kernels of the python backend")
+    p_run.add_argument("--stages", default=",".join(STAGES),
+                       help="comma separated stages")
+    p_run.add_argument("--repeat", type=int, default=3)
+    p_run.add_argument("--min-time", type=float, default=0.2,
+                       help="minimum seconds of each repeat")
+    p_run.add_argument("--baseline", help="compare with baseline JSON")
+    p_run.add_argument("--threshold", type=float, default=0.1)
+
+    p_cmp = sub.add_parser("compare", help="compare result with baseline")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument("--threshold", type=float, default=0.1,
+                       help="allowed slowdown, 0.1 is 10%%")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        for stage in args.stages.split(","):
+            if stage not in STAGES:
+                parser.error(f"unknown stage {stage}")
+        current = run(args.params.split(","), args.backends.split(","),
+                      args.stages.split(","), args.repeat, args.min_time,
+                      log=lambda line: print(line, file=sys.stderr),
+                      kernels=args.kernels.split(","))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(current, f, indent=2)
+        else:
+            json.dump(current, sys.stdout, indent=2)
+            print()
+        if args.baseline is None:
+            return 0
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+
+    regressions = compare(baseline, current, args.threshold)
+    for name, stage, base, cur, ratio in regressions:
+        print(f"REGRESSION {name} {stage}: {base * 1e6:.1f} us -> "
+              f"{cur * 1e6:.1f} us ({ratio:.2f}x)", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
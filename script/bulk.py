@@ -0,0 +1,189 @@
+"""Bulk RSA transform of a file of 256-byte blocks
+
+  python bulk.py public key.json input output [--batch 16] [--workers N]
+  python bulk.py private key.json input output [--kernel lazy]
+
+Every block of the input is a big-endian number less than the modulus, the
+output has the transformed blocks at the same offsets. The key file is JSON
+with integer fields: n and e for public, n and d, or the primes p and q, for
+private. Private uses the CRT on 1024-bit halves when p and q are given.
+The files are read and written through mmap, the blocks flow through a
+generator pipeline in batches, optionally on worker processes, and the
+throughput is reported on stderr.
+"""
+import argparse
+import collections
+import json
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from rsa1024 import NttRsa1024_32b
+from rsa2048 import NttRsa2048_32b
+
+BLOCK = 256
+
+
+def load_key(path: str) -> dict:
+    """Read the key file, derive the CRT fields from p and q"""
+    with open(path) as f:
+        key = json.load(f)
+    if "n" not in key:
+        raise ValueError("Key file has no modulus n")
+    if key["n"].bit_length() != BLOCK * 8:
+        raise ValueError(f"Modulus must be {BLOCK * 8} bits")
+    if "p" in key and "q" in key:
+        p, q = key["p"], key["q"]
+        if p * q != key["n"]:
+            raise ValueError("p * q does not match n")
+        if "d" not in key:
+            key["d"] = pow(key["e"], -1, (p - 1) * (q - 1))
+        key.setdefault("dp", key["d"] % (p - 1))
+        key.setdefault("dq", key["d"] % (q - 1))
+        key.setdefault("qinv", pow(q, -1, p))
+    return key
+
+
+class Transformer:
+    """
+    RSA public or private operation on blocks, owns the NttRsa instances
+    """
+
+    def __init__(self, key: dict, op: str, kernel: str = "reference"):
+        self.n = key["n"]
+        self.op = op
+        if op == "public":
+            self.e = key["e"]
+            self.rsa = NttRsa2048_32b(kernel=kernel)
+            self.rsa.setp(self.n)
+        elif op == "private" and "p" in key:
+            self.crt = (key["p"], key["q"], key["dp"], key["dq"], key["qinv"])
+            self.rsa = NttRsa1024_32b(kernel=kernel)
+        elif op == "private":
+            self.d = key["d"]
+            self.crt = None
+            self.rsa = NttRsa2048_32b(kernel=kernel)
+            self.rsa.setp(self.n)
+        else:
+            raise ValueError(f"Unknown operation {op}")
+
+    def transform(self, x: int) -> int:
+        if x >= self.n:
+            raise ValueError("Block is not less than the modulus")
+        if self.op == "public":
+            return self.rsa.expmod_public(x, self.e)
+        if self.crt is not None:
+            return self.rsa.decrypt_crt(x, *self.crt)
+        return self.rsa.expmod_private(x, self.d)
+
+    def batch(self, data: bytes) -> bytes:
+        """Transform the concatenated blocks of data"""
+        return b"".join(
+            self.transform(int.from_bytes(data[i:i + BLOCK], "big"))
+            .to_bytes(BLOCK, "big")
+            for i in range(0, len(data), BLOCK))
+
+
+def read_batches(buf, batch: int):
+    """Yield the input in pieces of batch blocks"""
+    step = batch * BLOCK
+    for start in range(0, len(buf), step):
+        yield bytes(buf[start:start + step])
+
+
+# Transformer of the worker process, built by _init_worker
+_worker = None
+
+
+def _init_worker(key: dict, op: str, kernel: str):
+    global _worker
+    _worker = Transformer(key, op, kernel)
+
+
+def _run_batch(data: bytes) -> bytes:
+    return _worker.batch(data)
+
+
+def transform_batches(batches, key: dict, op: str, workers: int = 1,
+                      kernel: str = "reference"):
+    """Transform the batches in order, on worker processes if workers > 1
+    At most 2 batches per worker are in flight, so a large input is not
+    read ahead of the output."""
+    if workers <= 1:
+        transformer = Transformer(key, op, kernel)
+        for data in batches:
+            yield transformer.batch(data)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(key, op, kernel)) as pool:
+        pending = collections.deque()
+        for data in batches:
+            pending.append(pool.submit(_run_batch, data))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run(key: dict, op: str, input_path: str, output_path: str,
+        batch: int = 16, workers: int = 1, kernel: str = "reference",
+        log=None) -> dict:
+    """Transform input_path to output_path
+    Output: {"blocks", "seconds", "blocks_per_second"}
+    """
+    size = os.path.getsize(input_path)
+    if size % BLOCK:
+        raise ValueError(f"Input size {size} is not a multiple of {BLOCK}")
+    start = time.perf_counter()
+    with open(input_path, "rb") as fin, open(output_path, "w+b") as fout:
+        if size == 0:
+            return {"blocks": 0, "seconds": 0.0, "blocks_per_second": 0.0}
+        fout.truncate(size)
+        with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as src, \
+                mmap.mmap(fout.fileno(), size) as dst:
+            offset = 0
+            for data in transform_batches(read_batches(src, batch), key, op,
+                                          workers, kernel):
+                dst[offset:offset + len(data)] = data
+                offset += len(data)
+                if log is not None:
+                    elapsed = time.perf_counter() - start
+                    log(f"{offset // BLOCK}/{size // BLOCK} blocks, "
+                        f"{offset // BLOCK / elapsed:.2f} blocks/s")
+            dst.flush()
+    seconds = time.perf_counter() - start
+    blocks = size // BLOCK
+    return {"blocks": blocks, "seconds": seconds,
+            "blocks_per_second": blocks / seconds}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk RSA transform of 256-byte blocks")
+    parser.add_argument("op", choices=["public", "private"])
+    parser.add_argument("key", help="JSON key file")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--batch", type=int, default=16,
+                        help="blocks per batch")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes")
+    parser.add_argument("--kernel", default="reference",
+                        help="NTT kernel: reference, fermat, lazy, merged or karatsuba")
+    parser.add_argument("--quiet", action="store_true",
+                        help="only report the final throughput")
+    args = parser.parse_args(argv)
+
+    key = load_key(args.key)
+    log = None if args.quiet else (lambda line: print(line, file=sys.stderr))
+    result = run(key, args.op, args.input, args.output, args.batch,
+                 args.workers, args.kernel, log)
+    print(f"{result['blocks']} blocks in {result['seconds']:.2f} s, "
+          f"{result['blocks_per_second']:.2f} blocks/s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+
+from nttrsa import NttRsa, NttRsaContext
+
+# Binary files of the parameter tables and the modulus contexts of NttRsa
+#
+# Header: magic, then 32-bit words kind, N, l, len_poly, q1, q2, ntt_len and
+# the CRC32 of the body. The body is 32-bit words in the native byte order,
+# recorded in the magic:
+#   params: ntt_index, zetas1, zetas2
+#   context: p, r, rsqr as N/32 words each, then pl, ph1, ph2, pm1, pm2,
+#            rsqrh (two channels) as len_poly words each
+# Loading maps the file and casts the body to 'I' memoryviews without
+# copying, the stages index them like lists. Processes mapping the same
+# file share its pages.
+
+MAGIC = b"NTTRSA" + (b"le" if sys.byteorder == "little" else b"be")
+HEADER = struct.Struct("=8s8I")
+KIND_PARAMS = 1
+KIND_CONTEXT = 2
+CONTEXT_POLYS = ("pl", "ph1", "ph2", "pm1", "pm2")
+
+
+def _header(rsa: NttRsa, kind: int, crc: int) -> bytes:
+    return HEADER.pack(MAGIC, kind, rsa.N, rsa.l, rsa.len_poly, rsa.q1,
+                       rsa.q2, getattr(rsa, "ntt_len", 0), crc)
+
+
+def _words(l) -> bytes:
+    return array("I", [int(x) for x in l]).tobytes()
+
+
+def _write(rsa: NttRsa, kind: int, body: bytes, path: str):
+    with open(path, "wb") as f:
+        f.write(_header(rsa, kind, zlib.crc32(body)))
+        f.write(body)
+
+
+def _map(rsa: NttRsa, kind: int, path: str, verify: bool) -> memoryview:
+    """Map the file, check the header against rsa
+    Output: the body as 'I' memoryview"""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mm) < HEADER.size:
+        raise ValueError(f"{path} is too short")
+    magic, *fields, crc = HEADER.unpack_from(mm)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a NttRsa file of this byte order")
+    expect = [kind, rsa.N, rsa.l, rsa.len_poly, rsa.q1, rsa.q2,
+              getattr(rsa, "ntt_len", 0)]
+    if fields != expect:
+        raise ValueError(f"{path} does not match the parameter set")
+    body = memoryview(mm)[HEADER.size:]
+    if verify and zlib.crc32(body) != crc:
+        raise ValueError(f"{path} checksum mismatch")
+    return body.cast("I")
+
+
+def save_params(rsa: NttRsa, path: str):
+    """Save the twiddle tables of rsa"""
+    _write(rsa, KIND_PARAMS,
+           _words(rsa.ntt_index) + _words(rsa.zetas1) + _words(rsa.zetas2),
+           path)
+
+
+def load_params(rsa: NttRsa, path: str, verify: bool = True) -> NttRsa:
+    """Replace the twiddle tables of rsa by the mapped tables of path, the
+    schedules of the backend are derived again"""
+    words = _map(rsa, KIND_PARAMS, path, verify)
+    half = rsa.ntt_len // 2
+    if len(words) != half + 2 * rsa.ntt_len:
+        raise ValueError(f"{path} has a wrong size")
+    rsa.ntt_index = words[:half]
+    rsa.zetas1 = words[half:half + rsa.ntt_len]
+    rsa.zetas2 = words[half + rsa.ntt_len:]
+    rsa.set_backend(rsa.backend, rsa.kernel)
+    return rsa
+
+
+def save_context(rsa: NttRsa, ctx: NttRsaContext, path: str):
+    """Save the precomputed fields of the modulus context ctx"""
+    nbytes = rsa.N // 8
+    body = b"".join([ctx.p.to_bytes(nbytes, sys.byteorder),
+                     ctx.r.to_bytes(nbytes, sys.byteorder),
+                     ctx.rsqr.to_bytes(nbytes, sys.byteorder)] +
+                    [_words(getattr(ctx, name)) for name in CONTEXT_POLYS] +
+                    [_words(h) for h in ctx.rsqrh])
+    _write(rsa, KIND_CONTEXT, body, path)
+
+
+def load_context(rsa: NttRsa, path: str, verify: bool = True) -> NttRsaContext:
+    """Load the context saved by save_context without any precomputation,
+    and put it into the context cache of rsa"""
+    words = _map(rsa, KIND_CONTEXT, path, verify)
+    nwords = rsa.N // 32
+    n = rsa.len_poly
+    if len(words) != 3 * nwords + 7 * n:
+        raise ValueError(f"{path} has a wrong size")
+    raw = words.cast("B")
+    nbytes = rsa.N // 8
+    ctx = NttRsaContext.__new__(NttRsaContext)
+    ctx.p, ctx.r, ctx.rsqr = (
+        int.from_bytes(raw[i * nbytes:(i + 1) * nbytes], sys.byteorder)
+        for i in range(3))
+    offset = 3 * nwords
+    for name in CONTEXT_POLYS:
+        setattr(ctx, name, words[offset:offset + n])
+        offset += n
+    ctx.rsqrh = (words[offset:offset + n], words[offset + n:offset + 2 * n])
+    return rsa.add_context(ctx)
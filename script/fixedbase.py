@@ -0,0 +1,122 @@
+from nttrsa import NttRsa, NttRsaContext
+from stagetrace import operation
+
+# Largest number of teeth of the comb, the table has 2^teeth entries per block
+TEETH_MAX = 10
+
+
+class FixedBase:
+    """
+    Lim-Lee comb exponentiation of a fixed base a under one modulus
+
+    The exponent of teeth * cols bits is written as teeth rows of cols bits,
+    e = sum(e_i << (i * cols)), and the columns are split into blocks of
+    rows bits. Block j has a table of the 2^teeth products
+      T[j][u] = prod(a^(2^(i * cols + j * rows)) for the set bits i of u)
+    in NTT form, then an exponentiation takes rows - 1 squares and
+    cols = blocks * rows multiplies, instead of about nbits squares.
+
+    More teeth or blocks trade table memory for speed, the memory is
+    estimated with 32-bit words and capped by max_bytes. The tables are
+    stored as compact 32-bit arrays unless compact is False, lists take
+    about 6 times the memory but are faster to read.
+    """
+
+    def __init__(self, rsa: NttRsa, a: int, ctx: NttRsaContext = None,
+                 teeth: int = None, blocks: int = 1, nbits: int = None,
+                 max_bytes: int = 1 << 20, compact: bool = True):
+        self.rsa = rsa
+        self.ctx = rsa.get_ctx(ctx)
+        self.nbits = nbits if nbits is not None else rsa.N
+        # NTT form of one number, two channels of len_poly words
+        self.entry_bytes = 2 * rsa.len_poly * 4
+        if blocks < 1:
+            raise ValueError("Number of blocks must be positive")
+        if teeth is None:
+            teeth = 1
+            while teeth < TEETH_MAX and \
+                    blocks << (teeth + 1) <= max_bytes // self.entry_bytes:
+                teeth += 1
+        if not 1 <= teeth <= TEETH_MAX:
+            raise ValueError(f"Number of teeth must be in 1..{TEETH_MAX}")
+        self.teeth = teeth
+        self.blocks = blocks
+        self.compact = compact
+        self.rows = -(-self.nbits // (teeth * blocks))
+        self.cols = self.rows * blocks
+        if self.table_bytes() > max_bytes:
+            raise ValueError(f"Table of {self.table_bytes()} bytes exceeds "
+                             f"max_bytes {max_bytes}")
+        self.tables = self._build(a)
+
+    # The op counter and tracer of rsa record the operations of FixedBase
+    @property
+    def counter(self):
+        return self.rsa.counter
+
+    @property
+    def tracer(self):
+        return self.rsa.tracer
+
+    def table_bytes(self) -> int:
+        """Estimated memory of the tables"""
+        return self.blocks * (1 << self.teeth) * self.entry_bytes
+
+    def _build(self, a: int) -> list[list[tuple]]:
+        """Build the table of every block, one squaring chain of a gives the
+        powers a^(2^k) needed by the tables"""
+        rsa, ctx = self.rsa, self.ctx
+        offsets = {i * self.cols + j * self.rows
+                   for i in range(self.teeth) for j in range(self.blocks)}
+        powers = {}
+        c = rsa.to_mont(a, ctx)
+        for k in range(max(offsets) + 1):
+            if k > 0:
+                c = rsa.square_chunked(c, ctx)
+            if k in offsets:
+                powers[k] = c
+
+        one = rsa.transform(rsa.chunk(ctx.r))
+        tables = []
+        for j in range(self.blocks):
+            table = [None] * (1 << self.teeth)
+            tableh = [one] + [None] * ((1 << self.teeth) - 1)
+            for i in range(self.teeth):
+                bit = 1 << i
+                table[bit] = powers[i * self.cols + j * self.rows]
+                tableh[bit] = rsa.transform(table[bit])
+                for u in range(1, bit):
+                    table[bit | u] = rsa.multiply_ntt(table[u], tableh[bit], ctx)
+                    tableh[bit | u] = rsa.transform(table[bit | u])
+            if self.compact:
+                tableh = [tuple(rsa.compact(h) for h in bh) for bh in tableh]
+            tables.append(tableh)
+        return tables
+
+    @operation("expmod_fixed_base")
+    def expmod(self, e: int, stats: dict = None) -> int:
+        """Exponentiate the fixed base a to the power of e under modulo p
+        Input: e, at most teeth * cols bits
+        Output: c = a^e mod p
+
+        The operations only depend on the table shape, not on e.
+        """
+        rsa, ctx = self.rsa, self.ctx
+        if e < 0 or e.bit_length() > self.teeth * self.cols:
+            raise ValueError(f"Exponent e must be positive and at most "
+                             f"{self.teeth * self.cols} bits")
+
+        c = rsa.chunk(ctx.r)
+        for t in range(self.rows - 1, -1, -1):
+            if t < self.rows - 1:
+                c = rsa.square_chunked(c, ctx)
+            for j, tableh in enumerate(self.tables):
+                k = j * self.rows + t
+                u = 0
+                for i in range(self.teeth):
+                    u |= ((e >> (i * self.cols + k)) & 1) << i
+                c = rsa.multiply_ntt(c, tableh[u], ctx)
+
+        if stats is not None:
+            stats.update(squares=self.rows - 1, multiplies=self.cols + 1)
+        return rsa.from_mont(c, ctx)
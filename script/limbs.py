@@ -0,0 +1,65 @@
+# Conversion between integers and l-bit limbs
+#
+# Python integers are stored in 30-bit digits, operations on a wide integer
+# cost time proportional to its size. chunk and dechunk work on blocks of 8
+# limbs, which are whole l bytes: one wide shift or one to_bytes per block
+# instead of one per limb, the limbs of a block are split on a small
+# integer.
+
+# Limbs per block, 8 limbs of l bits are l bytes
+BLOCK = 8
+
+
+def chunk(a: int, l: int, n: int) -> list[int]:
+    """n limbs of l bits of a, limb [0] near LSB, bits above n * l dropped"""
+    mask = (1 << l) - 1
+    width = BLOCK * l
+    block_mask = (1 << width) - 1
+    shifts = range(0, width, l)
+    blocks = []
+    for _ in range((n + BLOCK - 1) // BLOCK):
+        blocks.append(a & block_mask)
+        a >>= width
+    ret = [b >> s & mask for b in blocks for s in shifts]
+    return ret if len(ret) == n else ret[:n]
+
+
+def dechunk(xs: list[int], l: int) -> int:
+    """Sum of xs[i] << (i * l), the limbs may exceed l bits up to 2^(9l-1)
+    Each block of 8 limbs is summed on a small integer, the blocks overlap
+    their neighbour, so even and odd blocks are joined as bytes separately.
+    """
+    n = len(xs)
+    if n % BLOCK:
+        xs = list(xs) + [0] * (BLOCK - n % BLOCK)
+    s1, s2, s3, s4, s5, s6, s7 = range(l, BLOCK * l, l)
+    it = iter(xs)
+    blocks = [x0 + (x1 << s1) + (x2 << s2) + (x3 << s3) + (x4 << s4) +
+              (x5 << s5) + (x6 << s6) + (x7 << s7)
+              for x0, x1, x2, x3, x4, x5, x6, x7 in zip(*[it] * BLOCK)]
+    # A block is less than 2^(16l), two blocks of l bytes
+    even = b"".join([b.to_bytes(2 * l, "little") for b in blocks[0::2]])
+    odd = b"".join([b.to_bytes(2 * l, "little") for b in blocks[1::2]])
+    return int.from_bytes(even, "little") + \
+        (int.from_bytes(odd, "little") << (BLOCK * l))
+
+
+def lower(xs: list[int], l: int, N: int) -> list[int]:
+    """Carry normalized limbs of the first N bits of sum xs[i] << (i * l)"""
+    ret = [0] * len(xs)
+    mask = (1 << l) - 1
+    n_chunks = (N + l - 1) // l
+    remain = 0
+    for i in range(n_chunks):
+        s = xs[i] + remain
+        ret[i] = s & mask
+        remain = s >> l
+    # Modulo final block to N bits
+    ret[n_chunks - 1] &= (1 << (N - (n_chunks - 1) * l)) - 1
+    return ret
+
+
+def crts(xs: list[int], ys: list[int], q1: int, q2: int, q1inv: int) -> list[int]:
+    """Element-wise CRT of xs mod q1 and ys mod q2, q1inv = q1^-1 mod q2
+    x + ((y - x) q1inv mod q2) q1 is already less than q1 q2"""
+    return [x + (y - x) * q1inv % q2 * q1 for x, y in zip(xs, ys)]
@@ -0,0 +1,101 @@
+from nttrsa import NttRsa, NttRsaContext
+
+
+class MontInt:
+    """
+    Number a under the modulus p of a context, kept in montgomery form
+
+    The value is chunk(aR mod p), converted in once when created and out
+    only by int(), so a chain of *, square and ** costs no conversion.
+    The NTT form is computed the first time the value is a multiplicand
+    and cached, the values are immutable. Operands share p and the key size
+    N of R = 2^N, a MontInt never equals a plain int.
+
+      x = MontInt(rsa, a, ctx)
+      y = x * x ** 3 * b    # b is converted in
+      int(y)                # a^4 b mod p
+    """
+
+    __slots__ = ("rsa", "ctx", "cl", "_h")
+
+    def __init__(self, rsa: NttRsa, a: int, ctx: NttRsaContext = None):
+        self.rsa = rsa
+        self.ctx = rsa.get_ctx(ctx)
+        self.cl = rsa.to_mont(a % self.ctx.p, self.ctx)
+        self._h = None
+
+    @classmethod
+    def from_chunked(cls, rsa: NttRsa, cl: list[int],
+                     ctx: NttRsaContext = None) -> "MontInt":
+        """Wrap a montgomery form chunk(aR mod p) without conversion"""
+        x = cls.__new__(cls)
+        x.rsa = rsa
+        x.ctx = rsa.get_ctx(ctx)
+        x.cl = cl
+        x._h = None
+        return x
+
+    def ntt(self) -> tuple:
+        """Cached NTT form of the value, the multiplicand of multiply_ntt"""
+        if self._h is None:
+            self._h = self.rsa.transform(self.cl)
+        return self._h
+
+    def _coerce(self, other) -> "MontInt":
+        if isinstance(other, MontInt):
+            if other.ctx.p != self.ctx.p:
+                raise ValueError("MontInt of different moduli")
+            if other.rsa.N != self.rsa.N:
+                # R = 2^N differs, the montgomery forms do not mix
+                raise ValueError("MontInt of different key sizes")
+            return other
+        if isinstance(other, int):
+            return MontInt(self.rsa, other, self.ctx)
+        return NotImplemented
+
+    def __mul__(self, other) -> "MontInt":
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        if other is self:
+            return self.square()
+        h = other.ntt() if other.rsa is self.rsa else self.rsa.transform(other.cl)
+        cl = self.rsa.multiply_ntt(self.cl, h, self.ctx)
+        return MontInt.from_chunked(self.rsa, cl, self.ctx)
+
+    __rmul__ = __mul__
+
+    def square(self) -> "MontInt":
+        return MontInt.from_chunked(
+            self.rsa, self.rsa.square_chunked(self.cl, self.ctx), self.ctx)
+
+    def pow(self, e: int, window: int = None, sliding: bool = False) -> "MontInt":
+        """self^e, fixed window unless sliding is set for a non-secret e,
+        see NttRsa.expmod"""
+        cl = self.rsa.expmod_chunked(self.cl, e, self.ctx, window, sliding)
+        return MontInt.from_chunked(self.rsa, cl, self.ctx)
+
+    def __pow__(self, e: int, mod=None) -> "MontInt":
+        if mod is not None:
+            return NotImplemented
+        return self.pow(e)
+
+    def __int__(self) -> int:
+        return self.rsa.from_mont(self.cl, self.ctx)
+
+    def __eq__(self, other) -> bool:
+        # Residues of the same modulus, not equal to a plain int. Montgomery
+        # form is reduced below p, the chunks are canonical under the same N
+        if not isinstance(other, MontInt):
+            return NotImplemented
+        if other.ctx.p != self.ctx.p:
+            return False
+        if other.rsa.N != self.rsa.N:
+            return int(other) == int(self)
+        return list(other.cl) == list(self.cl)
+
+    def __hash__(self) -> int:
+        return hash((self.ctx.p, int(self)))
+
+    def __repr__(self) -> str:
+        return f"MontInt({int(self)}, p={self.ctx.p:#x})"
@@ -0,0 +1,701 @@
+from nttrsa import NttRsa, CT_BFU, GS_BFU, CT_BFU_fermat, GS_BFU_fermat, FERMAT_Q
+from opcount import OPS
+
+try:
+    import nttnumpy
+except ImportError:  # numpy is optional
+    nttnumpy = None
+
+# Largest value of a 32-bit word, bounds the coefficients and their products
+# with a twiddle in kernel "lazy"
+WORD_MAX = (1 << 32) - 1
+
+
+class NttRsa32b(NttRsa):
+    """
+    NTT-RSA kernels on 32-bit processor, shared by all the parameter sets
+
+    The polynomial of len_poly = 3 * ntt_len coefficients is split by the NTT
+    into ntt_len blocks of degree 2 modulo x^3 - omega.
+    Subclass provides the tables ntt_index, zetas1 and zetas2, then calls
+    set_backend.
+
+    backend selects the implementation of the NTT kernels:
+      "python": the reference implementation with CT_BFU/GS_BFU
+      "numpy": whole-array stages in nttnumpy, bit-identical to "python"
+    kernel selects the transforms of the "python" backend:
+      "reference": ntt/intt
+      "fermat": ntt_fermat/intt_fermat for q2 = 65537, reference for q1
+      "lazy": ntt_lazy/intt_lazy, reduce only when a word would overflow,
+              reference for a prime whose reduced products overflow a word
+              (q2 = 65537 with 32-bit words)
+      "merged": ntt_merged/intt_merged, two rounds per pass with radix-4
+                butterflies over precomputed twiddle lists
+      "karatsuba": reference transforms, basemul_karatsuba multiplies the
+                   blocks with 6 coefficient multiplications instead of 9
+    All of them are bit-identical.
+    backends and kernels list the ones a parameter set supports.
+    """
+
+    backends = ("python", "numpy")
+    kernels = ("reference", "fermat", "lazy", "merged", "karatsuba")
+
+    def __init__(self, N: int, l: int, len_poly: int, q1: int, q2: int,
+                 ntt_len: int):
+        super().__init__(N, l, len_poly, q1, q2)
+        assert len_poly == 3 * ntt_len, "len_poly must be 3 * ntt_len"
+        self.ntt_len = ntt_len
+        self.ntt_round = ntt_len.bit_length() - 1
+        # distance of the butterflies in each NTT round
+        self.ntt_dists = [len_poly >> (i + 1) for i in range(self.ntt_round)]
+        self.ntt_index = None
+        self.zetas1 = None
+        self.zetas2 = None
+        self.backend = "python"
+        self.kernel = "reference"
+        self.np1 = None
+        self.np2 = None
+        # log2 of the zetas2 twiddles that are power of 2, for kernel "fermat"
+        self.zetas2_shift = None
+        # rounds that reduce their input, {q: (ntt, intt)}, for kernel "lazy"
+        self.lazy_schedule = None
+        # assert every coefficient and product fits word_max in kernel "lazy"
+        self.check_bounds = False
+        # largest value of a word in kernel "lazy"
+        self.word_max = WORD_MAX
+        # passes of the transforms, {q: (ntt, intt)}, for kernel "merged"
+        self.merged_schedule = None
+        # omega of x^3 - omega of every block, for the base multiplication
+        self.omegas1 = None
+        self.omegas2 = None
+
+    def set_backend(self, backend: str, kernel: str = "reference"):
+        if backend not in self.backends:
+            raise ValueError(f"Unsupported backend {backend}")
+        if kernel not in self.kernels:
+            raise ValueError(f"Unsupported kernel {kernel}")
+        if backend == "numpy" and kernel != "reference":
+            raise ValueError("numpy backend only runs the reference kernel")
+        if kernel == "fermat":
+            if self.q2 != FERMAT_Q:
+                raise ValueError(f"fermat kernel requires q2 = {FERMAT_Q}")
+            pow2 = {pow(2, s, FERMAT_Q): s for s in range(32)}
+            self.zetas2_shift = [pow2.get(z) for z in self.zetas2]
+        if kernel == "lazy":
+            self.lazy_schedule = {q: self.get_lazy_schedule(q)
+                                  for q in (self.q1, self.q2) if self.lazy_fits(q)}
+        if kernel == "merged":
+            self.merged_schedule = {
+                self.q1: self.get_merged_schedule(self.zetas1),
+                self.q2: self.get_merged_schedule(self.zetas2)}
+        self.omegas1 = self.get_omegas(self.zetas1)
+        self.omegas2 = self.get_omegas(self.zetas2)
+        self.backend = backend
+        self.kernel = kernel
+        self.stage_ops_cache = {}
+        self.np1 = None
+        self.np2 = None
+        if backend == "numpy":
+            if nttnumpy is None:
+                raise ImportError("numpy backend requires numpy")
+            self.np1 = nttnumpy.NttNumpy(self.ntt_index, self.zetas1, self.q1,
+                                         self.len_poly, self.ntt_len)
+            self.np2 = nttnumpy.NttNumpy(self.ntt_index, self.zetas2, self.q2,
+                                         self.len_poly, self.ntt_len)
+
+    def get_omegas(self, zetas: list[int]) -> list[int]:
+        """omega of x^3 - omega of every block after the NTT"""
+        half = self.ntt_len // 2
+        return [zetas[(self.ntt_index[i // 2] + (half if i % 2 == 1 else 0))
+                      % self.ntt_len] for i in range(self.ntt_len)]
+
+    def crt(self, x: int, y: int) -> int:
+        """Chinese Remainder Theorem
+        Input: x mod q1, y mod q2
+        Output: z such that z mod q1 = x, z mod q2 = y"""
+        return x + (((y-x) * self.q1inv % self.q2) * self.q1) % self.q
+
+    def crts(self, xs: list[int], ys: list[int], out: list[int] = None) -> list[int]:
+        if self.backend == "numpy":
+            return self.store(nttnumpy.crts(xs, ys, self.q1, self.q2).tolist(), out)
+        return super().crts(xs, ys, out)
+
+    def crts_batch(self, xss: list[list[int]], yss: list[list[int]]) -> list[list[int]]:
+        if self.backend == "numpy":
+            return nttnumpy.crts(xss, yss, self.q1, self.q2)
+        return super().crts_batch(xss, yss)
+
+    def lower_batch(self, ls: list[list[int]]) -> list[list[int]]:
+        if self.backend == "numpy":
+            return nttnumpy.lower(ls, self.l, self.N)
+        return super().lower_batch(ls)
+
+    def chunk_batch(self, a_s: list[int]) -> list[list[int]]:
+        if self.backend == "numpy":
+            return nttnumpy.chunk(a_s, self.l, self.len_poly)
+        return super().chunk_batch(a_s)
+
+    def dechunk_batch(self, ls: list[list[int]]) -> list[int]:
+        if self.backend == "numpy":
+            return nttnumpy.dechunk(ls, self.l)
+        return super().dechunk_batch(ls)
+
+    def ntt(self, l: list[int], zetas: list[int], q: int) -> list[int]:
+        assert len(
+            l) == self.len_poly, f"NTT: Length of input list must be {self.len_poly}"
+        assert len(
+            zetas) == self.ntt_len, f"NTT: Length of zetas must be {self.ntt_len}"
+
+        for i, dist in enumerate(self.ntt_dists):
+            zeta_idx = -1 * (1 << i)
+            for start in range(0, len(l), dist * 2):
+                zeta = zetas[self.ntt_index[zeta_idx]]
+                zeta_idx += 1
+
+                for j in range(dist):
+                    # print(f"NTT: {start + j} {start + j + dist} {zeta}")
+                    l[start + j], l[start + j + dist] = CT_BFU(
+                        l[start + j], l[start + j + dist], zeta, q)
+        return l
+
+    def intt(self, l: list[int], zetas: list[int], q: int) -> list[int]:
+        assert len(
+            l) == self.len_poly, f"intt: Length of input list must be {self.len_poly}"
+        assert len(
+            zetas) == self.ntt_len, f"intt: Length of zetas must be {self.ntt_len}"
+
+        for i, dist in enumerate(reversed(self.ntt_dists)):
+            zeta_idx = -1 * (1 << (self.ntt_round - 1 - i))
+            for start in range(0, len(l), dist * 2):
+                idx = self.ntt_index[zeta_idx]
+                zeta = zetas[self.ntt_len - idx]
+                zeta_idx += 1
+
+                for j in range(dist):
+                    # print(f"INTT: {start + j} {start + j + dist} {zeta}")
+                    l[start + j], l[start + j + dist] = GS_BFU(
+                        l[start + j], l[start + j + dist], zeta, q)
+        return l
+
+    def ntt_fermat(self, l: list[int]) -> list[int]:
+        """NTT under q2 = 65537, multiplication by power of 2 twiddles are
+        shifts, reduction is low 16 bits minus high bits"""
+        assert len(
+            l) == self.len_poly, f"NTT: Length of input list must be {self.len_poly}"
+
+        for i, dist in enumerate(self.ntt_dists):
+            zeta_idx = -1 * (1 << i)
+            for start in range(0, len(l), dist * 2):
+                idx = self.ntt_index[zeta_idx]
+                zeta = self.zetas2[idx]
+                s = self.zetas2_shift[idx]
+                zeta_idx += 1
+
+                for j in range(dist):
+                    l[start + j], l[start + j + dist] = CT_BFU_fermat(
+                        l[start + j], l[start + j + dist], zeta, s)
+        return l
+
+    def intt_fermat(self, l: list[int]) -> list[int]:
+        """Inverse NTT under q2 = 65537, see ntt_fermat"""
+        assert len(
+            l) == self.len_poly, f"intt: Length of input list must be {self.len_poly}"
+
+        for i, dist in enumerate(reversed(self.ntt_dists)):
+            zeta_idx = -1 * (1 << (self.ntt_round - 1 - i))
+            for start in range(0, len(l), dist * 2):
+                idx = self.ntt_len - self.ntt_index[zeta_idx]
+                zeta = self.zetas2[idx]
+                s = self.zetas2_shift[idx]
+                zeta_idx += 1
+
+                for j in range(dist):
+                    l[start + j], l[start + j + dist] = GS_BFU_fermat(
+                        l[start + j], l[start + j + dist], zeta, s)
+        return l
+
+    def fermat_report(self) -> dict:
+        """Report the twiddles of each round of the fermat kernel
+        Output: {"ntt": [(dist, shift, general), ...], "intt": [...]}
+        shift/general are the number of blocks whose twiddle is a power of 2
+        or falls back to general multiplication"""
+        pow2 = {pow(2, s, FERMAT_Q) for s in range(32)}
+        report = {"ntt": [], "intt": []}
+        for i, dist in enumerate(self.ntt_dists):
+            idx = self.ntt_index[len(self.ntt_index) - (1 << i):]
+            shift = sum(self.zetas2[k] in pow2 for k in idx)
+            report["ntt"].append((dist, shift, len(idx) - shift))
+        for i, dist in enumerate(reversed(self.ntt_dists)):
+            idx = self.ntt_index[len(self.ntt_index) - (1 << (self.ntt_round - 1 - i)):]
+            shift = sum(self.zetas2[self.ntt_len - k] in pow2 for k in idx)
+            report["intt"].append((dist, shift, len(idx) - shift))
+        return report
+
+    def lazy_fits(self, q: int) -> bool:
+        """Whether the butterflies of ntt_lazy/intt_lazy under q fit word_max
+        on reduced input, the largest product is (a - b + q) w < (2q - 1) q"""
+        return (2 * q - 1) * (q - 1) <= self.word_max
+
+    def get_lazy_schedule(self, q: int) -> tuple:
+        """Decide which rounds of ntt_lazy/intt_lazy reduce their input
+        Input coefficients are less than q, a round reduces its input only
+        when an output or a product with a twiddle, at most q - 1, would
+        exceed word_max.
+        Output: (ntt, intt) list of bool for each round, intt has one more
+                for the scaling by ntt_len^-1
+        """
+        if not self.lazy_fits(q):
+            raise ValueError(f"Products under {q} overflow word_max")
+        # CT: bw is multiplied, a + bw mod q, a - bw mod q + q grow by q
+        bound = q - 1
+        ntt = []
+        for _ in self.ntt_dists:
+            reduce = (bound * (q - 1) > self.word_max or
+                      bound + q > self.word_max)
+            if reduce:
+                bound = q - 1
+            ntt.append(reduce)
+            bound += q
+
+        # GS: a + b doubles, (a - b + kq) w is multiplied, kq is the
+        # multiple of q above every coefficient, see intt_lazy
+        bound = q - 1
+        kq = q
+        intt = []
+        for _ in self.ntt_dists:
+            reduce = (2 * bound > self.word_max or
+                      (bound + kq) * (q - 1) > self.word_max)
+            if reduce:
+                bound, kq = q - 1, q
+            intt.append(reduce)
+            bound, kq = 2 * bound, 2 * kq
+        intt.append(bound * (q - 1) > self.word_max)
+        return ntt, intt
+
+    def ntt_lazy(self, l: list[int], zetas: list[int], q: int) -> list[int]:
+        """NTT with lazy reduction, same output as ntt
+        Only the product b * zeta is reduced, the sums grow by q every
+        round and are reduced once at the end."""
+        assert len(
+            l) == self.len_poly, f"NTT: Length of input list must be {self.len_poly}"
+
+        buf = l
+        for i, dist in enumerate(self.ntt_dists):
+            if self.lazy_schedule[q][0][i]:
+                l = [x % q for x in l]
+            zeta_idx = -1 * (1 << i)
+            for start in range(0, len(l), dist * 2):
+                zeta = zetas[self.ntt_index[zeta_idx]]
+                zeta_idx += 1
+                if self.check_bounds:
+                    self.assert_bounds(
+                        [x * zeta for x in l[start + dist:start + 2 * dist]],
+                        f"ntt round {i} product")
+
+                for j in range(dist):
+                    a = l[start + j]
+                    m = l[start + j + dist] * zeta % q
+                    l[start + j] = a + m
+                    l[start + j + dist] = a - m + q
+            if self.check_bounds:
+                self.assert_bounds(l, f"ntt round {i}")
+        buf[:] = [x % q for x in l]
+        return buf
+
+    def intt_lazy(self, l: list[int], zetas: list[int], q: int) -> list[int]:
+        """Inverse NTT with lazy reduction, same output as intt
+        The halving of every round is replaced by one multiplication with
+        ntt_len^-1 at the end."""
+        assert len(
+            l) == self.len_poly, f"intt: Length of input list must be {self.len_poly}"
+
+        # bound is a multiple of q above every coefficient, keeps a - b + bound
+        # positive without changing its value modulo q
+        buf = l
+        bound = q
+        for i, dist in enumerate(reversed(self.ntt_dists)):
+            if self.lazy_schedule[q][1][i]:
+                l = [x % q for x in l]
+                bound = q
+            zeta_idx = -1 * (1 << (self.ntt_round - 1 - i))
+            for start in range(0, len(l), dist * 2):
+                idx = self.ntt_index[zeta_idx]
+                zeta = zetas[self.ntt_len - idx]
+                zeta_idx += 1
+                if self.check_bounds:
+                    self.assert_bounds(
+                        [(a - b + bound) * zeta for a, b in
+                         zip(l[start:start + dist], l[start + dist:start + 2 * dist])],
+                        f"intt round {i} product")
+
+                for j in range(dist):
+                    a = l[start + j]
+                    b = l[start + j + dist]
+                    l[start + j] = a + b
+                    l[start + j + dist] = (a - b + bound) * zeta % q
+            bound = max(2 * bound, q)
+            if self.check_bounds:
+                self.assert_bounds(l, f"intt round {i}")
+        if self.lazy_schedule[q][1][-1]:
+            l = [x % q for x in l]
+        ninv = pow(self.ntt_len, -1, q)
+        if self.check_bounds:
+            self.assert_bounds([x * ninv for x in l], "intt scaling")
+        buf[:] = [x * ninv % q for x in l]
+        return buf
+
+    def assert_bounds(self, l: list[int], stage: str):
+        """Assert the coefficients or products l fit word_max"""
+        for x in l:
+            assert 0 <= x <= self.word_max, \
+                f"{stage}: {x} overflows {self.word_max.bit_length()} bits"
+
+    def get_merged_schedule(self, zetas: list[int]) -> tuple:
+        """Merge the rounds of ntt/intt in pairs
+        Output: (ntt, intt) list of passes (radix, dist, twiddles)
+          radix is 4 for two merged rounds, 2 for the odd last round.
+          dist is the distance of the first round in the pass.
+          twiddles is flattened by block, 3 twiddles per radix-4 block
+          (z0, z1, z2) and 1 per radix-2 block for the odd last round.
+        """
+        def ntt_zetas(i):
+            n = 1 << i
+            return [zetas[k] for k in self.ntt_index[len(self.ntt_index) - n:]]
+
+        def intt_zetas(i):
+            n = 1 << (self.ntt_round - 1 - i)
+            return [zetas[self.ntt_len - k]
+                    for k in self.ntt_index[len(self.ntt_index) - n:]]
+
+        ntt = []
+        for i in range(0, self.ntt_round, 2):
+            if i + 1 == self.ntt_round:
+                ntt.append((2, self.ntt_dists[i], ntt_zetas(i)))
+                break
+            # block b of round i splits into block 2b, 2b+1 of round i+1
+            z0 = ntt_zetas(i)
+            z1 = ntt_zetas(i + 1)
+            twiddles = []
+            for b, z in enumerate(z0):
+                twiddles += [z, z1[2*b], z1[2*b + 1]]
+            ntt.append((4, self.ntt_dists[i], twiddles))
+
+        intt = []
+        dists = self.ntt_dists[::-1]
+        for i in range(0, self.ntt_round, 2):
+            if i + 1 == self.ntt_round:
+                intt.append((2, dists[i], intt_zetas(i)))
+                break
+            # block 2b, 2b+1 of round i merge into block b of round i+1
+            w1 = intt_zetas(i)
+            w0 = intt_zetas(i + 1)
+            twiddles = []
+            for b, w in enumerate(w0):
+                twiddles += [w, w1[2*b], w1[2*b + 1]]
+            intt.append((4, dists[i], twiddles))
+        return ntt, intt
+
+    def ntt_merged(self, l: list[int], q: int) -> list[int]:
+        """NTT with two rounds per pass, same output as ntt"""
+        assert len(
+            l) == self.len_poly, f"NTT: Length of input list must be {self.len_poly}"
+
+        for radix, dist, twiddles in self.merged_schedule[q][0]:
+            if radix == 2:
+                for b, zeta in enumerate(twiddles):
+                    start = b * dist * 2
+                    for j in range(start, start + dist):
+                        l[j], l[j + dist] = CT_BFU(l[j], l[j + dist], zeta, q)
+                continue
+
+            half = dist // 2
+            for b in range(len(twiddles) // 3):
+                z0, z1, z2 = twiddles[3*b:3*b + 3]
+                start = b * dist * 2
+                for j in range(start, start + half):
+                    x0, x2 = CT_BFU(l[j], l[j + dist], z0, q)
+                    x1, x3 = CT_BFU(l[j + half], l[j + dist + half], z0, q)
+                    l[j], l[j + half] = CT_BFU(x0, x1, z1, q)
+                    l[j + dist], l[j + dist + half] = CT_BFU(x2, x3, z2, q)
+        return l
+
+    def intt_merged(self, l: list[int], q: int) -> list[int]:
+        """Inverse NTT with two rounds per pass, same output as intt"""
+        assert len(
+            l) == self.len_poly, f"intt: Length of input list must be {self.len_poly}"
+
+        for radix, dist, twiddles in self.merged_schedule[q][1]:
+            if radix == 2:
+                for b, zeta in enumerate(twiddles):
+                    start = b * dist * 2
+                    for j in range(start, start + dist):
+                        l[j], l[j + dist] = GS_BFU(l[j], l[j + dist], zeta, q)
+                continue
+
+            for b in range(len(twiddles) // 3):
+                w0, w1, w2 = twiddles[3*b:3*b + 3]
+                start = b * dist * 4
+                for j in range(start, start + dist):
+                    x0, x1 = GS_BFU(l[j], l[j + dist], w1, q)
+                    x2, x3 = GS_BFU(l[j + 2*dist], l[j + 3*dist], w2, q)
+                    l[j], l[j + 2*dist] = GS_BFU(x0, x2, w0, q)
+                    l[j + dist], l[j + 3*dist] = GS_BFU(x1, x3, w0, q)
+        return l
+
+    def basemul(self, a: list[int], b: list[int], omegas: list[int], q: int,
+                c: list[int]) -> list[int]:
+        """Multiply a, b block by block under x^3 - omegas[i] into c
+        c may be a or b, every block is read before it is written
+        """
+        ia = iter(a)
+        ib = iter(b)
+        # Multiply a2 x^2 + a1 x + a0 with b2 x^2 + b1 x + b0 Under NTT domain of x^3 - omega
+        # c0 = a0b0 + omega(a2b1 +a1b2)
+        # c1 = a1b0 + a0b1 + omega(a2b2)
+        # c2 = a2b0 + a1b1 + a0b2
+        for i, omega, a0, a1, a2, b0, b1, b2 in zip(
+                range(0, self.len_poly, 3), omegas, ia, ia, ia, ib, ib, ib):
+            c[i] = (a0 * b0 + omega * (a2 * b1 + a1 * b2)) % q
+            c[i + 1] = (a1 * b0 + a0 * b1 + omega * (a2 * b2)) % q
+            c[i + 2] = (a2 * b0 + a1 * b1 + a0 * b2) % q
+        return c
+
+    def basemul_karatsuba(self, a: list[int], b: list[int], omegas: list[int],
+                          q: int, c: list[int]) -> list[int]:
+        """Same as basemul, with 3-term Karatsuba: 6 coefficient
+        multiplications instead of 9, paid with 9 more additions
+        """
+        ia = iter(a)
+        ib = iter(b)
+        # p0 = a0b0, p1 = a1b1, p2 = a2b2
+        # c0 = p0 + omega((a1 + a2)(b1 + b2) - p1 - p2)
+        # c1 = (a0 + a1)(b0 + b1) - p0 - p1 + omega(p2)
+        # c2 = (a0 + a2)(b0 + b2) - p0 - p2 + p1
+        # the differences are the cross products, never negative
+        for i, omega, a0, a1, a2, b0, b1, b2 in zip(
+                range(0, self.len_poly, 3), omegas, ia, ia, ia, ib, ib, ib):
+            p0 = a0 * b0
+            p1 = a1 * b1
+            p2 = a2 * b2
+            c[i] = (p0 + omega * ((a1 + a2) * (b1 + b2) - p1 - p2)) % q
+            c[i + 1] = ((a0 + a1) * (b0 + b1) - p0 - p1 + omega * p2) % q
+            c[i + 2] = ((a0 + a2) * (b0 + b2) - p0 - p2 + p1) % q
+        return c
+
+    def basesqr(self, a: list[int], omegas: list[int], q: int,
+                c: list[int]) -> list[int]:
+        """Square a block by block under x^3 - omegas[i] into c, c may be a
+        The cross products appear twice, 6 multiplications instead of 9
+        """
+        ia = iter(a)
+        # c0 = a0^2 + omega(2a1a2)
+        # c1 = 2a0a1 + omega(a2^2)
+        # c2 = 2a0a2 + a1^2
+        for i, omega, a0, a1, a2 in zip(
+                range(0, self.len_poly, 3), omegas, ia, ia, ia):
+            a0x2 = a0 + a0
+            c[i] = (a0 * a0 + omega * ((a1 + a1) * a2)) % q
+            c[i + 1] = (a0x2 * a1 + omega * (a2 * a2)) % q
+            c[i + 2] = (a0x2 * a2 + a1 * a1) % q
+        return c
+
+    def stage_ops(self, stage: str) -> dict:
+        """Primitive operations of a stage, ntt, intt and basemul count the
+        q1 and q2 channels of the selected kernel together"""
+        if stage not in ("ntt", "intt", "basemul", "basesqr"):
+            return super().stage_ops(stage)
+        ops = dict.fromkeys(OPS, 0)
+        for q in (self.q1, self.q2):
+            for op, n in self.kernel_ops(stage, q).items():
+                ops[op] += n
+        return ops
+
+    def kernel_ops(self, stage: str, q: int) -> dict:
+        """Primitive operations of one ntt, intt or basemul under q"""
+        n = self.len_poly
+        bfu = self.ntt_round * n // 2  # number of butterflies
+        kernel = self.kernel
+        if kernel == "fermat" and q != self.q2:
+            kernel = "reference"
+        if kernel == "lazy" and q not in self.lazy_schedule:
+            kernel = "reference"
+        ops = dict.fromkeys(OPS, 0)
+
+        if stage == "basemul" and kernel == "karatsuba":
+            # 8 multiplications, 6 additions of the operands, 9 additions
+            # and subtractions and 3 reductions for each block
+            ops.update(mul=8 * self.ntt_len, add=15 * self.ntt_len,
+                       mod=3 * self.ntt_len, load=2 * n, store=n)
+            return ops
+        if stage == "basemul":
+            # 11 multiplications and 3 reductions for each block
+            ops.update(mul=11 * self.ntt_len, add=6 * self.ntt_len,
+                       mod=3 * self.ntt_len, load=2 * n, store=n)
+            return ops
+        if stage == "basesqr":
+            # 8 multiplications, 2 doublings, 3 additions and 3 reductions
+            # for each block
+            ops.update(mul=8 * self.ntt_len, add=5 * self.ntt_len,
+                       mod=3 * self.ntt_len, load=n, store=n)
+            return ops
+
+        if kernel == "fermat":
+            report = self.fermat_report()[stage]
+            general = sum(dist * g for dist, _, g in report)
+            if stage == "ntt":
+                # shift and fold, or multiply and fold, then add/sub with
+                # conditional correction
+                ops.update(mul=general, shift=2 * bfu + general, add=6 * bfu)
+            else:
+                # as ntt, plus the division by 2 of both outputs by 2^31
+                ops.update(mul=general, shift=4 * bfu + general,
+                           add=10 * bfu)
+            ops.update(load=2 * bfu, store=2 * bfu)
+            return ops
+
+        # coefficients reduced within the transform by kernel "lazy"
+        reduced = 0
+        if kernel == "lazy":
+            reduced = n * sum(self.lazy_schedule[q][stage == "intt"])
+        if stage == "ntt":
+            if kernel == "lazy":
+                ops.update(mul=bfu, mod=bfu + n + reduced, add=3 * bfu)
+            else:
+                ops.update(mul=bfu, mod=3 * bfu, add=2 * bfu)
+        else:
+            if kernel == "lazy":
+                # n^-1 scaling at the end instead of halving
+                ops.update(mul=bfu + n, mod=bfu + n + reduced, add=3 * bfu)
+            else:
+                # halving: parity test, conditional add q, shift
+                ops.update(mul=bfu, mod=2 * bfu, add=4 * bfu, shift=2 * bfu)
+
+        if kernel == "merged":
+            # every pass loads and stores each coefficient once
+            passes = (self.ntt_round + 1) // 2
+            ops.update(load=passes * n, store=passes * n)
+        elif kernel == "lazy":
+            ops.update(load=2 * bfu + n + reduced, store=2 * bfu + n + reduced)
+        else:
+            ops.update(load=2 * bfu, store=2 * bfu)
+        return ops
+
+    def ntt_q1(self, l: list[int], out: list[int] = None) -> list[int]:
+        """Run NTT on the integer list, in place on out if given"""
+        if self.backend == "numpy":
+            return self.np1.ntt(l)
+        l = self.load(l, out)
+        if self.kernel == "lazy" and self.q1 in self.lazy_schedule:
+            return self.ntt_lazy(l, self.zetas1, self.q1)
+        if self.kernel == "merged":
+            return self.ntt_merged(l, self.q1)
+        return self.ntt(l, self.zetas1, self.q1)
+
+    def intt_q1(self, l: list[int], out: list[int] = None) -> list[int]:
+        """Run Inverse NTT on the integer list, in place on out if given"""
+        if self.backend == "numpy":
+            return self.np1.intt(l)
+        l = self.load(l, out)
+        if self.kernel == "lazy" and self.q1 in self.lazy_schedule:
+            return self.intt_lazy(l, self.zetas1, self.q1)
+        if self.kernel == "merged":
+            return self.intt_merged(l, self.q1)
+        return self.intt(l, self.zetas1, self.q1)
+
+    def ntt_q2(self, l: list[int], out: list[int] = None) -> list[int]:
+        """Run NTT on the integer list, in place on out if given"""
+        if self.backend == "numpy":
+            return self.np2.ntt(l)
+        l = self.load(l, out)
+        if self.kernel == "fermat":
+            return self.ntt_fermat(l)
+        if self.kernel == "lazy" and self.q2 in self.lazy_schedule:
+            return self.ntt_lazy(l, self.zetas2, self.q2)
+        if self.kernel == "merged":
+            return self.ntt_merged(l, self.q2)
+        return self.ntt(l, self.zetas2, self.q2)
+
+    def intt_q2(self, l: list[int], out: list[int] = None) -> list[int]:
+        """Run Inverse NTT on the integer list, in place on out if given"""
+        if self.backend == "numpy":
+            return self.np2.intt(l)
+        l = self.load(l, out)
+        if self.kernel == "fermat":
+            return self.intt_fermat(l)
+        if self.kernel == "lazy" and self.q2 in self.lazy_schedule:
+            return self.intt_lazy(l, self.zetas2, self.q2)
+        if self.kernel == "merged":
+            return self.intt_merged(l, self.q2)
+        return self.intt(l, self.zetas2, self.q2)
+
+    def ntt_q1_batch(self, ls: list[list[int]]) -> list[list[int]]:
+        if self.backend == "numpy":
+            return self.np1.ntt(ls)
+        return super().ntt_q1_batch(ls)
+
+    def intt_q1_batch(self, ls: list[list[int]]) -> list[list[int]]:
+        if self.backend == "numpy":
+            return self.np1.intt(ls)
+        return super().intt_q1_batch(ls)
+
+    def mul_q1_batch(self, a_s: list[list[int]], bs: list[list[int]]) -> list[list[int]]:
+        if self.backend == "numpy":
+            return self.np1.mul(a_s, bs)
+        return super().mul_q1_batch(a_s, bs)
+
+    def mul_q1(self, a: list[int], b: list[int],
+               out: list[int] = None) -> list[int]:
+        if self.backend == "numpy":
+            return self.np1.mul(a, b)
+        assert len(
+            a) == self.len_poly, f"mul_q1: Length of input list a must be {self.len_poly}"
+        assert len(
+            b) == self.len_poly, f"mul_q1: Length of input list b must be {self.len_poly}"
+        c = out if out is not None else [0] * self.len_poly
+        if self.kernel == "karatsuba":
+            return self.basemul_karatsuba(a, b, self.omegas1, self.q1, c)
+        return self.basemul(a, b, self.omegas1, self.q1, c)
+
+    def sqr_q1(self, a: list[int], out: list[int] = None) -> list[int]:
+        if self.backend == "numpy":
+            return self.np1.sqr(a)
+        assert len(
+            a) == self.len_poly, f"sqr_q1: Length of input list a must be {self.len_poly}"
+        c = out if out is not None else [0] * self.len_poly
+        return self.basesqr(a, self.omegas1, self.q1, c)
+
+    def ntt_q2_batch(self, ls: list[list[int]]) -> list[list[int]]:
+        if self.backend == "numpy":
+            return self.np2.ntt(ls)
+        return super().ntt_q2_batch(ls)
+
+    def intt_q2_batch(self, ls: list[list[int]]) -> list[list[int]]:
+        if self.backend == "numpy":
+            return self.np2.intt(ls)
+        return super().intt_q2_batch(ls)
+
+    def mul_q2_batch(self, a_s: list[list[int]], bs: list[list[int]]) -> list[list[int]]:
+        if self.backend == "numpy":
+            return self.np2.mul(a_s, bs)
+        return super().mul_q2_batch(a_s, bs)
+
+    def mul_q2(self, a: list[int], b: list[int],
+               out: list[int] = None) -> list[int]:
+        if self.backend == "numpy":
+            return self.np2.mul(a, b)
+        assert len(
+            a) == self.len_poly, f"mul_q2: Length of input list a must be {self.len_poly}"
+        assert len(
+            b) == self.len_poly, f"mul_q2: Length of input list b must be {self.len_poly}"
+        c = out if out is not None else [0] * self.len_poly
+        if self.kernel == "karatsuba":
+            return self.basemul_karatsuba(a, b, self.omegas2, self.q2, c)
+        return self.basemul(a, b, self.omegas2, self.q2, c)
+
+    def sqr_q2(self, a: list[int], out: list[int] = None) -> list[int]:
+        if self.backend == "numpy":
+            return self.np2.sqr(a)
+        assert len(
+            a) == self.len_poly, f"sqr_q2: Length of input list a must be {self.len_poly}"
+        c = out if out is not None else [0] * self.len_poly
+        return self.basesqr(a, self.omegas2, self.q2, c)
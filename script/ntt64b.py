@@ -0,0 +1,86 @@
+from ntt32b import NttRsa32b
+from nttplan import plan, ring_for
+from opcount import OPS
+
+# NTT primes of the single prime family, the smallest one above the bound
+# n_chunks * (2^l - 1)^2 of the coefficients is used:
+#   998244353 = 119 * 2^23 + 1, 30 bits, up to RSA-2048 on 11-bit chunks,
+#     187 * (2^11 - 1)^2 < 998244353, which q1 q2 = 12289 * 65537 holds
+#     together in NttRsa2048_32b
+#   2013265921 = 15 * 2^27 + 1, 31 bits, up to RSA-4096
+# The coefficients fit 32-bit words, their products 64-bit words. The
+# smaller prime is also faster in Python, reduced values are single digit
+# integers of CPython.
+PRIMES = (998244353, 2013265921)
+
+
+def prime_for(N: int, l: int = 11, ntt_len: int = 2) -> int:
+    """Smallest prime of PRIMES that holds the products of N-bit numbers"""
+    n_chunks = (N + l - 1) // l
+    for q in PRIMES:
+        if n_chunks * ((1 << l) - 1) ** 2 < q and (q - 1) % ntt_len == 0:
+            return q
+    raise ValueError(f"No prime for {N}-bit numbers")
+
+
+class NttRsa64b(NttRsa32b):
+    """
+    NTT-RSA with a single NTT prime, for 64-bit processor
+
+    The product is computed under the prime q1 = q alone, by default the
+    smallest of PRIMES that fits N. q2 is 1: the q2 channel is 0 modulo 1,
+    so ntt_q2, intt_q2, mul_q2 and sqr_q2 pass their input through without
+    work, and crts returns the q1 channel. Every Montgomery step runs half
+    the transforms of NttRsa32b and no CRT, at the price of 30 or 31-bit
+    coefficients whose products need 64-bit words.
+
+    The ring is the ring of nttplan.RINGS that fits N, tables are derived
+    by nttplan. The python backend runs every kernel but fermat, the numpy
+    backend is not supported as the base multiplication overflows int64.
+    """
+
+    backends = ("python",)
+    kernels = ("reference", "lazy", "merged", "karatsuba")
+
+    def __init__(self, N: int, backend: str = "python",
+                 kernel: str = "reference", l: int = 11, q: int = None):
+        len_poly, ntt_len = ring_for(N, l)[:2]
+        if q is None:
+            q = prime_for(N, l, ntt_len)
+        tables = plan(N, l, len_poly, ntt_len, q, 1)
+        super().__init__(N, l, len_poly, q, 1, ntt_len)
+        # the products of kernel "lazy" fit 64-bit words
+        self.word_max = (1 << 64) - 1
+        self.ntt_index = tables["ntt_index"]
+        self.zetas1 = tables["zetas1"]
+        self.zetas2 = tables["zetas2"]
+        self.set_backend(backend, kernel)
+
+    def ntt_q2(self, l: list[int], out: list[int] = None) -> list[int]:
+        return l
+
+    def intt_q2(self, l: list[int], out: list[int] = None) -> list[int]:
+        return l
+
+    def mul_q2(self, a: list[int], b: list[int],
+               out: list[int] = None) -> list[int]:
+        return a
+
+    def sqr_q2(self, a: list[int], out: list[int] = None) -> list[int]:
+        return a
+
+    def crts(self, xs: list[int], ys: list[int], out: list[int] = None) -> list[int]:
+        """The product under q1 is the product, written to out if given"""
+        return self.store(xs, out)
+
+    def stage_ops(self, stage: str) -> dict:
+        if stage == "crt":
+            ops = dict.fromkeys(OPS, 0)
+            ops.update(load=self.len_poly, store=self.len_poly)
+            return ops
+        return super().stage_ops(stage)
+
+    def kernel_ops(self, stage: str, q: int) -> dict:
+        if q == self.q2:
+            return dict.fromkeys(OPS, 0)
+        return super().kernel_ops(stage, q)
@@ -0,0 +1,170 @@
+import numpy as np
+
+# NumPy backend of the NTT kernels
+#
+# Every stage of the transform is run as whole-array operations instead of
+# one CT_BFU/GS_BFU call per butterfly. All arrays are int64, the largest
+# intermediate value is omega * 2 * q^2 < 2^63 for q <= 65537.
+# The last axis is the polynomial, any leading axes are treated as a batch.
+
+
+class NttNumpy:
+    """
+    Vectorized NTT, INTT and base multiplication under a single modulus q
+    """
+
+    def __init__(self, ntt_index: list[int], zetas: list[int], q: int,
+                 len_poly: int, ntt_len: int):
+        self.q = q
+        self.len_poly = len_poly
+        self.ntt_len = ntt_len
+        ntt_round = ntt_len.bit_length() - 1
+        half = ntt_len // 2
+        zetas = np.array(zetas, dtype=np.int64)
+        index = np.array(ntt_index, dtype=np.int64)
+
+        # (dist, twiddle of every block) for each stage
+        self.ntt_stages = []
+        for i in range(ntt_round):
+            dist = len_poly >> (i + 1)
+            idx = index[len(index) - (1 << i):]
+            self.ntt_stages.append((dist, zetas[idx].reshape(-1, 1)))
+
+        self.intt_stages = []
+        for i in range(ntt_round):
+            dist = (len_poly // ntt_len) << i
+            idx = index[len(index) - (1 << (ntt_round - 1 - i)):]
+            self.intt_stages.append(
+                (dist, zetas[ntt_len - idx].reshape(-1, 1)))
+
+        # omega of x^3 - omega for every block of the base multiplication
+        omega = [ntt_index[i // 2] + (half if i % 2 == 1 else 0)
+                 for i in range(ntt_len)]
+        self.omegas = zetas[np.array(omega) % ntt_len]
+
+    def ntt(self, l) -> np.ndarray:
+        """Run NTT on the last axis, return a new array"""
+        x = np.array(l, dtype=np.int64)
+        assert x.shape[-1] == self.len_poly, \
+            f"NTT: Length of input list must be {self.len_poly}"
+        q = self.q
+        for dist, zeta in self.ntt_stages:
+            v = x.reshape(x.shape[:-1] + (-1, 2, dist))
+            m = v[..., 1, :] * zeta % q
+            a = v[..., 0, :]
+            lo = (a + m) % q
+            hi = (a - m) % q
+            v[..., 0, :] = lo
+            v[..., 1, :] = hi
+        return x
+
+    def intt(self, l) -> np.ndarray:
+        """Run Inverse NTT on the last axis, return a new array"""
+        x = np.array(l, dtype=np.int64)
+        assert x.shape[-1] == self.len_poly, \
+            f"intt: Length of input list must be {self.len_poly}"
+        q = self.q
+        for dist, zeta in self.intt_stages:
+            v = x.reshape(x.shape[:-1] + (-1, 2, dist))
+            a = v[..., 0, :]
+            b = v[..., 1, :]
+            add = (a + b) % q
+            sub = (a - b) * zeta % q
+            # divide by 2 under modulo q
+            v[..., 0, :] = (add + (add & 1) * q) >> 1
+            v[..., 1, :] = (sub + (sub & 1) * q) >> 1
+        return x
+
+    def mul(self, a, b) -> np.ndarray:
+        """Multiply two NTT form numbers block by block under x^3 - omega"""
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        assert a.shape[-1] == self.len_poly and b.shape[-1] == self.len_poly, \
+            f"mul: Length of input list must be {self.len_poly}"
+        a = a.reshape(a.shape[:-1] + (self.ntt_len, 3))
+        b = b.reshape(b.shape[:-1] + (self.ntt_len, 3))
+        a0, a1, a2 = a[..., 0], a[..., 1], a[..., 2]
+        b0, b1, b2 = b[..., 0], b[..., 1], b[..., 2]
+        omega = self.omegas
+        q = self.q
+
+        c = np.empty(np.broadcast_shapes(a.shape, b.shape), dtype=np.int64)
+        c[..., 0] = (a0 * b0 + omega * (a2 * b1 + a1 * b2)) % q
+        c[..., 1] = (a1 * b0 + a0 * b1 + omega * (a2 * b2)) % q
+        c[..., 2] = (a2 * b0 + a1 * b1 + a0 * b2) % q
+        return c.reshape(c.shape[:-2] + (self.len_poly,))
+
+    def sqr(self, a) -> np.ndarray:
+        """Square an NTT form number block by block under x^3 - omega"""
+        a = np.asarray(a, dtype=np.int64)
+        assert a.shape[-1] == self.len_poly, \
+            f"sqr: Length of input list must be {self.len_poly}"
+        a = a.reshape(a.shape[:-1] + (self.ntt_len, 3))
+        a0, a1, a2 = a[..., 0], a[..., 1], a[..., 2]
+        omega = self.omegas
+        q = self.q
+
+        c = np.empty(a.shape, dtype=np.int64)
+        c[..., 0] = (a0 * a0 + omega * (2 * a1 * a2)) % q
+        c[..., 1] = (2 * a0 * a1 + omega * (a2 * a2)) % q
+        c[..., 2] = (2 * a0 * a2 + a1 * a1) % q
+        return c.reshape(c.shape[:-2] + (self.len_poly,))
+
+
+def crts(xs, ys, q1: int, q2: int) -> np.ndarray:
+    """Vectorized CRT, the same formula as NttRsa2048_32b.crt"""
+    xs = np.asarray(xs, dtype=np.int64)
+    ys = np.asarray(ys, dtype=np.int64)
+    q1inv = pow(q1, -1, q2)
+    return xs + (((ys - xs) * q1inv % q2) * q1) % (q1 * q2)
+
+
+def carry(ls, l: int) -> tuple:
+    """Carry normalize the limbs over the last axis to l bits
+    Every pass splits all limbs into l bits and carry, and adds the carry to
+    the next limb at once, until no carry is left.
+    Output: (limbs, carry out of the last limb)
+    """
+    x = np.array(ls, dtype=np.int64)
+    mask = (1 << l) - 1
+    top = np.zeros(x.shape[:-1], dtype=np.int64)
+    while True:
+        c = x >> l
+        if not c.any():
+            return x, top
+        x &= mask
+        top += c[..., -1]
+        x[..., 1:] += c[..., :-1]
+
+
+def lower(ls, l: int, N: int) -> np.ndarray:
+    """Vectorized NttRsa.lower, the carry runs over the last axis"""
+    x = np.asarray(ls, dtype=np.int64)
+    n_chunks = (N + l - 1) // l
+    ret = np.zeros_like(x)
+    ret[..., :n_chunks], _ = carry(x[..., :n_chunks], l)
+    # Modulo final block to N bits
+    ret[..., n_chunks - 1] &= (1 << (N - (n_chunks - 1) * l)) - 1
+    return ret
+
+
+def chunk(a_s: list[int], l: int, n: int) -> np.ndarray:
+    """Vectorized NttRsa.chunk, the bytes of the integers are unpacked to
+    bits and every l bits are summed as a limb"""
+    nbytes = (n * l + 7) // 8
+    mask = (1 << (n * l)) - 1
+    buf = b"".join([(a & mask).to_bytes(nbytes, "little") for a in a_s])
+    bits = np.unpackbits(np.frombuffer(buf, dtype=np.uint8).reshape(-1, nbytes),
+                         axis=-1, bitorder="little")[:, :n * l]
+    return bits.reshape(-1, n, l).astype(np.int64) @ (1 << np.arange(l, dtype=np.int64))
+
+
+def dechunk(ls, l: int) -> list[int]:
+    """Vectorized NttRsa.dechunk over the leading axis, the carry normalized
+    limbs are packed to bytes"""
+    x, top = carry(np.asarray(ls, dtype=np.int64).reshape(-1, np.shape(ls)[-1]), l)
+    n = x.shape[-1]
+    bits = ((x[..., None] >> np.arange(l)) & 1).astype(np.uint8)
+    buf = np.packbits(bits.reshape(len(x), n * l), axis=-1, bitorder="little")
+    return [int.from_bytes(row.tobytes(), "little") + (int(t) << (n * l))
+            for row, t in zip(buf, top)]
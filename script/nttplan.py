@@ -0,0 +1,118 @@
+from ntt32b import NttRsa32b
+
+# NTT plans of NttRsa32b for any key size
+#
+# A plan derives the tables that NttRsa2048_32b and NttRsa1024_32b write by
+# hand from the ring parameters: the block order ntt_index, the twiddles
+# zetas = root^i mod q, the butterfly distances of every round and the CRT
+# constant q1^-1 mod q2. The ring must hold the product of two N-bit numbers
+# without wrap around, and every coefficient of the product below q1 q2,
+# see the notes of ring.py.
+
+# Rings of ring.py, by the key size they are designed for
+# (len_poly, ntt_len, q1, q2, root1, root2), root2^(ntt_len/32) = 2 mod 65537
+RINGS = {
+    1024: (192, 64, 12289, 65537, 6561, 4080),
+    2048: (384, 128, 12289, 65537, 81, 4938),
+    4096: (768, 256, 25601, 65537, 233, 5574),
+}
+
+
+def bitrev(x: int, bits: int) -> int:
+    return int(format(x, f"0{bits}b")[::-1], 2) if bits else 0
+
+
+def ntt_index(ntt_len: int) -> list[int]:
+    """Twiddle exponents of the blocks, round i uses the last 2^i entries
+    The odd multiples of 2^s in bit reversed order for s = 0, 1, ...,
+    then ntt_len / 2."""
+    half = ntt_len // 2
+    rounds = half.bit_length() - 1
+    ret = []
+    for s in range(rounds):
+        bits = rounds - 1 - s
+        ret += [(2 * bitrev(j, bits) + 1) << s for j in range(1 << bits)]
+    ret.append(half)
+    return ret
+
+
+def root_of_unity(q: int, n: int) -> int:
+    """Smallest root of unity of order n under modulo q"""
+    if (q - 1) % n:
+        raise ValueError(f"No root of unity of order {n} under {q}")
+    for a in range(2, q):
+        w = pow(a, (q - 1) // n, q)
+        if pow(w, n // 2, q) != 1:
+            return w
+    raise ValueError(f"No root of unity of order {n} under {q}")
+
+
+def zetas(root: int, q: int, ntt_len: int) -> list[int]:
+    """Twiddle table root^i mod q for i < ntt_len"""
+    if pow(root, ntt_len, q) != 1 or pow(root, ntt_len // 2, q) == 1:
+        raise ValueError(f"{root} is not a root of unity of order {ntt_len} "
+                         f"under {q}")
+    return [pow(root, i, q) for i in range(ntt_len)]
+
+
+def plan(N: int, l: int, len_poly: int, ntt_len: int, q1: int, q2: int,
+         root1: int = None, root2: int = None) -> dict:
+    """Derive the tables of NttRsa32b
+    Input: key size N, chunk size l, the ring len_poly = 3 * ntt_len,
+           the primes q1, q2 and their roots of unity of order ntt_len,
+           the smallest root if None. q2 = 1 plans a single prime q1, the
+           q2 channel is 0 modulo 1 and its twiddles are 0
+    Output: {"ntt_index", "zetas1", "zetas2", "ntt_dists", "q1inv"}
+    """
+    if N % 32:
+        raise ValueError("N must be a multiple of 32")
+    if ntt_len & (ntt_len - 1) or ntt_len < 2 or len_poly != 3 * ntt_len:
+        raise ValueError("ntt_len must be a power of 2 and len_poly 3 * ntt_len")
+    n_chunks = (N + l - 1) // l
+    if 2 * n_chunks - 1 > len_poly:
+        raise ValueError(f"Ring of {len_poly} chunks is too short for "
+                         f"{N}-bit products")
+    if n_chunks * ((1 << l) - 1) ** 2 >= q1 * q2:
+        raise ValueError(f"Coefficients of {N}-bit products exceed q1 q2")
+    if root1 is None:
+        root1 = root_of_unity(q1, ntt_len)
+    if root2 is None and q2 > 1:
+        root2 = root_of_unity(q2, ntt_len)
+    rounds = ntt_len.bit_length() - 1
+    return {
+        "ntt_index": ntt_index(ntt_len),
+        "zetas1": zetas(root1, q1, ntt_len),
+        "zetas2": zetas(root2, q2, ntt_len) if q2 > 1 else [0] * ntt_len,
+        "ntt_dists": [len_poly >> (i + 1) for i in range(rounds)],
+        "q1inv": pow(q1, -1, q2),
+    }
+
+
+def ring_for(N: int, l: int = 11) -> tuple:
+    """Smallest ring of RINGS that fits N-bit numbers"""
+    for ring in sorted(RINGS.values()):
+        len_poly, _, q1, q2, _, _ = ring
+        n_chunks = (N + l - 1) // l
+        if 2 * n_chunks - 1 <= len_poly and \
+                n_chunks * ((1 << l) - 1) ** 2 < q1 * q2:
+            return ring
+    raise ValueError(f"No ring for {N}-bit numbers")
+
+
+class NttRsaPlan32b(NttRsa32b):
+    """
+    NTT-RSA of any key size on 32-bit processor, the tables are derived by
+    plan on the given ring, or the smallest ring of RINGS that fits N
+    """
+
+    def __init__(self, N: int, ring: tuple = None, l: int = 11,
+                 backend: str = "python", kernel: str = "reference"):
+        if ring is None:
+            ring = ring_for(N, l)
+        len_poly, ntt_len, q1, q2, root1, root2 = ring
+        tables = plan(N, l, len_poly, ntt_len, q1, q2, root1, root2)
+        super().__init__(N, l, len_poly, q1, q2, ntt_len)
+        self.ntt_index = tables["ntt_index"]
+        self.zetas1 = tables["zetas1"]
+        self.zetas2 = tables["zetas2"]
+        self.set_backend(backend, kernel)
@@ -1,4 +1,11 @@
 import math
+import numbers
+import threading
+from array import array
+from collections import OrderedDict
+import limbs
+from opcount import OPS
+from stagetrace import operation
 
 # Helper function of NTT
 
@@ -16,42 +23,187 @@ def GS_BFU(a, b, omega, q):
     return add, sub
 
 
+class NttRsaContext:
+    """
+    Precomputed fields of a modulus p, created by NttRsa.context
+    """
+
+    def __init__(self, rsa: "NttRsa", p: int):
+        self.p = p
+        # derive NTT form of p
+        self.pl = rsa.chunk(p)
+        self.ph1, self.ph2 = rsa.transform(self.pl)  # NTT(chunk(p))
+        # derive NTT form of p^-1 mod 2^N
+        p_inv = pow(p, -1, 1 << rsa.N)
+        self.pm1, self.pm2 = rsa.precompute(p_inv)  # NTT(chunk(p^-1 mod 2^N))
+        # derive R^2 mod p for conversion to montgomery form
+        self.r = (1 << rsa.N) % p
+        self.rsqr = pow(self.r, 2, p)  # R^2 mod p
+        self.rsqrh = rsa.precompute(self.rsqr)
+
+
+# Helper function of NTT under the Fermat prime 65537 = 2^16 + 1
+FERMAT_Q = 65537
+
+
+def fermat_reduce(x):
+    """x mod 65537 for 0 <= x <= 2^32, using 2^16 = -1"""
+    x = (x & 0xFFFF) - (x >> 16)
+    return x + FERMAT_Q if x < 0 else x
+
+
+def fermat_mul2k(b, s):
+    """b * 2^s mod 65537 for 0 <= b <= 65536, using 2^16 = -1 and 2^32 = 1"""
+    x = b << (s & 15)
+    x = (x & 0xFFFF) - (x >> 16)
+    if s & 16:
+        x = -x
+    return x + FERMAT_Q if x < 0 else x
+
+
+def CT_BFU_fermat(a, b, omega, s):
+    """CT_BFU under 65537, omega = 2^s if s is not None"""
+    m = fermat_mul2k(b, s) if s is not None else fermat_reduce(b * omega)
+    add = a + m
+    sub = a - m
+    return add - FERMAT_Q if add >= FERMAT_Q else add, \
+        sub + FERMAT_Q if sub < 0 else sub
+
+
+def GS_BFU_fermat(a, b, omega, s):
+    """GS_BFU under 65537, omega = 2^s if s is not None
+    The division by 2 is a multiplication by 2^31"""
+    add = a + b
+    sub = a - b
+    add = add - FERMAT_Q if add >= FERMAT_Q else add
+    sub = sub + FERMAT_Q if sub < 0 else sub
+    if s is not None:
+        sub = fermat_mul2k(sub, s + 31)
+    else:
+        sub = fermat_mul2k(fermat_reduce(sub * omega), 31)
+    return fermat_mul2k(add, 31), sub
+
+
+# Helper function of the window exponentiation
+WINDOW_MAX = 7
+
+
+def sliding_windows(e: int, k: int) -> list[tuple[int, int]]:
+    """Split e into windows of at most k bits, from the most significant
+    Output: [(shift, value)], every value is odd and e = sum(value << shift)
+    """
+    ret = []
+    i = e.bit_length() - 1
+    while i >= 0:
+        if not (e >> i) & 1:
+            i -= 1
+            continue
+        j = max(i - k + 1, 0)
+        while not (e >> j) & 1:
+            j += 1
+        ret.append((j, (e >> j) & ((1 << (i - j + 1)) - 1)))
+        i = j - 1
+    return ret
+
+
+class Scratch:
+    """
+    Polynomial buffers reused by every square and multiply of one thread
+    h1, h2: NTT form under q1 and q2
+    t: the product, l: the low product, lp: the product with p
+    low: the lower part fed to the next NTT
+    """
+
+    def __init__(self, len_poly: int):
+        self.h1 = [0] * len_poly
+        self.h2 = [0] * len_poly
+        self.t = [0] * len_poly
+        self.l = [0] * len_poly
+        self.lp = [0] * len_poly
+        self.low = [0] * len_poly
+
+
 # Abstract class for Rsa using NTT to speed up the multiplication
 class NttRsa:
     def __init__(self, N: int, l: int, len_poly: int, q1: int, q2: int):
-        assert N == 2048 or N == 4096, "N must be 2048 or 4096"
+        assert N % 32 == 0, "N must be a multiple of 32"
         self.N = N
         self.l = l  # number of bits in the chunk
         self.len_poly = len_poly
         self.q1 = q1
         self.q2 = q2
         self.q = q1 * q2
-        # Modulus p and their derivative, initially None
+        self.q1inv = pow(q1, -1, q2)  # q1^-1 mod q2 for CRT
+        # Context of the modulus set by setp, initially None
+        self.ctx = None
+        # Modulus p and their derivative, mirror of self.ctx
         self.p = None
         self.ph1 = None
         self.ph2 = None
         self.pm1 = None
         self.pm2 = None
+        self.pl = None  # chunk(p)
         # To convert to montgomery form
         self.r = None
         self.rsqr = None
+        self.rsqrh = None  # precompute(R^2 mod p)
+        # LRU cache of contexts keyed by modulus
+        self.cache_size = 16
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.contexts = OrderedDict()
+        self.contexts_lock = threading.Lock()
+        # OpCounter of the stages, counting is disabled if None
+        self.counter = None
+        # Tracer of the stages, tracing is disabled if None
+        self.tracer = None
+        # Scratch arena of each thread, see scratch()
+        self.scratch_local = threading.local()
+        self.stage_ops_cache = {}
+
+    def context(self, p: int) -> NttRsaContext:
+        """Get the context of modulus p from the LRU cache, create it on miss"""
+        with self.contexts_lock:
+            ctx = self.contexts.get(p)
+            if ctx is not None:
+                self.cache_hits += 1
+                self.contexts.move_to_end(p)
+                return ctx
+            self.cache_misses += 1
+
+        return self.add_context(NttRsaContext(self, p))
+
+    def add_context(self, ctx: NttRsaContext) -> NttRsaContext:
+        """Put a context, e.g. loaded by ctxfile, into the LRU cache"""
+        with self.contexts_lock:
+            self.contexts[ctx.p] = ctx
+            self.contexts.move_to_end(ctx.p)
+            while len(self.contexts) > self.cache_size:
+                self.contexts.popitem(last=False)
+        return ctx
 
     def setp(self, p: int):
-        """Set the modulus p and calculate derived fields."""
-        self.p = p
-        # derive NTT form of p
-        p_chunks = self.chunk(p)
-        self.ph1 = self.ntt_q1(p_chunks)  # NTT(chunk(p)) for q1
-        self.ph2 = self.ntt_q2(p_chunks)  # NTT(chunk(p)) for q2
-        # derive NTT form of p^-1 mod 2^N
-        p_inv = self.qinv(p)
-        p_inv = pow(p, -1, 1 << 2048)  # p^-1 mod q
-        p_inv_chunks = self.chunk(p_inv)
-        self.pm1 = self.ntt_q1(p_inv_chunks)  # NTT(chunk(p^-1 mod 2^k)) for q1
-        self.pm2 = self.ntt_q2(p_inv_chunks)  # NTT(chunk(p^-1 mod 2^k)) for q2
-        # derive R^2 mod p for conversion to montgomery form
-        self.r = (1 << self.N) % p
-        self.rsqr = pow(self.r, 2, p)  # R^2 mod p
+        """Set the modulus p and calculate derived fields.
+        Operations called without ctx argument use this modulus."""
+        ctx = self.context(p)
+        self.ctx = ctx
+        self.p = ctx.p
+        self.pl = ctx.pl
+        self.ph1 = ctx.ph1
+        self.ph2 = ctx.ph2
+        self.pm1 = ctx.pm1
+        self.pm2 = ctx.pm2
+        self.r = ctx.r
+        self.rsqr = ctx.rsqr
+        self.rsqrh = ctx.rsqrh
+
+    def get_ctx(self, ctx: NttRsaContext = None) -> NttRsaContext:
+        """Return ctx, or the context set by setp if ctx is None"""
+        if ctx is None:
+            ctx = self.ctx
+        if ctx is None:
+            raise ValueError("Modulus p has not been set. Call setp() first.")
+        return ctx
 
     def qinv(self, p: int) -> int:
         """Calculate p^-1 mod 2^N by hensel_lifting"""
@@ -67,20 +219,16 @@ class NttRsa:
 
     def chunk(self, a: int) -> list[int]:
         """Chunk number every l bits, list [0] will store the chunk near LSB"""
-        chunks = []
-        mask = (1 << self.l) - 1  # Mask to extract l bits
-        for _ in range(self.len_poly):
-            chunks.append(a & mask)
-            a >>= self.l
+        chunks = limbs.chunk(a, self.l, self.len_poly)
+        self.mark("chunk")
         return chunks
 
     def dechunk(self, l: list[int]) -> int:
         """Dechunk list of integers, sum up each integer by offset l bits"""
         assert len(
             l) == self.len_poly, "Input list length must match self.len_poly"
-        result = 0
-        for i, chunk in enumerate(l):
-            result += chunk << (i * self.l)
+        result = limbs.dechunk(l, self.l)
+        self.mark("dechunk")
         return result
 
     def crt(self, x: int, y: int) -> int:
@@ -89,64 +237,181 @@ class NttRsa:
         Output: z such that z mod q1 = x, z mod q2 = y"""
         raise NotImplementedError
 
-    def crts(self, xs: list[int], ys: list[int]) -> list[int]:
+    def crts(self, xs: list[int], ys: list[int], out: list[int] = None) -> list[int]:
         """Apply CRT element-wise on xs and ys to produce zs
         Input: xs mod q1, ys mod q2
-        Output: zs such that zs mod q1 = xs, zs mod q2 = ys
+        Output: zs such that zs mod q1 = xs, zs mod q2 = ys, written to out
+                if given
         """
         assert len(xs) == self.len_poly and len(
             ys) == self.len_poly, "Lengths of xs and ys must match len_poly"
-        zs = [self.crt(x, y) for x, y in zip(xs, ys)]
-        return zs
+        return self.store(limbs.crts(xs, ys, self.q1, self.q2, self.q1inv), out)
 
-    def ntt_q1(self, l: list[int]) -> list[int]:
-        """Run NTT on the integer list"""
+    def ntt_q1(self, l: list[int], out: list[int] = None) -> list[int]:
+        """Run NTT on the integer list, in place on out if given"""
         raise NotImplementedError
 
-    def intt_q1(self, l: list[int]) -> list[int]:
-        """Run Inverse NTT on the integer list"""
+    def intt_q1(self, l: list[int], out: list[int] = None) -> list[int]:
+        """Run Inverse NTT on the integer list, in place on out if given"""
         raise NotImplementedError
 
-    def ntt_q2(self, l: list[int]) -> list[int]:
-        """Run NTT on the integer list"""
+    def ntt_q2(self, l: list[int], out: list[int] = None) -> list[int]:
+        """Run NTT on the integer list, in place on out if given"""
         raise NotImplementedError
 
-    def intt_q2(self, l: list[int]) -> list[int]:
-        """Run Inverse NTT on the integer list"""
+    def intt_q2(self, l: list[int], out: list[int] = None) -> list[int]:
+        """Run Inverse NTT on the integer list, in place on out if given"""
         raise NotImplementedError
 
-    def mul_q1(self, a: list[int], b: list[int]) -> list[int]:
+    def mul_q1(self, a: list[int], b: list[int],
+               out: list[int] = None) -> list[int]:
         """Multiply two NTT form numbers a, b under modulo q1
         Input: a, b in NTT form
-        Output: c = ab in NTT form
+        Output: c = ab in NTT form, written to out if given
         """
         raise NotImplementedError
 
-    def mul_q2(self, a: list[int], b: list[int]) -> list[int]:
+    def mul_q2(self, a: list[int], b: list[int],
+               out: list[int] = None) -> list[int]:
         """Multiply two NTT form numbers a, b under modulo q2
         Input: a, b in NTT form
-        Output: c = ab in NTT form
+        Output: c = ab in NTT form, written to out if given
         """
         raise NotImplementedError
 
-    def lower(self, l: list[int]) -> list[int]:
-        """Extract the lower part of a chunked number"""
+    def sqr_q1(self, a: list[int], out: list[int] = None) -> list[int]:
+        """Square an NTT form number under modulo q1, same as mul_q1(a, a)"""
+        return self.mul_q1(a, a, out)
+
+    def sqr_q2(self, a: list[int], out: list[int] = None) -> list[int]:
+        """Square an NTT form number under modulo q2, same as mul_q2(a, a)"""
+        return self.mul_q2(a, a, out)
+
+    def lower(self, l: list[int], out: list[int] = None) -> list[int]:
+        """Extract the lower part of a chunked number, written to out if given"""
         assert len(
             l) == self.len_poly, "Input list length must match self.len_poly"
-        ret = [0] * self.len_poly
-        mask = (1 << self.l) - 1
-        remain = 0
+        return self.store(limbs.lower(l, self.l, self.N), out)
+
+    # Buffers of the stages
+    # The stages take an optional out buffer, which receives the result and
+    # is returned, so the callers reuse the buffers of the scratch arena
+    # instead of allocating new polynomials. A backend may ignore out and
+    # return a new object, the callers always use the returned value.
+
+    def load(self, l: list[int], out: list[int] = None) -> list[int]:
+        """Working buffer of an in-place stage: out filled with l, or a new
+        list of l"""
+        if out is None:
+            return list(l)
+        if out is not l:
+            out[:] = l
+        return out
+
+    def store(self, result: list[int], out: list[int] = None) -> list[int]:
+        """Write result to out if given"""
+        if out is None or out is result:
+            return result
+        out[:] = result
+        return out
+
+    def scratch(self) -> "Scratch":
+        """Scratch arena of the calling thread"""
+        arena = getattr(self.scratch_local, "arena", None)
+        if arena is None:
+            arena = self.scratch_local.arena = Scratch(self.len_poly)
+        return arena
+
+    def compact(self, l: list[int]) -> array:
+        """Compact storage of a polynomial in 32-bit words, for long lived
+        tables. Every stage accepts it as input, but the list is faster to
+        compute on."""
+        return array("I", [int(x) for x in l])
+
+    # Batched stages, each runs once over K operands.
+    # The default implementation loops over the single operand version,
+    # backends with vector kernels override them.
+    # bs of mul_q1_batch/mul_q2_batch may be one operand shared by the batch,
+    # vector kernels broadcast it.
+
+    def chunk_batch(self, a_s: list[int]) -> list[list[int]]:
+        return [self.chunk(a) for a in a_s]
+
+    def dechunk_batch(self, ls: list[list[int]]) -> list[int]:
+        return [self.dechunk(l) for l in ls]
+
+    def crts_batch(self, xss: list[list[int]], yss: list[list[int]]) -> list[list[int]]:
+        return [self.crts(xs, ys) for xs, ys in zip(xss, yss)]
+
+    def lower_batch(self, ls: list[list[int]]) -> list[list[int]]:
+        return [self.lower(l) for l in ls]
+
+    def ntt_q1_batch(self, ls: list[list[int]]) -> list[list[int]]:
+        return [self.ntt_q1(l) for l in ls]
+
+    def intt_q1_batch(self, ls: list[list[int]]) -> list[list[int]]:
+        return [self.intt_q1(l) for l in ls]
+
+    def ntt_q2_batch(self, ls: list[list[int]]) -> list[list[int]]:
+        return [self.ntt_q2(l) for l in ls]
+
+    def intt_q2_batch(self, ls: list[list[int]]) -> list[list[int]]:
+        return [self.intt_q2(l) for l in ls]
+
+    def mul_q1_batch(self, a_s: list[list[int]], bs: list[list[int]]) -> list[list[int]]:
+        if isinstance(bs[0], numbers.Integral):
+            return [self.mul_q1(a, bs) for a in a_s]
+        return [self.mul_q1(a, b) for a, b in zip(a_s, bs)]
+
+    def mul_q2_batch(self, a_s: list[list[int]], bs: list[list[int]]) -> list[list[int]]:
+        if isinstance(bs[0], numbers.Integral):
+            return [self.mul_q2(a, bs) for a in a_s]
+        return [self.mul_q2(a, b) for a, b in zip(a_s, bs)]
+
+    def stage_ops(self, stage: str) -> dict:
+        """Primitive 32-bit word operations of one call of stage
+        Output: {op: n} for op in OPS
+
+        Stages: chunk, dechunk, crt (both channels), lower,
+        high (final subtraction, adding p is counted as constant time),
+        ntt, intt, basemul and basesqr (q1 and q2 together) from the
+        subclass.
+        """
+        n = self.len_poly
         n_chunks = (self.N + self.l - 1) // self.l
+        ops = dict.fromkeys(OPS, 0)
+        if stage == "chunk":
+            # extract l bits across at most 2 words
+            ops.update(load=2 * n, shift=2 * n, add=2 * n, store=n)
+        elif stage == "dechunk":
+            # shift chunk to its offset and add with carry into 2 words
+            ops.update(load=3 * n, shift=2 * n, add=2 * n, store=2 * n)
+        elif stage == "crt":
+            ops.update(load=2 * n, add=2 * n, mul=2 * n, mod=2 * n, store=n)
+        elif stage == "lower":
+            ops.update(load=n_chunks, add=2 * n_chunks, shift=n_chunks,
+                       store=n)
+        elif stage == "high":
+            # carry of t - lp, shift by N bits, add p
+            ops.update(load=5 * n, add=8 * n, shift=4 * n, store=3 * n)
+        else:
+            raise ValueError(f"Unknown stage {stage}")
+        return ops
 
-        for i, chunk in enumerate(l[:n_chunks]):
-            sum = (chunk + remain)
-            ret[i] = sum & mask
-            remain = sum >> self.l
-        # Modulo final block to N bits
-        ret[n_chunks-1] &= ((1 << self.N % self.l) - 1)
-        return ret
+    def mark(self, stage: str):
+        """Mark the end of one call of stage
+        The ops of the stage are added to the counter, and the time since the
+        previous mark is recorded by the tracer, if they are set."""
+        if self.counter is not None:
+            ops = self.stage_ops_cache.get(stage)
+            if ops is None:
+                ops = self.stage_ops_cache[stage] = self.stage_ops(stage)
+            self.counter.add(stage, ops)
+        if self.tracer is not None:
+            self.tracer.stage(stage)
 
-    def square(self, a: int) -> int:
+    @operation("square")
+    def square(self, a: int, ctx: NttRsaContext = None) -> int:
         """Square the montgomery form number aR mod p under modulo p
         Input: a, aR mod p
         Output: c = a^2 * R mod p
@@ -167,47 +432,12 @@ class NttRsa:
         8: if c < 0 then c = c + p
         9: return c
         """
-        if self.p is None:
-            raise ValueError("Modulus p has not been set. Call setp() first.")
+        ctx = self.get_ctx(ctx)
 
-        # Calculate t = a * a
-        al = self.chunk(a)
-        ah1 = self.ntt_q1(al)
-        ah2 = self.ntt_q2(al)
-        sqrh1 = self.mul_q1(ah1, ah1)
-        sqrh2 = self.mul_q2(ah2, ah2)
-        sqrl1 = self.intt_q1(sqrh1)
-        sqrl2 = self.intt_q2(sqrh2)
-        sqrl = self.crts(sqrl1, sqrl2)
-        t = self.dechunk(sqrl)
+        return self.dechunk(self.square_chunked(self.chunk(a), ctx))
 
-        # l = (t mod R) * minpinv
-        t_lowl = self.lower(sqrl)
-        th1 = self.ntt_q1(t_lowl)
-        th2 = self.ntt_q2(t_lowl)
-        lh1 = self.mul_q1(th1, self.pm1)
-        lh2 = self.mul_q2(th2, self.pm2)
-        l1 = self.intt_q1(lh1)
-        l2 = self.intt_q2(lh2)
-        ll = self.crts(l1, l2)
-
-        # lp = l * p
-        l_lowl = self.lower(ll)
-        lh1 = self.ntt_q1(l_lowl)
-        lh2 = self.ntt_q2(l_lowl)
-        lph1 = self.mul_q1(lh1, self.ph1)
-        lph2 = self.mul_q2(lh2, self.ph2)
-        lpl1 = self.intt_q1(lph1)
-        lpl2 = self.intt_q2(lph2)
-        lpl = self.crts(lpl1, lpl2)
-        lp = self.dechunk(lpl)
-
-        high = (t >> self.N) - (lp >> self.N)
-        if high < 0:
-            high += self.p
-        return high
-
-    def multiply(self, a: int, b: int) -> int:
+    @operation("multiply")
+    def multiply(self, a: int, b: int, ctx: NttRsaContext = None) -> int:
         """Multiply montgormery form number a, b, calculating a * b % p
         Input: aR mod p, bR mod p
         Output: c = abR mod p
@@ -229,115 +459,570 @@ class NttRsa:
         8: if c < 0 then c = c + p
         9: return c
         """
-        if self.p is None:
-            raise ValueError("Modulus p has not been set. Call setp() first.")
+        ctx = self.get_ctx(ctx)
+
+        return self.dechunk(self.multiply_chunked(self.chunk(a), self.chunk(b), ctx))
+
+    @operation("square")
+    def square_chunked(self, al: list[int], ctx: NttRsaContext = None) -> list[int]:
+        """Same as square, but input and output are chunk form numbers"""
+        ctx = self.get_ctx(ctx)
+        s = self.scratch()
+        ah1 = self.ntt_q1(al, s.h1)
+        ah2 = self.ntt_q2(al, s.h2)
+        self.mark("ntt")
+        sqrh1 = self.sqr_q1(ah1, ah1)
+        sqrh2 = self.sqr_q2(ah2, ah2)
+        self.mark("basesqr")
+        sqrl1 = self.intt_q1(sqrh1, sqrh1)
+        sqrl2 = self.intt_q2(sqrh2, sqrh2)
+        self.mark("intt")
+        sqrl = self.crts(sqrl1, sqrl2, s.t)
+        self.mark("crt")
+        return self._reduce(sqrl, ctx)
+
+    def multiply_chunked(self, al: list[int], bl: list[int],
+                         ctx: NttRsaContext = None) -> list[int]:
+        """Same as multiply, but input and output are chunk form numbers"""
+        return self.multiply_ntt(al, self.transform(bl), ctx)
+
+    def precompute(self, b: int) -> tuple:
+        """Precompute the NTT form of a fixed multiplicand b
+        Output: (bh1, bh2) = NTT(chunk(b)) for q1 and q2, used by multiply_ntt
+        """
+        return self.transform(self.chunk(b))
+
+    def transform(self, bl: list[int]) -> tuple:
+        """Same as precompute, but input is a chunk form number"""
+        bh = self.ntt_q1(bl), self.ntt_q2(bl)
+        self.mark("ntt")
+        return bh
+
+    def to_mont(self, a: int, ctx: NttRsaContext = None) -> list[int]:
+        """Convert a to montgomery form, one multiply with R^2
+        Input: a
+        Output: chunk(aR mod p)
+        """
+        ctx = self.get_ctx(ctx)
+        return self.multiply_ntt(self.chunk(a), ctx.rsqrh, ctx)
+
+    def from_mont(self, al: list[int], ctx: NttRsaContext = None) -> int:
+        """Convert back to normal form, one multiply with 1
+        Input: chunk(aR mod p)
+        Output: a mod p
+        """
+        return self.dechunk(self.multiply_chunked(al, self.chunk(1), ctx))
+
+    @operation("multiply")
+    def multiply_ntt(self, al: list[int], bh: tuple,
+                     ctx: NttRsaContext = None) -> list[int]:
+        """Multiply chunk form number a with a precomputed multiplicand
+        Input: chunk(aR mod p), precompute(bR mod p)
+        Output: chunk(abR mod p)
+        """
+        ctx = self.get_ctx(ctx)
+        s = self.scratch()
+        bh1, bh2 = bh
+        ah1 = self.ntt_q1(al, s.h1)
+        ah2 = self.ntt_q2(al, s.h2)
+        self.mark("ntt")
+        abh1 = self.mul_q1(ah1, bh1, ah1)
+        abh2 = self.mul_q2(ah2, bh2, ah2)
+        self.mark("basemul")
+        ab1 = self.intt_q1(abh1, abh1)
+        ab2 = self.intt_q2(abh2, abh2)
+        self.mark("intt")
+        abl = self.crts(ab1, ab2, s.t)
+        self.mark("crt")
+        return self._reduce(abl, ctx)
 
-        # t = a * b
-        al = self.chunk(a)
-        bl = self.chunk(b)
-        ah1 = self.ntt_q1(al)
-        ah2 = self.ntt_q2(al)
-        bh1 = self.ntt_q1(bl)
-        bh2 = self.ntt_q2(bl)
-        abh1 = self.mul_q1(ah1, bh1)
-        abh2 = self.mul_q2(ah2, bh2)
-        ab1 = self.intt_q1(abh1)
-        ab2 = self.intt_q2(abh2)
-        abl = self.crts(ab1, ab2)
-        t = self.dechunk(abl)
+    def square_n(self, a: int, k: int, ctx: NttRsaContext = None) -> int:
+        """Square the montgomery form number a for k times
+        Input: aR mod p
+        Output: c = a^(2^k) * R mod p
+
+        The intermediate values stay in chunk form, only the final result
+        is converted back to integer.
+        """
+        ctx = self.get_ctx(ctx)
 
+        cl = self.chunk(a)
+        for _ in range(k):
+            cl = self.square_chunked(cl, ctx)
+        return self.dechunk(cl)
+
+    def _reduce(self, abl: list[int], ctx: NttRsaContext) -> list[int]:
+        """Montgomery reduction of the chunk form product t = abl
+        Output: chunk(t/R - lp/R), plus p if negative
+        The intermediates live in the scratch arena, only the result is new.
+        """
+        s = self.scratch()
         # l = (t mod R) * minpinv
-        t_lowl = self.lower(abl)
-        th1 = self.ntt_q1(t_lowl)
-        th2 = self.ntt_q2(t_lowl)
-        lh1 = self.mul_q1(th1, self.pm1)
-        lh2 = self.mul_q2(th2, self.pm2)
-        l1 = self.intt_q1(lh1)
-        l2 = self.intt_q2(lh2)
-        ll = self.crts(l1, l2)
+        t_lowl = self.lower(abl, s.low)
+        self.mark("lower")
+        th1 = self.ntt_q1(t_lowl, s.h1)
+        th2 = self.ntt_q2(t_lowl, s.h2)
+        self.mark("ntt")
+        lh1 = self.mul_q1(th1, ctx.pm1, th1)
+        lh2 = self.mul_q2(th2, ctx.pm2, th2)
+        self.mark("basemul")
+        l1 = self.intt_q1(lh1, lh1)
+        l2 = self.intt_q2(lh2, lh2)
+        self.mark("intt")
+        ll = self.crts(l1, l2, s.l)
+        self.mark("crt")
 
         # lp = l * P
-        l_lowl = self.lower(ll)
-        lh1 = self.ntt_q1(l_lowl)
-        lh2 = self.ntt_q2(l_lowl)
-        lph1 = self.mul_q1(lh1, self.ph1)
-        lph2 = self.mul_q2(lh2, self.ph2)
-        lp1 = self.intt_q1(lph1)
-        lp2 = self.intt_q2(lph2)
-        lpl = self.crts(lp1, lp2)
-        lp = self.dechunk(lpl)
+        l_lowl = self.lower(ll, s.low)
+        self.mark("lower")
+        lh1 = self.ntt_q1(l_lowl, s.h1)
+        lh2 = self.ntt_q2(l_lowl, s.h2)
+        self.mark("ntt")
+        lph1 = self.mul_q1(lh1, ctx.ph1, lh1)
+        lph2 = self.mul_q2(lh2, ctx.ph2, lh2)
+        self.mark("basemul")
+        lp1 = self.intt_q1(lph1, lph1)
+        lp2 = self.intt_q2(lph2, lph2)
+        self.mark("intt")
+        lpl = self.crts(lp1, lp2, s.lp)
+        self.mark("crt")
 
         # c = t - lp
-        high = (t >> self.N) - (lp >> self.N)
-        if high < 0:
-            high += self.p
-        return high
+        cl = self.high(abl, lpl, ctx)
+        self.mark("high")
+        return cl
+
+    def high(self, tl: list[int], lpl: list[int],
+             ctx: NttRsaContext = None) -> list[int]:
+        """Calculate (t - lp) / R in chunk form without converting to integer
+        Input: tl, lpl chunk form numbers with unnormalized chunks,
+               t - lp must be a multiple of R
+        Output: carry normalized chunks of (t - lp) / R, plus p if negative
+        """
+        ctx = self.get_ctx(ctx)
+        mask = (1 << self.l) - 1
+        # Carry propagation of t - lp, final carry is -1 if t - lp < 0
+        d = []
+        carry = 0
+        for x, y in zip(tl, lpl):
+            s = x - y + carry
+            d.append(s & mask)
+            carry = s >> self.l
+
+        # Shift right by N bits, which is n_shift chunks and r_shift bits
+        n_shift, r_shift = divmod(self.N, self.l)
+        d.extend([mask if carry < 0 else 0] * (n_shift + 1))
+        ret = [((d[n_shift + i] >> r_shift) |
+                (d[n_shift + i + 1] << (self.l - r_shift))) & mask
+               for i in range(self.len_poly)]
+
+        # Add p to negative result, the carry out cancels the sign
+        if carry < 0:
+            carry = 0
+            for i, x in enumerate(ctx.pl):
+                s = ret[i] + x + carry
+                ret[i] = s & mask
+                carry = s >> self.l
+        return ret
+
+    def square_batch(self, a_s: list[int], ctx: NttRsaContext = None) -> list[int]:
+        """Square K montgomery form numbers under the same modulo p
+        Input: [a_0R mod p, a_1R mod p, ...]
+        Output: [a_0^2 * R mod p, a_1^2 * R mod p, ...]
+        """
+        ctx = self.get_ctx(ctx)
+        if not a_s:
+            return []
+
+        al = self.chunk_batch(a_s)
+        ah1 = self.ntt_q1_batch(al)
+        ah2 = self.ntt_q2_batch(al)
+        return self._reduce_batch(self.mul_q1_batch(ah1, ah1),
+                                  self.mul_q2_batch(ah2, ah2), ctx)
+
+    def multiply_batch(self, a_s: list[int], bs: list[int],
+                       ctx: NttRsaContext = None) -> list[int]:
+        """Multiply K pairs of montgomery form numbers under the same modulo p
+        Input: [a_0R mod p, a_1R mod p, ...], [b_0R mod p, b_1R mod p, ...]
+        Output: [a_0b_0R mod p, a_1b_1R mod p, ...]
+        """
+        ctx = self.get_ctx(ctx)
+        assert len(a_s) == len(bs), "Lengths of a_s and bs must match"
+        if not a_s:
+            return []
 
-    def expmod_public(self, a: int, e: int) -> int:
+        al = self.chunk_batch(a_s)
+        bl = self.chunk_batch(bs)
+        ah1 = self.ntt_q1_batch(al)
+        ah2 = self.ntt_q2_batch(al)
+        bh1 = self.ntt_q1_batch(bl)
+        bh2 = self.ntt_q2_batch(bl)
+        return self._reduce_batch(self.mul_q1_batch(ah1, bh1),
+                                  self.mul_q2_batch(ah2, bh2), ctx)
+
+    def _reduce_batch(self, abh1, abh2, ctx: NttRsaContext) -> list[int]:
+        """Montgomery reduction of K products given in NTT form
+        The polynomials of the context are shared by the batch, not copied"""
+        abl = self.crts_batch(self.intt_q1_batch(abh1),
+                              self.intt_q2_batch(abh2))
+        ts = self.dechunk_batch(abl)
+
+        # l = (t mod R) * minpinv
+        t_lowl = self.lower_batch(abl)
+        lh1 = self.mul_q1_batch(self.ntt_q1_batch(t_lowl), ctx.pm1)
+        lh2 = self.mul_q2_batch(self.ntt_q2_batch(t_lowl), ctx.pm2)
+        ll = self.crts_batch(self.intt_q1_batch(lh1), self.intt_q2_batch(lh2))
+
+        # lp = l * P
+        l_lowl = self.lower_batch(ll)
+        lph1 = self.mul_q1_batch(self.ntt_q1_batch(l_lowl), ctx.ph1)
+        lph2 = self.mul_q2_batch(self.ntt_q2_batch(l_lowl), ctx.ph2)
+        lpl = self.crts_batch(self.intt_q1_batch(lph1),
+                              self.intt_q2_batch(lph2))
+        lps = self.dechunk_batch(lpl)
+
+        # c = t - lp
+        cs = []
+        for t, lp in zip(ts, lps):
+            high = (t >> self.N) - (lp >> self.N)
+            if high < 0:
+                high += ctx.p
+            cs.append(high)
+        return cs
+
+    def decrypt_crt(self, c: int, p: int, q: int, dp: int, dq: int, qinv: int) -> int:
+        """RSA private operation with Chinese Remainder Theorem
+        Input: c, the primes p, q of the modulus,
+               dp = d mod (p-1), dq = d mod (q-1), qinv = q^-1 mod p
+        Output: m = c^d mod pq
+
+        The exponentiations under p and q are N bits each, so an instance of
+        half the key size is used, with the contexts of p and q cached.
+        1. m1 = c^dp mod p, m2 = c^dq mod q
+        2. Garner recombination: h = qinv * (m1 - m2) mod p
+        3. return m2 + h * q
+        """
+        if p.bit_length() > self.N or q.bit_length() > self.N:
+            raise ValueError(f"Primes p and q must be at most {self.N} bits")
+        m1 = self.expmod_private(c % p, dp, self.context(p))
+        m2 = self.expmod_private(c % q, dq, self.context(q))
+        h = qinv * (m1 - m2) % p
+        return m2 + h * q
+
+    def window_size(self, e: int, sliding: bool = False) -> int:
+        """Window size from 1 to WINDOW_MAX with the least multiplies
+        Fixed window: the table takes 2^k - 2 multiplies, then one multiply
+        every k bits of the max(N, len(e)) bits exponent.
+        Sliding window: the table of odd powers takes 1 square and
+        2^(k-1) - 1 multiplies, then one multiply per window. e is not secret
+        so the windows are counted on e itself.
+        The number of squares is about the length of e in both cases.
+        """
+        best_k, best_cost = 1, None
+        for k in range(1, WINDOW_MAX + 1):
+            if sliding:
+                table = (1 << (k - 1)) if k > 1 else 0
+                cost = table + len(sliding_windows(e, k)) - 1
+            else:
+                nbits = max(self.N, e.bit_length())
+                cost = (1 << k) - 2 + (nbits + k - 1) // k - 1
+            if best_cost is None or cost < best_cost:
+                best_k, best_cost = k, cost
+        return best_k
+
+    @operation("expmod")
+    def expmod(self, a: int, e: int, ctx: NttRsaContext = None,
+               window: int = None, sliding: bool = False,
+               stats: dict = None) -> int:
         """Exponentiate a to the power of e under modulo p
+        Input: a, e, the window size or None to select by window_size,
+               sliding window for non-secret e, otherwise fixed window
+        Output: c = a^e mod p
+        stats, if given, is filled with the window, the strategy and the
+        number of squares and multiplies including the montgomery conversions.
+        """
+        ctx = self.get_ctx(ctx)
+        if e < 0:
+            raise ValueError("Exponent e must be positive")
+        cl = self.expmod_chunked(self.to_mont(a, ctx), e, ctx, window,
+                                 sliding, stats)
+        if stats is not None:
+            stats["multiplies"] += 2
+        return self.from_mont(cl, ctx)
+
+    def expmod_chunked(self, al: list[int], e: int, ctx: NttRsaContext = None,
+                       window: int = None, sliding: bool = False,
+                       stats: dict = None) -> list[int]:
+        """Same as expmod, but input and output are chunk form montgomery
+        numbers, chunk(aR mod p) to chunk(a^e R mod p)
+        stats, if given, counts no montgomery conversion.
+        """
+        ctx = self.get_ctx(ctx)
+        if e < 0:
+            raise ValueError("Exponent e must be positive")
+        if window is None:
+            window = self.window_size(e, sliding)
+        if not 1 <= window <= WINDOW_MAX:
+            raise ValueError(f"Window size must be in 1..{WINDOW_MAX}")
+
+        if sliding:
+            cl, squares, multiplies = self._expmod_sliding(al, e, window, ctx)
+        else:
+            cl, squares, multiplies = self._expmod_fixed(al, e, window, ctx)
+        if stats is not None:
+            stats.update(window=window, sliding=sliding,
+                         squares=squares, multiplies=multiplies)
+        return cl
+
+    def _odd_powers(self, al: list[int], k: int, ctx: NttRsaContext) -> tuple:
+        """Table of the sliding window of size k
+        Input: chunk(aR mod p)
+        Output: (table, tableh, squares, multiplies), table[i] is
+                chunk(a^(2i+1) R mod p) and tableh its NTT form
+        """
+        table = [al]
+        squares, multiplies = 0, 0
+        if k > 1:
+            a2h = self.transform(self.square_chunked(table[0], ctx))
+            squares += 1
+            for i in range(1, 1 << (k - 1)):
+                table.append(self.multiply_ntt(table[i - 1], a2h, ctx))
+                multiplies += 1
+        tableh = [self.transform(x) for x in table]
+        return table, tableh, squares, multiplies
+
+    def _expmod_sliding(self, al: list[int], e: int, k: int,
+                        ctx: NttRsaContext) -> tuple:
+        """Sliding window exponentiation, the operations depend on e
+        Output: (chunk(a^e R mod p), squares, multiplies)
+        """
+        if e == 0:
+            return self.chunk(ctx.r), 0, 0
+        table, tableh, squares, multiplies = self._odd_powers(al, k, ctx)
+        windows = sliding_windows(e, k)
+
+        # The first window initializes c
+        shift, value = windows[0]
+        c = table[value >> 1]
+        for j, value in windows[1:]:
+            for _ in range(shift - j):
+                c = self.square_chunked(c, ctx)
+            c = self.multiply_ntt(c, tableh[value >> 1], ctx)
+            squares += shift - j
+            multiplies += 1
+            shift = j
+        # Trailing zeros of e
+        for _ in range(shift):
+            c = self.square_chunked(c, ctx)
+        squares += shift
+        return c, squares, multiplies
+
+    def _expmod_fixed(self, al: list[int], e: int, k: int,
+                      ctx: NttRsaContext) -> tuple:
+        """Fixed window exponentiation over max(N, len(e)) bits, the
+        operations only depend on the length
+        Output: (chunk(a^e R mod p), squares, multiplies)
+        """
+        mask = (1 << k) - 1
+        table = [None] * (1 << k)
+        tableh = [None] * (1 << k)
+        # Generate the table for constant time exponentiation
+        # table[0] = R mod p, table[1] = aR mod p, ... in chunk form
+        # tableh is the NTT form of table used by the multiply
+        table[0] = self.chunk(ctx.r)
+        table[1] = al
+        tableh[0] = self.transform(table[0])
+        tableh[1] = self.transform(table[1])
+        for i in range(2, 1 << k):
+            table[i] = self.multiply_ntt(table[1], tableh[i - 1], ctx)
+            tableh[i] = self.transform(table[i])
+        squares, multiplies = 0, (1 << k) - 2
+
+        # Initialize c
+        nbits = max(self.N, e.bit_length())
+        i = (nbits - 1) // k * k
+        c = table[e >> i]
+
+        # Square and multiply using constant window
+        while i > 0:
+            i -= k
+            idx = (e >> i) & mask
+            for _ in range(k):
+                c = self.square_chunked(c, ctx)
+            c = self.multiply_ntt(c, tableh[idx], ctx)
+            squares += k
+            multiplies += 1
+        return c, squares, multiplies
+
+    @operation("expmod_public")
+    def expmod_public(self, a: int, e: int, ctx: NttRsaContext = None,
+                      window: int = None, stats: dict = None) -> int:
+        """Exponentiate a to the power of the public exponent e under modulo p
         Input: a, e
         Output: c = a^e mod p
 
-        The algorithm
-        1. Convert a to montgomery form
-        2. Square and multiply
-        3. Convert back to normal form
+        Sliding window exponentiation, see expmod
         """
-        if self.p is None:
-            raise ValueError("Modulus p has not been set. Call setp() first.")
         if e < 0 or e >= (1 << 32):
             raise ValueError("Exponent e must be positive and less than 2^32")
         if e == 0:
             return 1
+        return self.expmod(a, e, ctx, window, sliding=True, stats=stats)
 
-        # Convert a to montgomery form
-        monta = self.multiply(a, self.rsqr)
+    @operation("expmod_private")
+    def expmod_private(self, a: int, d: int, ctx: NttRsaContext = None,
+                       window: int = None, stats: dict = None) -> int:
+        """Exponentiate a to the power of the secret exponent d under modulo p
+        Input: a, d
+        Output: c = a^d mod p
 
-        c = self.r
-        binary = [int(d) for d in bin(e)[2:]]
-        for b in binary:
-            c = self.square(c)
-            if b == 1:
-                c = self.multiply(c, monta)
+        Fixed window exponentiation, see expmod
+        """
+        return self.expmod(a, d, ctx, window, sliding=False, stats=stats)
 
-        # Convert back to normal form
-        c = self.multiply(c, 1)
-        return c
+    def multi_window_size(self, m: int, nbits: int) -> int:
+        """Window size of the joint table of m exponents of nbits bits
+        The joint table takes 2^(km) - 1 multiplies, then one multiply every
+        k bits, the table has at most 2^WINDOW_MAX entries.
+        """
+        if not 1 <= m <= WINDOW_MAX:
+            raise ValueError(f"Number of secret exponents must be in 1..{WINDOW_MAX}")
+        best_k, best_cost = 1, None
+        for k in range(1, WINDOW_MAX // m + 1):
+            cost = (1 << (k * m)) - 1 + (nbits + k - 1) // k - 1
+            if best_cost is None or cost < best_cost:
+                best_k, best_cost = k, cost
+        return best_k
 
-    def expmod_private(self, a: int, d: int) -> int:
-        """Exponentiate a to the power of d under modulo p
-        Input: a, d
-        Output: c = a^d mod p
+    @operation("multi_expmod")
+    def multi_expmod(self, pairs: list[tuple[int, int]],
+                     ctx: NttRsaContext = None, window: int = None,
+                     sliding: bool = False, stats: dict = None) -> int:
+        """Simultaneous exponentiation of several bases under modulo p
+        Input: [(a_0, e_0), (a_1, e_1), ...], the window size or None to
+               select it, sliding window for non-secret exponents
+        Output: c = a_0^e_0 * a_1^e_1 * ... mod p
 
-        The algorithm
-        1. Preapare the table for constant time exponentiation
-        2. Square and multiply
-        3. Convert back to normal form
+        All the bases share one squaring chain.
+        Fixed window (Shamir-Straus): the joint table holds every product of
+        the window digits of all bases, one multiply every window, the
+        operations only depend on the length of the exponents.
+        Sliding window: every base has its own table of odd powers and
+        window size, and is multiplied in where its windows end.
+        stats, if given, is filled with the windows and the number of
+        squares and multiplies including the montgomery conversions.
         """
-        k_window = 4
-        mask = (1 << k_window) - 1
-        table = [0] * (1 << k_window)
-        # Generate the table for constant time exponentiation
-        # table[0] = R mod p, table[1] = aR mod p, ...
-        monta = self.multiply(a, self.rsqr)
-        table[0] = self.r
-        for i in range(1, 1 << k_window):
-            # Create a_pre to save multiply time
-            table[i] = self.multiply(table[i - 1], monta)
+        ctx = self.get_ctx(ctx)
+        if not pairs:
+            raise ValueError("No base to exponentiate")
+        if any(e < 0 for _, e in pairs):
+            raise ValueError("Exponent e must be positive")
+        if window is not None and not 1 <= window <= WINDOW_MAX:
+            raise ValueError(f"Window size must be in 1..{WINDOW_MAX}")
+
+        if sliding:
+            cl, windows, squares, multiplies = \
+                self._multi_expmod_sliding(pairs, window, ctx)
+        else:
+            cl, windows, squares, multiplies = \
+                self._multi_expmod_fixed(pairs, window, ctx)
+
+        if stats is not None:
+            stats.update(window=windows, sliding=sliding,
+                         squares=squares, multiplies=multiplies + 1)
+        return self.from_mont(cl, ctx)
+
+    def _multi_expmod_fixed(self, pairs: list[tuple[int, int]], k: int,
+                            ctx: NttRsaContext) -> tuple:
+        """Fixed window exponentiation with the joint table
+        Output: (chunk(c R mod p), k, squares, multiplies)
+        """
+        m = len(pairs)
+        nbits = max([self.N] + [e.bit_length() for _, e in pairs])
+        if k is None:
+            k = self.multi_window_size(m, nbits)
+        if k * m > WINDOW_MAX:
+            raise ValueError(f"Joint table of {m} bases and window {k} "
+                             f"exceeds 2^{WINDOW_MAX} entries")
+        mask = (1 << k) - 1
+
+        # table[sum(d_j << jk)] = prod(a_j^d_j) R mod p in chunk form
+        # tableh is the NTT form of table used by the multiply
+        size = 1 << (k * m)
+        table = [None] * size
+        tableh = [None] * size
+        table[0] = self.chunk(ctx.r)
+        tableh[0] = self.transform(table[0])
+        multiplies = 0
+        for idx in range(1, size):
+            top = (idx.bit_length() - 1) // k * k
+            digit = idx >> top
+            if idx == 1 << top:
+                table[idx] = self.to_mont(pairs[top // k][0], ctx)
+            elif idx == digit << top:
+                # a_j^d = a_j^(d-1) * a_j
+                table[idx] = self.multiply_ntt(
+                    table[idx - (1 << top)], tableh[1 << top], ctx)
+            else:
+                # product of the lower digits and the top digit
+                table[idx] = self.multiply_ntt(
+                    table[idx - (digit << top)], tableh[digit << top], ctx)
+            tableh[idx] = self.transform(table[idx])
+            multiplies += 1
+
+        def index(i):
+            return sum(((e >> i) & mask) << (j * k)
+                       for j, (_, e) in enumerate(pairs))
 
         # Initialize c
-        i = (self.N-1) // k_window * k_window
-        idx = d >> i
-        c = table[idx]
+        i = (nbits - 1) // k * k
+        c = table[index(i)]
+        squares = 0
 
         # Square and multiply using constant window
         while i > 0:
-            i -= k_window
-            idx = (d >> i) & mask
-            for _ in range(k_window):
-                c = self.square(c)
-            c = self.multiply(c, table[idx])
-
-        # Convert back to normal form
-        c = self.multiply(c, 1)
-        return c
+            i -= k
+            for _ in range(k):
+                c = self.square_chunked(c, ctx)
+            c = self.multiply_ntt(c, tableh[index(i)], ctx)
+            squares += k
+            multiplies += 1
+        return c, k, squares, multiplies
+
+    def _multi_expmod_sliding(self, pairs: list[tuple[int, int]], k: int,
+                              ctx: NttRsaContext) -> tuple:
+        """Interleaved sliding window exponentiation
+        Output: (chunk(c R mod p), [k_j], squares, multiplies)
+        """
+        squares, multiplies = 0, 0
+        windows = []
+        # events[shift] = NTT and chunk form of the powers to multiply
+        events = {}
+        for a, e in pairs:
+            k_j = k if k is not None else self.window_size(e, sliding=True)
+            windows.append(k_j)
+            if e == 0:
+                continue
+            table, tableh, sq, mul = \
+                self._odd_powers(self.to_mont(a, ctx), k_j, ctx)
+            squares += sq
+            multiplies += mul + 1
+            for shift, value in sliding_windows(e, k_j):
+                events.setdefault(shift, []).append(
+                    (table[value >> 1], tableh[value >> 1]))
+        if not events:
+            return self.chunk(ctx.r), windows, squares, multiplies
+
+        # The first window initializes c, then square once per bit
+        c = None
+        for shift in range(max(events), -1, -1):
+            if c is not None:
+                c = self.square_chunked(c, ctx)
+                squares += 1
+            for power, powerh in events.get(shift, []):
+                if c is None:
+                    c = power
+                else:
+                    c = self.multiply_ntt(c, powerh, ctx)
+                    multiplies += 1
+        return c, windows, squares, multiplies
@@ -0,0 +1,127 @@
+# Operation count instrumentation of NttRsa
+#
+# NttRsa marks every stage it runs, the number of primitive word operations
+# the stage performs on a 32-bit processor is added to NttRsa.counter. The counts are
+# derived from the parameter set and the kernel, not measured, so they are
+# independent of the Python interpreter.
+import threading
+
+# Primitive operations tallied for each stage
+OPS = ("mul", "mod", "add", "shift", "load", "store")
+
+
+class CostModel:
+    """
+    Cycles of each primitive operation, used to estimate the cycles of a
+    counted run. The default is a rough 32-bit x86 core where mod is an
+    integer division.
+    """
+
+    def __init__(self, mul: float = 3, mod: float = 25, add: float = 1,
+                 shift: float = 1, load: float = 1, store: float = 1):
+        self.cost = {"mul": mul, "mod": mod, "add": add,
+                     "shift": shift, "load": load, "store": store}
+
+    def cycles(self, counts: dict) -> dict:
+        """Estimate cycles of counts
+        Input: {stage: {op: n}}
+        Output: {stage: cycles, ..., "total": cycles}
+        """
+        ret = {}
+        for stage, ops in counts.items():
+            ret[stage] = sum(self.cost[op] * n for op, n in ops.items())
+        ret["total"] = sum(ret.values())
+        return ret
+
+
+class OpCounter:
+    """
+    Tally of primitive operations per stage
+
+    totals: {stage: {op: n}} of everything counted
+    stage_calls: {stage: number of calls}
+    operations: {name: {"calls": n, "ops": {stage: {op: n}}}} aggregated per
+                operation (square, multiply, expmod_private, ...)
+    last: {name: {stage: {op: n}}} of the latest call of each operation
+    The calls in progress are kept per thread, so an instance shared by
+    threads counts each call on its own.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.totals = {}
+            self.stage_calls = {}
+            self.operations = {}
+            self.last = {}
+            self.local = threading.local()
+
+    def _frames(self) -> list:
+        """Operations in progress in the current thread,
+        [(name, {stage: {op: n}}, nested)]"""
+        local = self.local
+        if not hasattr(local, "frames"):
+            local.frames = []
+        return local.frames
+
+    def add(self, stage: str, ops: dict):
+        """Add the ops of one call of stage"""
+        frames = [f for _, f, nested in self._frames() if not nested]
+        for counts in frames:
+            tally = counts.setdefault(stage, dict.fromkeys(OPS, 0))
+            for op, n in ops.items():
+                tally[op] += n
+        with self.lock:
+            self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+            tally = self.totals.setdefault(stage, dict.fromkeys(OPS, 0))
+            for op, n in ops.items():
+                tally[op] += n
+
+    def begin(self, name: str):
+        """Start a call of operation name
+        A call nested in the same operation, like square calling
+        square_chunked, is merged into the outer call."""
+        frames = self._frames()
+        if frames and frames[-1][0] == name:
+            frames.append((name, frames[-1][1], True))
+        else:
+            frames.append((name, {}, False))
+
+    def end(self, name: str):
+        _, frame, nested = self._frames().pop()
+        if nested:
+            return
+        with self.lock:
+            self.last[name] = frame
+            record = self.operations.setdefault(name, {"calls": 0, "ops": {}})
+            record["calls"] += 1
+            for stage, ops in frame.items():
+                tally = record["ops"].setdefault(stage, dict.fromkeys(OPS, 0))
+                for op, n in ops.items():
+                    tally[op] += n
+
+    def per_call(self, name: str) -> dict:
+        """Average {stage: {op: n}} of one call of operation name"""
+        record = self.operations[name]
+        return {stage: {op: n / record["calls"] for op, n in ops.items()}
+                for stage, ops in record["ops"].items()}
+
+    def export(self, model: CostModel = None) -> dict:
+        """Export all the counts, with cycle estimation if model is given"""
+        ret = {
+            "totals": self.totals,
+            "stage_calls": self.stage_calls,
+            "operations": self.operations,
+            "last": self.last,
+        }
+        if model is not None:
+            ret["cycles"] = {
+                "totals": model.cycles(self.totals),
+                "operations": {name: model.cycles(self.per_call(name))
+                               for name in self.operations},
+            }
+        return ret
+
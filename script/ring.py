@@ -6,6 +6,11 @@
 #               another possible target: 4938 ^ 128 = 1 mod 65537
 #               since 4936 ^ 4 = 2 mod 65537, this give us extra advantages that
 #               most twiddle factors are power of 2
+# N = 1024; chunking l = 11; poly length n = 192; NTT = 64; q = 12289 x 65537
+#  q = 12289 => 6561 = 81 ^ 2, 6561 ^ 64 = 1 mod 12289
+#  q = 65537 => 4080 = 4938 ^ 2, 4080 ^ 64 = 1 mod 65537
+#               4080 ^ 2 = 2 mod 65537
+#  94 chunks of 11 bits, 94 x (2^11 - 1)^2 < 12289 x 65537
 # N = 4096; chunking l = 11; poly length n = 768; NTT = 256; q = 25601 x 65537
 #  q = 25601 => possible target: 233 ^ 256 = 1 mod 25601
 #  q = 65537 => possible target: 141 ^ 256 = 1 mod 65537
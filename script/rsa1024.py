@@ -0,0 +1,39 @@
+from ntt32b import NttRsa32b
+
+
+class NttRsa1024_32b(NttRsa32b):
+    """
+    NTT-RSA 1024-bit key size with on 32-bit processor
+    Used by the half size exponentiations of RSA-CRT on 2048-bit keys
+    """
+
+    def __init__(self, backend: str = "python", kernel: str = "reference"):
+        # q1inv = 45373 = 12289 ** 65535 % 65537
+        super().__init__(1024, 11, 192, 12289, 65537, 64)
+        self.ntt_index = [
+            1, 17, 9, 25, 5, 21, 13, 29, 3, 19, 11, 27, 7, 23, 15, 31,
+            2, 18, 10, 26, 6, 22, 14, 30, 4, 20, 12, 28, 8, 24, 16, 32
+        ]
+
+        self.zetas1 = [
+            1, 6561, 10643, 2625, 5736, 4978, 8785, 2975,
+            4043, 6461, 5860, 7468, 1305, 8961, 2545, 9283,
+            1479, 7698, 11077, 11340, 4134, 1351, 3542, 563,
+            7143, 7266, 3195, 9650, 722, 5777, 3621, 2744,
+            12288, 5728, 1646, 9664, 6553, 7311, 3504, 9314,
+            8246, 5828, 6429, 4821, 10984, 3328, 9744, 3006,
+            10810, 4591, 1212, 949, 8155, 10938, 8747, 11726,
+            5146, 5023, 9094, 2639, 11567, 6512, 8668, 9545
+        ]
+        self.zetas2 = [
+            1, 4080, 2, 8160, 4, 16320, 8, 32640,
+            16, 65280, 32, 65023, 64, 64509, 128, 63481,
+            256, 61425, 512, 57313, 1024, 49089, 2048, 32641,
+            4096, 65282, 8192, 65027, 16384, 64517, 32768, 63497,
+            65536, 61457, 65535, 57377, 65533, 49217, 65529, 32897,
+            65521, 257, 65505, 514, 65473, 1028, 65409, 2056,
+            65281, 4112, 65025, 8224, 64513, 16448, 63489, 32896,
+            61441, 255, 57345, 510, 49153, 1020, 32769, 2040,
+        ]
+
+        self.set_backend(backend, kernel)
@@ -1,15 +1,15 @@
-from nttrsa import NttRsa, CT_BFU, GS_BFU
+from ntt32b import NttRsa32b
+from ntt64b import NttRsa64b
 
 
-class NttRsa2048_32b(NttRsa):
+class NttRsa2048_32b(NttRsa32b):
     """
     NTT-RSA 2048-bit key size with on 32-bit processor
     """
 
-    def __init__(self):
-        super().__init__(2048, 11, 384, 12289, 65537)
-        self.ntt_len = 128
-        self.ntt_round = 7
+    def __init__(self, backend: str = "python", kernel: str = "reference"):
+        # q1inv = 45373 = 12289 ** 65535 % 65537
+        super().__init__(2048, 11, 384, 12289, 65537, 128)
         self.ntt_index = [
             1, 33, 17, 49, 9,  41, 25, 57, 5, 37, 21, 53, 13, 45, 29, 61,
             3, 35, 19, 51, 11, 43, 27, 59, 7, 39, 23, 55, 15, 47, 31, 63,
@@ -54,114 +54,14 @@ class NttRsa2048_32b(NttRsa):
             49153, 34003, 1020, 55948, 32769, 2469, 2040, 46359,
         ]
 
-    def crt(self, x: int, y: int) -> int:
-        """Chinese Remainder Theorem
-        Input: x mod q1, y mod q2
-        Output: z such that z mod q1 = x, z mod q2 = y"""
-        # qinv = 45373 = 12289 ** 65535 % 65537
-        q1inv = 45373
-        return x + (((y-x) * q1inv % self.q2) * self.q1) % self.q
+        self.set_backend(backend, kernel)
 
-    def ntt(self, l: list[int], zetas: list[int], q: int) -> list[int]:
-        assert len(
-            l) == self.len_poly, f"NTT: Length of input list must be {self.len_poly}"
-        assert len(
-            zetas) == self.ntt_len, f"NTT: Length of zetas must be {self.ntt_len}"
 
-        for i, dist in enumerate([192, 96, 48, 24, 12, 6, 3]):
-            zeta_idx = -1 * (1 << i)
-            for start in range(0, len(l), dist * 2):
-                zeta = zetas[self.ntt_index[zeta_idx]]
-                zeta_idx += 1
-
-                for j in range(dist):
-                    # print(f"NTT: {start + j} {start + j + dist} {zeta}")
-                    l[start + j], l[start + j + dist] = CT_BFU(
-                        l[start + j], l[start + j + dist], zeta, q)
-        return l
-
-    def intt(self, l: list[int], zetas: list[int], q: int) -> list[int]:
-        assert len(
-            l) == self.len_poly, f"intt: Length of input list must be {self.len_poly}"
-        assert len(
-            zetas) == self.ntt_len, f"intt: Length of zetas must be {self.ntt_len}"
-
-        for i, dist in enumerate([3, 6, 12, 24, 48, 96, 192]):
-            zeta_idx = -1 * (1 << (6-i))
-            for start in range(0, len(l), dist * 2):
-                idx = self.ntt_index[zeta_idx]
-                zeta = zetas[128-idx]
-                zeta_idx += 1
-
-                for j in range(dist):
-                    # print(f"INTT: {start + j} {start + j + dist} {zeta}")
-                    l[start + j], l[start + j + dist] = GS_BFU(
-                        l[start + j], l[start + j + dist], zeta, q)
-        return l
-
-    def ntt_q1(self, l: list[int]) -> list[int]:
-        """Run NTT on the integer list"""
-        return self.ntt(l[:], self.zetas1, self.q1)
-
-    def intt_q1(self, l: list[int]) -> list[int]:
-        """Run Inverse NTT on the integer list"""
-        return self.intt(l[:], self.zetas1, self.q1)
-
-    def ntt_q2(self, l: list[int]) -> list[int]:
-        """Run NTT on the integer list"""
-        return self.ntt(l[:], self.zetas2, self.q2)
-
-    def intt_q2(self, l: list[int]) -> list[int]:
-        """Run Inverse NTT on the integer list"""
-        return self.intt(l[:], self.zetas2, self.q2)
-
-    def mul_q1(self, a: list[int], b: list[int]) -> list[int]:
-        assert len(
-            a) == self.len_poly, f"mul_q1: Length of input list a must be {self.len_poly}"
-        assert len(
-            b) == self.len_poly, f"mul_q1: Length of input list b must be {self.len_poly}"
-        c = [0] * self.len_poly
-
-        # Multiply a2 x^2 + a1 x + a0 with b2 x^2 + b1 x + b0 Under NTT domain of x^3 - omega
-        for i in range(self.ntt_len):
-            idx = self.ntt_index[i//2] + (64 if i % 2 == 1 else 0)
-            omega = self.zetas1[idx % 128]
-            a0 = a[3*i + 0]
-            a1 = a[3*i + 1]
-            a2 = a[3*i + 2]
-            b0 = b[3*i + 0]
-            b1 = b[3*i + 1]
-            b2 = b[3*i + 2]
-            # c0 = a0b0 + omega(a2b1 +a1b2)
-            # c1 = a1b0 + a0b1 + omega(a2b2)
-            # c2 = a2b0 + a1b1 + a0b2
-            c[3*i + 0] = (a0 * b0 + omega * (a2 * b1 + a1 * b2)) % self.q1
-            c[3*i + 1] = (a1 * b0 + a0 * b1 + omega * (a2 * b2)) % self.q1
-            c[3*i + 2] = (a2 * b0 + a1 * b1 + a0 * b2) % self.q1
-        return c
-
-    def mul_q2(self, a: list[int], b: list[int]) -> list[int]:
-        assert len(
-            a) == self.len_poly, f"mul_q2: Length of input list a must be {self.len_poly}"
-        assert len(
-            b) == self.len_poly, f"mul_q2: Length of input list b must be {self.len_poly}"
-
-        c = [0] * self.len_poly
+class NttRsa2048_64b(NttRsa64b):
+    """
+    NTT-RSA 2048-bit key size on 64-bit processor, the single prime
+    998244353 on the ring of NttRsa2048_32b
+    """
 
-        # Multiply a2 x^2 + a1 x + a0 with b2 x^2 + b1 x + b0 Under NTT domain of x^3 - omega
-        for i in range(self.ntt_len):
-            idx = self.ntt_index[i//2] + (64 if i % 2 == 1 else 0)
-            omega = self.zetas2[idx % 128]
-            a0 = a[3*i + 0]
-            a1 = a[3*i + 1]
-            a2 = a[3*i + 2]
-            b0 = b[3*i + 0]
-            b1 = b[3*i + 1]
-            b2 = b[3*i + 2]
-            # c0 = a0b0 + omega(a2b1 +a1b2)
-            # c1 = a1b0 + a0b1 + omega(a2b2)
-            # c2 = a2b0 + a1b1 + a0b2
-            c[3*i + 0] = (a0 * b0 + omega * (a2 * b1 + a1 * b2)) % self.q2
-            c[3*i + 1] = (a1 * b0 + a0 * b1 + omega * (a2 * b2)) % self.q2
-            c[3*i + 2] = (a2 * b0 + a1 * b1 + a0 * b2) % self.q2
-        return c
+    def __init__(self, backend: str = "python", kernel: str = "reference"):
+        super().__init__(2048, backend, kernel)
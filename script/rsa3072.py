@@ -0,0 +1,11 @@
+from nttplan import NttRsaPlan32b, RINGS
+
+
+class NttRsa3072_32b(NttRsaPlan32b):
+    """
+    NTT-RSA 3072-bit key size with on 32-bit processor
+    Runs on the ring of RSA-4096, 559 product chunks fit the 768 of the ring
+    """
+
+    def __init__(self, backend: str = "python", kernel: str = "reference"):
+        super().__init__(3072, RINGS[4096], backend=backend, kernel=kernel)
@@ -0,0 +1,12 @@
+from nttplan import NttRsaPlan32b, RINGS
+
+
+class NttRsa4096_32b(NttRsaPlan32b):
+    """
+    NTT-RSA 4096-bit key size with on 32-bit processor
+    The tables are derived by nttplan from the ring of ring.py
+    """
+
+    def __init__(self, backend: str = "python", kernel: str = "reference"):
+        # q1inv = 16806 = 25601 ** 65535 % 65537
+        super().__init__(4096, RINGS[4096], backend=backend, kernel=kernel)
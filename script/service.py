@@ -0,0 +1,351 @@
+"""Local RSA signing service with request micro-batching
+
+  python service.py serve --key main=key.json [--unix PATH | --port 8471]
+                          [--workers N] [--max-batch 16] [--deadline-ms 5]
+  python service.py load --key main [--unix PATH | --port 8471] [--op verify]
+                         [--concurrency 8] [--requests 200]
+
+The protocol is one JSON object per line. A request is
+  {"id": 1, "op": "sign" | "decrypt" | "verify" | "metrics", "key": "main",
+   "data": "<hex>", "signature": "<hex>"}
+and the response carries the same id with "result" (hex), "valid" (verify),
+"metrics", or "error". sign and decrypt are the private operation, verify
+checks signature^e mod n == data. The key files are the JSON of bulk.py.
+
+Concurrent requests of the same key and operation are coalesced into one
+batch, dispatched when max-batch requests are waiting or deadline-ms after
+the first one, and run on an executor so the event loop stays responsive.
+Up to one batch per worker runs at a time. Every request of a batch is its
+own exponentiation, batching only amortizes the executor dispatch.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from bulk import Transformer, load_key
+
+# Transformers of the worker process,
+# {(key name, "public" | "private"): Transformer}
+_transformers = {}
+
+
+def build_transformers(keys: dict, kernel: str) -> dict:
+    """Transformers of the operations every key supports"""
+    ret = {}
+    for name, key in keys.items():
+        if "e" in key:
+            ret[(name, "public")] = Transformer(key, "public", kernel)
+        if "d" in key:
+            ret[(name, "private")] = Transformer(key, "private", kernel)
+    return ret
+
+
+def _init_executor(keys: dict, kernel: str):
+    _transformers.update(build_transformers(keys, kernel))
+
+
+def _run_batch(name: str, kind: str, xs: list[int],
+               transformers: dict = None) -> list[int]:
+    """Transform xs with the transformers of the service on the thread
+    executor, or of the worker process if transformers is None
+    Each x is transformed on its own, a batch saves the dispatch of the
+    executor and not the arithmetic"""
+    if transformers is None:
+        transformers = _transformers
+    transformer = transformers[(name, kind)]
+    return [transformer.transform(x) for x in xs]
+
+
+class SigningService:
+    """
+    Micro-batching front end of the RSA operations of a set of keys
+    """
+
+    def __init__(self, keys: dict, workers: int = 0, max_batch: int = 16,
+                 deadline: float = 0.005, kernel: str = "reference"):
+        self.keys = keys
+        self.max_batch = max_batch
+        self.deadline = deadline
+        if workers > 0:
+            self.transformers = None
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_executor,
+                initargs=(keys, kernel))
+        else:
+            # one thread in this process, the event loop stays responsive
+            self.transformers = build_transformers(keys, kernel)
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        # batches on the executor, at most one per worker
+        self.slots = asyncio.Semaphore(max(workers, 1))
+        self.running = set()
+        self.batches_running = 0
+        self.queues = {}
+        self.tasks = []
+        self.metrics = {"requests": 0, "errors": 0, "batches": 0,
+                        "batch_size_total": 0, "batch_size_max": 0,
+                        "batches_running_max": 0, "queue_depth_max": 0}
+
+    def queue(self, name: str, kind: str) -> asyncio.Queue:
+        """Queue of a key and operation, with its batching task"""
+        queue = self.queues.get((name, kind))
+        if queue is None:
+            queue = self.queues[(name, kind)] = asyncio.Queue()
+            self.tasks.append(asyncio.create_task(self._batch_loop(name, kind, queue)))
+        return queue
+
+    async def _batch_loop(self, name: str, kind: str, queue: asyncio.Queue):
+        """Collect the batches of a queue and start each one as a task when
+        a worker is free, the requests keep queueing meanwhile"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            await self.slots.acquire()
+            deadline = loop.time() + self.deadline
+            while len(batch) < self.max_batch:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.metrics["batches"] += 1
+            self.metrics["batch_size_total"] += len(batch)
+            self.metrics["batch_size_max"] = max(self.metrics["batch_size_max"], len(batch))
+            self.batches_running += 1
+            self.metrics["batches_running_max"] = max(
+                self.metrics["batches_running_max"], self.batches_running)
+            task = asyncio.create_task(self._run(name, kind, batch))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    async def _run(self, name: str, kind: str, batch: list[tuple]):
+        """Run a batch on the executor and release its worker"""
+        loop = asyncio.get_running_loop()
+        xs = [x for x, _ in batch]
+        try:
+            results = await loop.run_in_executor(
+                self.executor, _run_batch, name, kind, xs, self.transformers)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.batches_running -= 1
+            self.slots.release()
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def submit(self, name: str, kind: str, x: int) -> int:
+        """Queue x for the operation kind of key name, wait for the result"""
+        if name not in self.keys:
+            raise ValueError(f"Unknown key {name}")
+        if kind == "private" and "d" not in self.keys[name]:
+            raise ValueError(f"Key {name} has no private exponent")
+        if kind == "public" and "e" not in self.keys[name]:
+            raise ValueError(f"Key {name} has no public exponent")
+        if not 0 <= x < self.keys[name]["n"]:
+            raise ValueError("Data is not less than the modulus")
+        queue = self.queue(name, kind)
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((x, future))
+        self.metrics["queue_depth_max"] = max(self.metrics["queue_depth_max"],
+                                              queue.qsize())
+        return await future
+
+    def get_metrics(self) -> dict:
+        ret = dict(self.metrics)
+        ret["batch_size_mean"] = (ret["batch_size_total"] / ret["batches"]
+                                  if ret["batches"] else 0.0)
+        ret["queue_depth"] = {f"{name}/{kind}": queue.qsize()
+                              for (name, kind), queue in self.queues.items()}
+        return ret
+
+    async def handle(self, request: dict) -> dict:
+        """Serve one request"""
+        response = {"id": request.get("id") if isinstance(request, dict) else None}
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            op = request.get("op")
+            if op == "metrics":
+                response["metrics"] = self.get_metrics()
+                return response
+            self.metrics["requests"] += 1
+            name = request.get("key")
+            x = int(request["data"], 16)
+            if op in ("sign", "decrypt"):
+                response["result"] = format(await self.submit(name, "private", x), "x")
+            elif op == "verify":
+                s = int(request["signature"], 16)
+                response["valid"] = await self.submit(name, "public", s) == x
+            else:
+                raise ValueError(f"Unknown operation {op}")
+        except Exception as e:
+            # every request gets a response, asyncio.CancelledError is not
+            # an Exception and still propagates
+            self.metrics["errors"] += 1
+            response["error"] = str(e) or type(e).__name__
+        return response
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter):
+        """Serve the requests of a connection, they may be pipelined and
+        the responses come back as they complete"""
+        lock = asyncio.Lock()
+        pending = set()
+
+        async def serve(line: bytes):
+            try:
+                response = await self.handle(json.loads(line))
+            except json.JSONDecodeError:
+                response = {"id": None, "error": "Malformed request"}
+            async with lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(serve(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.wait(pending)
+        finally:
+            writer.close()
+
+    async def start(self, unix: str = None, host: str = "127.0.0.1",
+                    port: int = 8471) -> asyncio.AbstractServer:
+        if unix is not None:
+            return await asyncio.start_unix_server(self.handle_connection, unix)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def close(self):
+        tasks = self.tasks + list(self.running)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def connect(unix: str = None, host: str = "127.0.0.1", port: int = 8471):
+    if unix is not None:
+        return await asyncio.open_unix_connection(unix)
+    return await asyncio.open_connection(host, port)
+
+
+def percentile(xs: list[float], p: float) -> float:
+    """p-th percentile of xs by the nearest rank"""
+    xs = sorted(xs)
+    rank = math.ceil(len(xs) * p / 100)
+    return xs[min(len(xs), max(rank, 1)) - 1]
+
+
+async def load(key: dict, name: str, op: str = "verify", concurrency: int = 8,
+               requests: int = 200, **address) -> dict:
+    """Load generator, concurrency connections each send requests one after
+    another. sign/decrypt send random data, verify sends a random signature
+    s with data s^e mod n.
+    Output: {"requests", "seconds", "throughput", "p50", "p99"} in seconds
+    """
+    latencies = []
+    per_connection = [requests // concurrency + (i < requests % concurrency)
+                      for i in range(concurrency)]
+
+    async def client(count: int):
+        reader, writer = await connect(**address)
+        try:
+            for i in range(count):
+                s = random.randrange(key["n"])
+                request = {"id": i, "op": op, "key": name}
+                if op == "verify":
+                    request["data"] = format(pow(s, key["e"], key["n"]), "x")
+                    request["signature"] = format(s, "x")
+                else:
+                    request["data"] = format(s, "x")
+                start = time.perf_counter()
+                writer.write(json.dumps(request).encode() + b"\n")
+                await writer.drain()
+                response = json.loads(await reader.readline())
+                latencies.append(time.perf_counter() - start)
+                if "error" in response:
+                    raise RuntimeError(response["error"])
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(count) for count in per_connection))
+    seconds = time.perf_counter() - start
+    return {"requests": len(latencies), "seconds": seconds,
+            "throughput": len(latencies) / seconds,
+            "p50": percentile(latencies, 50), "p99": percentile(latencies, 99)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="RSA signing service")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="run the service")
+    p_serve.add_argument("--key", action="append", required=True,
+                         help="name=key.json, may be repeated")
+    p_serve.add_argument("--workers", type=int, default=0,
+                         help="worker processes, 0 runs on a thread")
+    p_serve.add_argument("--max-batch", type=int, default=16)
+    p_serve.add_argument("--deadline-ms", type=float, default=5.0)
+    p_serve.add_argument("--kernel", default="reference")
+
+    p_load = sub.add_parser("load", help="measure latency and throughput")
+    p_load.add_argument("--key", required=True, help="name=key.json")
+    p_load.add_argument("--op", default="verify",
+                        choices=["sign", "decrypt", "verify"])
+    p_load.add_argument("--concurrency", type=int, default=8)
+    p_load.add_argument("--requests", type=int, default=200)
+
+    for p in (p_serve, p_load):
+        p.add_argument("--unix", help="Unix socket path")
+        p.add_argument("--host", default="127.0.0.1")
+        p.add_argument("--port", type=int, default=8471)
+
+    args = parser.parse_args(argv)
+    address = {"unix": args.unix, "host": args.host, "port": args.port}
+    if args.command == "serve":
+        keys = {}
+        for item in args.key:
+            name, path = item.split("=", 1)
+            keys[name] = load_key(path)
+
+        async def serve():
+            service = SigningService(keys, args.workers, args.max_batch,
+                                     args.deadline_ms / 1000, args.kernel)
+            server = await service.start(**address)
+            async with server:
+                await server.serve_forever()
+
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    name, path = args.key.split("=", 1)
+    result = asyncio.run(load(load_key(path), name, args.op, args.concurrency,
+                              args.requests, **address))
+    print(f"{result['requests']} requests in {result['seconds']:.2f} s, "
+          f"{result['throughput']:.2f} req/s, p50 {result['p50'] * 1e3:.1f} ms, "
+          f"p99 {result['p99'] * 1e3:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import collections
+import functools
+import json
+import threading
+import time
+
+# Stage timing and tracing of NttRsa
+#
+# NttRsa marks the end of every stage (chunk, ntt, basemul, basesqr, intt, crt,
+# lower, high, dechunk) and the begin/end of every operation (square, multiply,
+# expmod_*). Setting NttRsa.tracer to a Tracer records the wall time of them
+# to a sink:
+#   StageStats: in-memory statistics, aggregated per outermost operation
+#   CallbackSink: call a function with every record
+#   TraceFileSink: Chrome trace event JSON, open with chrome://tracing,
+#                  Perfetto or speedscope
+# When NttRsa.tracer and NttRsa.counter are None, the cost is a None check
+# per stage and per operation.
+
+
+class StageStats:
+    """
+    In-memory statistics of the stages and operations
+
+    stages: {stage: {"count", "total", "min", "max"}} in seconds
+    operations: {name: {"count", "total", "min", "max"}}
+    calls: [(name, seconds, {stage: seconds})] of the last max_calls
+           outermost operations, e.g. one entry per expmod_private call
+           with its stage breakdown
+    """
+
+    def __init__(self, max_calls: int = 1000):
+        self.lock = threading.Lock()
+        self.max_calls = max_calls
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.operations = {}
+            self.calls = collections.deque(maxlen=self.max_calls)
+            self.current = {}
+
+    @staticmethod
+    def _update(table: dict, name: str, seconds: float):
+        entry = table.get(name)
+        if entry is None:
+            table[name] = {"count": 1, "total": seconds,
+                           "min": seconds, "max": seconds}
+            return
+        entry["count"] += 1
+        entry["total"] += seconds
+        entry["min"] = min(entry["min"], seconds)
+        entry["max"] = max(entry["max"], seconds)
+
+    def record(self, kind: str, name: str, start: float, end: float, depth: int):
+        seconds = end - start
+        with self.lock:
+            if kind == "stage":
+                self._update(self.stages, name, seconds)
+                key = threading.get_ident()
+                breakdown = self.current.setdefault(key, {})
+                breakdown[name] = breakdown.get(name, 0.0) + seconds
+                return
+            self._update(self.operations, name, seconds)
+            if depth == 0:
+                breakdown = self.current.pop(threading.get_ident(), {})
+                self.calls.append((name, seconds, breakdown))
+
+    def close(self):
+        pass
+
+
+class CallbackSink:
+    """
+    Call callback(kind, name, start, end, depth) for every record, kind is
+    "stage" or "operation", start and end are time.perf_counter() seconds
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record(self, kind: str, name: str, start: float, end: float, depth: int):
+        self.callback(kind, name, start, end, depth)
+
+    def close(self):
+        pass
+
+
+class TraceFileSink:
+    """
+    Write Chrome trace event format, one complete ("X") event per record
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "w")
+        self.file.write("[\n")
+        self.first = True
+        self.lock = threading.Lock()
+        self.pid = 1
+
+    def record(self, kind: str, name: str, start: float, end: float, depth: int):
+        event = {
+            "name": name, "cat": kind, "ph": "X",
+            "ts": start * 1e6, "dur": (end - start) * 1e6,
+            "pid": self.pid, "tid": threading.get_ident(),
+        }
+        with self.lock:
+            if not self.first:
+                self.file.write(",\n")
+            self.first = False
+            self.file.write(json.dumps(event))
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.write("\n]\n")
+                self.file.close()
+
+
+class Tracer:
+    """
+    Time the stages and operations marked by NttRsa and send them to sink
+    A stage lasts from the previous mark in the same thread to its own mark,
+    stages outside of any operation are ignored. A call nested in the same
+    operation, like square calling square_chunked, is merged into the outer
+    call.
+    """
+
+    def __init__(self, sink=None):
+        self.sink = sink if sink is not None else StageStats()
+        self.local = threading.local()
+
+    def _state(self):
+        local = self.local
+        if not hasattr(local, "stack"):
+            local.stack = []
+            local.last = 0.0
+        return local
+
+    def begin(self, name: str):
+        state = self._state()
+        now = time.perf_counter()
+        nested = bool(state.stack) and state.stack[-1][0] == name
+        state.stack.append((name, now, nested))
+        state.last = now
+
+    def stage(self, name: str):
+        state = self._state()
+        if not state.stack:
+            return
+        now = time.perf_counter()
+        self.sink.record("stage", name, state.last, now, len(state.stack))
+        state.last = now
+
+    def end(self, name: str):
+        state = self._state()
+        now = time.perf_counter()
+        _, start, nested = state.stack.pop()
+        if nested:
+            return
+        self.sink.record("operation", name, start, now, len(state.stack))
+        state.last = now
+
+    def close(self):
+        self.sink.close()
+
+
+def operation(name: str):
+    """Decorator of NttRsa methods, records the method as operation name
+    to NttRsa.counter and NttRsa.tracer if they are set"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            counter = self.counter
+            tracer = self.tracer
+            if counter is None and tracer is None:
+                return method(self, *args, **kwargs)
+            if counter is not None:
+                counter.begin(name)
+            if tracer is not None:
+                tracer.begin(name)
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                if tracer is not None:
+                    tracer.end(name)
+                if counter is not None:
+                    counter.end(name)
+        return wrapper
+    return decorator
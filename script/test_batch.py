@@ -0,0 +1,39 @@
+import unittest
+from batch import expmod_batch, chunks
+import random
+
+
+class TestBatch(unittest.TestCase):
+    def test_chunks(self):
+        jobs = [(1, 2, 7), (3, 4, 11), (5, 6, 7), (7, 8, 7)]
+        self.assertEqual(chunks(jobs, 2), [
+            (7, [(0, 1, 2), (2, 5, 6)]),
+            (7, [(3, 7, 8)]),
+            (11, [(1, 3, 4)]),
+        ])
+
+    def test_chunks_per_modulus(self):
+        jobs = [(1, 1, 7)] * 16 + [(1, 1, 11)] * 2
+        tasks = chunks(jobs, workers=2)
+        self.assertEqual([len(c) for p, c in tasks if p == 7], [2] * 8)
+        self.assertEqual([len(c) for p, c in tasks if p == 11], [1, 1])
+
+    def test_expmod_batch(self):
+        moduli = [random.getrandbits(1023) | 1 for _ in range(2)]
+        jobs = []
+        for _ in range(6):
+            p = random.choice(moduli)
+            jobs.append((random.getrandbits(1023), random.getrandbits(16), p))
+        gold = [pow(a, e, p) for a, e, p in jobs]
+
+        for workers in (1, 2):
+            self.assertEqual(expmod_batch(jobs, workers=workers, bits=1024,
+                                          sliding=True, chunksize=2), gold)
+
+    def test_invalid_modulus(self):
+        with self.assertRaises(ValueError):
+            expmod_batch([(2, 3, 1 << 1024 | 1)], workers=1, bits=1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
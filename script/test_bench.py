@@ -0,0 +1,33 @@
+import unittest
+import bench
+import random
+
+
+class TestBench(unittest.TestCase):
+    def test_schoolbook_polymul(self):
+        a = [random.randrange(1 << 11) for _ in range(12)]
+        b = [random.randrange(1 << 11) for _ in range(12)]
+        # no wrap around with the upper half zero
+        a[6:] = b[6:] = [0] * 6
+        c = bench.schoolbook_polymul(a, b)
+        x = sum(v << (11 * i) for i, v in enumerate(a))
+        y = sum(v << (11 * i) for i, v in enumerate(b))
+        self.assertEqual(sum(v << (11 * i) for i, v in enumerate(c)), x * y)
+
+    def test_run(self):
+        result = bench.run(["1024"], ["python"], ["chunk", "mul_q1", "pow_public"],
+                           repeat=1, min_time=0.001)
+        stages = result["results"]["1024/python"]
+        self.assertEqual(set(stages), {"chunk", "mul_q1", "pow_public"})
+        self.assertGreater(stages["mul_q1"]["seconds"], 0)
+
+    def test_compare(self):
+        def result(seconds):
+            return {"results": {"2048/python": {"ntt_q1": {"seconds": seconds}}}}
+        self.assertEqual(bench.compare(result(1.0), result(1.05), 0.1), [])
+        regressions = bench.compare(result(1.0), result(1.5), 0.1)
+        self.assertEqual([r[:2] for r in regressions], [("2048/python", "ntt_q1")])
+
+
+if __name__ == '__main__':
+    unittest.main()
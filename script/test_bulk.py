@@ -0,0 +1,73 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+import bulk
+from testkeys import getkey
+import random
+
+
+class TestBulk(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.key = getkey(2048)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmp.name, name)
+
+    def write_blocks(self, name: str, xs: list[int]):
+        with open(self.path(name), "wb") as f:
+            for x in xs:
+                f.write(x.to_bytes(bulk.BLOCK, "big"))
+
+    def read_blocks(self, name: str) -> list[int]:
+        with open(self.path(name), "rb") as f:
+            data = f.read()
+        return [int.from_bytes(data[i:i + bulk.BLOCK], "big")
+                for i in range(0, len(data), bulk.BLOCK)]
+
+    def test_load_key(self):
+        with open(self.path("key.json"), "w") as f:
+            json.dump(self.key, f)
+        key = bulk.load_key(self.path("key.json"))
+        p, q = self.key["p"], self.key["q"]
+        self.assertEqual(key["d"] * key["e"] % ((p - 1) * (q - 1)), 1)
+        self.assertEqual(key["qinv"] * q % p, 1)
+
+    def test_public(self):
+        n, e = self.key["n"], self.key["e"]
+        xs = [random.randrange(n) for _ in range(3)]
+        self.write_blocks("in", xs)
+        result = bulk.run(self.key, "public", self.path("in"), self.path("out"),
+                          batch=2, workers=2)
+        self.assertEqual(result["blocks"], 3)
+        self.assertEqual(self.read_blocks("out"), [pow(x, e, n) for x in xs])
+
+    def test_private_crt(self):
+        with open(self.path("key.json"), "w") as f:
+            json.dump(self.key, f)
+        key = bulk.load_key(self.path("key.json"))
+        m = random.randrange(key["n"])
+        self.write_blocks("in", [pow(m, key["e"], key["n"])])
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            bulk.main(["private", self.path("key.json"), self.path("in"),
+                       self.path("out"), "--kernel", "lazy", "--quiet"])
+        self.assertEqual(self.read_blocks("out"), [m])
+        self.assertTrue(stderr.getvalue().startswith("1 blocks in"))
+
+    def test_invalid_input(self):
+        with open(self.path("in"), "wb") as f:
+            f.write(b"\x00" * (bulk.BLOCK + 1))
+        with self.assertRaises(ValueError):
+            bulk.run(self.key, "public", self.path("in"), self.path("out"))
+
+
+if __name__ == '__main__':
+    unittest.main()
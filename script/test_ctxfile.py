@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+import ctxfile
+from rsa1024 import NttRsa1024_32b
+import random
+
+
+class TestCtxFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "ctx.bin")
+
+    def test_context(self):
+        rsa = NttRsa1024_32b()
+        p = random.getrandbits(1023) | 1
+        ctxfile.save_context(rsa, rsa.context(p), self.path)
+
+        other = NttRsa1024_32b(kernel="lazy")
+        ctx = ctxfile.load_context(other, self.path)
+        self.assertEqual(ctx.p, p)
+        self.assertEqual(list(ctx.pm1), list(rsa.context(p).pm1))
+        # cached, setp does not recompute
+        other.setp(p)
+        self.assertIs(other.ctx, ctx)
+        self.assertEqual(other.cache_misses, 0)
+        a = random.getrandbits(1023) % p
+        self.assertEqual(other.expmod_public(a, 65537), pow(a, 65537, p))
+
+    def test_params(self):
+        rsa = NttRsa1024_32b()
+        ctxfile.save_params(rsa, self.path)
+        for kernel in ("reference", "fermat", "lazy", "merged"):
+            loaded = ctxfile.load_params(NttRsa1024_32b(kernel=kernel), self.path)
+            self.assertIsInstance(loaded.zetas1, memoryview)
+            xs = [random.randrange(12289) for _ in range(192)]
+            self.assertEqual(loaded.ntt_q1(xs), rsa.ntt_q1(xs))
+            self.assertEqual(loaded.intt_q2(xs), rsa.intt_q2(xs))
+            self.assertEqual(loaded.mul_q2(xs, xs), rsa.mul_q2(xs, xs))
+
+    def test_invalid(self):
+        rsa = NttRsa1024_32b()
+        ctxfile.save_context(rsa, rsa.context(random.getrandbits(1023) | 1),
+                             self.path)
+        with self.assertRaises(ValueError):
+            ctxfile.load_params(rsa, self.path)
+        with open(self.path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([byte[0] ^ 1]))
+        with self.assertRaises(ValueError):
+            ctxfile.load_context(rsa, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
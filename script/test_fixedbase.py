@@ -0,0 +1,41 @@
+import unittest
+from fixedbase import FixedBase
+from rsa1024 import NttRsa1024_32b
+import random
+
+
+class TestFixedBase(unittest.TestCase):
+    def setUp(self):
+        self.rsa = NttRsa1024_32b(kernel="lazy")
+        self.p = random.getrandbits(1023) | 1
+        self.rsa.setp(self.p)
+        self.a = random.getrandbits(1023) % self.p
+
+    def test_expmod(self):
+        for teeth, blocks in ((1, 1), (4, 1), (3, 2), (5, 3)):
+            base = FixedBase(self.rsa, self.a, teeth=teeth, blocks=blocks,
+                             nbits=64)
+            for e in (0, 1, (1 << 64) - 1, random.getrandbits(64)):
+                self.assertEqual(base.expmod(e), pow(self.a, e, self.p))
+
+    def test_stats(self):
+        base = FixedBase(self.rsa, self.a, teeth=8, blocks=2, nbits=256)
+        stats = {}
+        e = random.getrandbits(256)
+        self.assertEqual(base.expmod(e, stats), pow(self.a, e, self.p))
+        # 256 / 8 / 2 = 16 rows
+        self.assertEqual(stats, {"squares": 15, "multiplies": 33})
+        with self.assertRaises(ValueError):
+            base.expmod(1 << 256)
+
+    def test_max_bytes(self):
+        entry = 2 * 192 * 4
+        base = FixedBase(self.rsa, self.a, nbits=32, max_bytes=64 * entry)
+        self.assertEqual(base.teeth, 6)
+        self.assertLessEqual(base.table_bytes(), 64 * entry)
+        with self.assertRaises(ValueError):
+            FixedBase(self.rsa, self.a, teeth=7, nbits=32, max_bytes=64 * entry)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+import limbs
+import random
+
+
+class TestLimbs(unittest.TestCase):
+    def test_chunk(self):
+        for l, n in ((11, 384), (11, 190), (8, 4), (16, 64)):
+            a = random.getrandbits(l * n + 20)
+            self.assertEqual(limbs.chunk(a, l, n),
+                             [(a >> (i * l)) & ((1 << l) - 1) for i in range(n)])
+
+    def test_dechunk(self):
+        for l, n in ((11, 384), (11, 190), (8, 4)):
+            # unnormalized limbs, like the output of crts
+            xs = [random.getrandbits(30) for _ in range(n)]
+            self.assertEqual(limbs.dechunk(xs, l),
+                             sum(x << (i * l) for i, x in enumerate(xs)))
+
+    def test_lower(self):
+        for N, l in ((2048, 11), (1024, 11), (1023, 11), (64, 8)):
+            n = (N + l - 1) // l + 5
+            xs = [random.getrandbits(30) for _ in range(n)]
+            t = sum(x << (i * l) for i, x in enumerate(xs))
+            self.assertEqual(limbs.lower(xs, l, N),
+                             limbs.chunk(t % (1 << N), l, n))
+
+    def test_crts(self):
+        q1, q2 = 12289, 65537
+        xs = [random.randrange(q1) for _ in range(100)]
+        ys = [random.randrange(q2) for _ in range(100)]
+        for z, x, y in zip(limbs.crts(xs, ys, q1, q2, pow(q1, -1, q2)), xs, ys):
+            self.assertTrue(0 <= z < q1 * q2)
+            self.assertEqual((z % q1, z % q2), (x, y))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from montint import MontInt
+from rsa1024 import NttRsa1024_32b
+from rsa2048 import NttRsa2048_32b
+from stagetrace import StageStats, Tracer
+import random
+
+
+class TestMontInt(unittest.TestCase):
+    def setUp(self):
+        self.rsa = NttRsa1024_32b(kernel="lazy")
+        self.p = random.getrandbits(1023) | 1
+        self.ctx = self.rsa.context(self.p)
+        self.a = random.getrandbits(1023) % self.p
+        self.b = random.getrandbits(1023) % self.p
+
+    def test_arithmetic(self):
+        p = self.p
+        x = MontInt(self.rsa, self.a, self.ctx)
+        y = MontInt(self.rsa, self.b, self.ctx)
+        self.assertEqual(int(x), self.a)
+        self.assertEqual(int(x * y), self.a * self.b % p)
+        self.assertEqual(int(x.square()), self.a * self.a % p)
+        self.assertEqual(int(x * x), self.a * self.a % p)
+        self.assertEqual(int(3 * x * 5), 15 * self.a % p)
+        e = random.getrandbits(64)
+        self.assertEqual(int(x ** e), pow(self.a, e, p))
+        self.assertEqual(int(x.pow(65537, sliding=True)), pow(self.a, 65537, p))
+        self.assertEqual(int(x ** 0), 1)
+        with self.assertRaises(ValueError):
+            x ** -1
+
+    def test_eq(self):
+        x = MontInt(self.rsa, self.a, self.ctx)
+        y = MontInt(self.rsa, self.b, self.ctx)
+        self.assertEqual(x * y, y * x)
+        self.assertEqual((x * y) * x, x.square() * y)
+        self.assertEqual(x ** 2, x.square())
+        self.assertEqual(x, MontInt(self.rsa, self.a + self.p, self.ctx))
+        self.assertNotEqual(x, self.a)
+        self.assertNotEqual(x, y)
+        self.assertEqual(len({x * y, y * x}), 1)
+
+        other = MontInt(self.rsa, self.a, self.rsa.context(self.p + 2))
+        self.assertNotEqual(x, other)
+        with self.assertRaises(ValueError):
+            x * other
+
+        # R = 2^2048 under the same p, equal values but no mixed products
+        wide = NttRsa2048_32b()
+        z = MontInt(wide, self.a, wide.context(self.p))
+        self.assertEqual(x, z)
+        self.assertEqual(len({x, z}), 1)
+        with self.assertRaises(ValueError):
+            x * z
+
+    def test_no_conversion(self):
+        x = MontInt(self.rsa, self.a, self.ctx)
+        y = MontInt(self.rsa, self.b, self.ctx)
+        self.rsa.tracer = Tracer(StageStats())
+        z = (x * y * x).square()
+        self.assertEqual(self.rsa.tracer.sink.operations["multiply"]["count"], 2)
+        self.assertEqual(self.rsa.tracer.sink.operations["square"]["count"], 1)
+        self.rsa.tracer = None
+        self.assertEqual(int(z), pow(self.a, 4, self.p) * pow(self.b, 2, self.p) % self.p)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from ntt64b import NttRsa64b, PRIMES, prime_for
+from rsa2048 import NttRsa2048_32b, NttRsa2048_64b
+from testkeys import getkey
+import random
+
+
+class TestNttRsa64b(unittest.TestCase):
+    def setUp(self):
+        self.rsa = NttRsa2048_64b()
+
+    def test_prime_for(self):
+        self.assertEqual(prime_for(2048), PRIMES[0])
+        self.assertEqual(prime_for(4096), PRIMES[1])
+        self.assertEqual(self.rsa.q1, PRIMES[0])
+        with self.assertRaises(ValueError):
+            prime_for(8192)
+
+    def test_multiply_q1(self):
+        a = [random.randrange(1 << 11) for _ in range(384)]
+        b = [random.randrange(1 << 11) for _ in range(384)]
+        c = self.rsa.intt_q1(self.rsa.mul_q1(self.rsa.ntt_q1(a), self.rsa.ntt_q1(b)))
+        for k in (0, 1, 191, 383):
+            self.assertEqual(sum(a[i] * b[(k - i) % 384] for i in range(384)),
+                             c[k])
+        # the q2 channel and the CRT pass the q1 channel through
+        self.assertEqual(self.rsa.crts(c, self.rsa.ntt_q2(b)), c)
+
+    def test_kernels(self):
+        xs = [random.randrange(self.rsa.q1) for _ in range(384)]
+        for kernel in ("lazy", "merged"):
+            rsa = NttRsa2048_64b(kernel=kernel)
+            rsa.check_bounds = True
+            self.assertEqual(rsa.ntt_q1(xs), self.rsa.ntt_q1(xs))
+            self.assertEqual(rsa.intt_q1(xs), self.rsa.intt_q1(xs))
+        with self.assertRaises(ValueError):
+            NttRsa2048_64b(kernel="fermat")
+        with self.assertRaises(ValueError):
+            NttRsa2048_64b(backend="numpy")
+
+    def test_expmod(self):
+        for rsa in (self.rsa, NttRsa64b(4096, kernel="lazy")):
+            p = random.getrandbits(rsa.N) | 1 | (1 << (rsa.N - 1))
+            rsa.setp(p)
+            a = random.randrange(p)
+            b = random.randrange(p)
+            self.assertEqual(rsa.multiply(a, b), a * b * pow(1 << rsa.N, -1, p) % p)
+            self.assertEqual(rsa.expmod_public(a, 65537), pow(a, 65537, p))
+
+    def test_decrypt_crt(self):
+        rsa = NttRsa64b(1024, kernel="lazy")
+        key = getkey(2048)
+        n, e, p, q = key["n"], key["e"], key["p"], key["q"]
+        d = pow(e, -1, (p - 1) * (q - 1))
+        m = random.randrange(n)
+        self.assertEqual(rsa.decrypt_crt(pow(m, e, n), p, q, d % (p - 1),
+                                         d % (q - 1), pow(q, -1, p)), m)
+
+    def test_stage_ops(self):
+        ref = NttRsa2048_32b()
+        self.assertEqual(self.rsa.stage_ops("ntt")["mul"] * 2,
+                         ref.stage_ops("ntt")["mul"])
+        self.assertEqual(self.rsa.stage_ops("crt")["mul"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
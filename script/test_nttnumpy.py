@@ -0,0 +1,97 @@
+import unittest
+from rsa2048 import *
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestNttNumpy(unittest.TestCase):
+    def setUp(self):
+        self.ref = NttRsa2048_32b()
+        self.rsa = NttRsa2048_32b(backend="numpy")
+
+    def test_ntt(self):
+        xs = [random.randrange(1 << 11) for _ in range(384)]
+        self.assertEqual(list(self.rsa.ntt_q1(xs)), self.ref.ntt_q1(xs))
+        self.assertEqual(list(self.rsa.ntt_q2(xs)), self.ref.ntt_q2(xs))
+
+    def test_intt(self):
+        xs = [random.randrange(12289) for _ in range(384)]
+        ys = [random.randrange(65537) for _ in range(384)]
+        self.assertEqual(list(self.rsa.intt_q1(xs)), self.ref.intt_q1(xs))
+        self.assertEqual(list(self.rsa.intt_q2(ys)), self.ref.intt_q2(ys))
+
+    def test_mul(self):
+        a = [random.randrange(65537) for _ in range(384)]
+        b = [random.randrange(65537) for _ in range(384)]
+        a1 = [x % 12289 for x in a]
+        b1 = [x % 12289 for x in b]
+        self.assertEqual(list(self.rsa.mul_q1(a1, b1)), self.ref.mul_q1(a1, b1))
+        self.assertEqual(list(self.rsa.mul_q2(a, b)), self.ref.mul_q2(a, b))
+        self.assertEqual(list(self.rsa.sqr_q1(a1)), self.ref.sqr_q1(a1))
+        self.assertEqual(list(self.rsa.sqr_q2(a)), self.ref.sqr_q2(a))
+
+    def test_crts(self):
+        xs = [random.randrange(12289) for _ in range(384)]
+        ys = [random.randrange(65537) for _ in range(384)]
+        self.assertEqual(self.rsa.crts(xs, ys), self.ref.crts(xs, ys))
+
+    def test_limbs_batch(self):
+        a_s = [random.getrandbits(2048) for _ in range(4)]
+        xss = [[random.randrange(12289 * 65537) for _ in range(384)]
+               for _ in range(4)]
+        self.assertEqual(self.rsa.chunk_batch(a_s).tolist(),
+                         self.ref.chunk_batch(a_s))
+        self.assertEqual(self.rsa.dechunk_batch(xss), self.ref.dechunk_batch(xss))
+        self.assertEqual(self.rsa.lower_batch(xss).tolist(),
+                         self.ref.lower_batch(xss))
+
+    def test_mul_batch_shared(self):
+        # one operand shared by the batch is broadcast, not repeated
+        a_s = [[random.randrange(12289) for _ in range(384)] for _ in range(3)]
+        b = [random.randrange(12289) for _ in range(384)]
+        gold = [self.ref.mul_q1(a, b) for a in a_s]
+        self.assertEqual(self.ref.mul_q1_batch(a_s, b), gold)
+        self.assertEqual(self.rsa.mul_q1_batch(a_s, b).tolist(), gold)
+
+    def test_multiply(self):
+        p = random.getrandbits(2047) | 1
+        while (a := random.getrandbits(2047)) > p:
+            pass
+        while (b := random.getrandbits(2047)) > p:
+            pass
+
+        self.rsa.setp(p)
+        gold = (a * b * pow(1 << 2048, -1, p)) % p
+        self.assertEqual(self.rsa.multiply(a, b), gold)
+        self.assertEqual(self.rsa.square(a), a * a * pow(1 << 2048, -1, p) % p)
+
+    def test_multiply_batch(self):
+        p = random.getrandbits(2047) | 1
+        a_s = [random.getrandbits(2047) % p for _ in range(16)]
+        bs = [random.getrandbits(2047) % p for _ in range(16)]
+
+        self.rsa.setp(p)
+        rinv = pow(1 << 2048, -1, p)
+        self.assertEqual(self.rsa.multiply_batch(a_s, bs),
+                         [a * b * rinv % p for a, b in zip(a_s, bs)])
+        self.assertEqual(self.rsa.square_batch(a_s),
+                         [a * a * rinv % p for a in a_s])
+        self.assertEqual(self.rsa.multiply_batch([], []), [])
+        self.assertEqual(self.rsa.square_batch([]), [])
+
+    def test_expmod_public(self):
+        p = random.getrandbits(2047) | 1
+        while (a := random.getrandbits(2047)) > p:
+            pass
+
+        self.rsa.setp(p)
+        self.assertEqual(self.rsa.expmod_public(a, 65537), pow(a, 65537, p))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import nttplan
+from rsa1024 import NttRsa1024_32b
+from rsa2048 import NttRsa2048_32b
+
+
+class TestNttPlan(unittest.TestCase):
+    def test_tables(self):
+        # the plan reproduces the hand written tables
+        for rsa in (NttRsa1024_32b(), NttRsa2048_32b()):
+            tables = nttplan.plan(rsa.N, rsa.l, rsa.len_poly, rsa.ntt_len,
+                                  rsa.q1, rsa.q2, rsa.zetas1[1], rsa.zetas2[1])
+            self.assertEqual(tables["ntt_index"], rsa.ntt_index)
+            self.assertEqual(tables["zetas1"], rsa.zetas1)
+            self.assertEqual(tables["zetas2"], rsa.zetas2)
+            self.assertEqual(tables["ntt_dists"], rsa.ntt_dists)
+            self.assertEqual(tables["q1inv"], rsa.q1inv)
+
+    def test_root_of_unity(self):
+        w = nttplan.root_of_unity(25601, 256)
+        self.assertEqual(pow(w, 256, 25601), 1)
+        self.assertNotEqual(pow(w, 128, 25601), 1)
+        with self.assertRaises(ValueError):
+            nttplan.root_of_unity(12289, 8192)
+        with self.assertRaises(ValueError):
+            nttplan.zetas(4080, 65537, 128)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            # 2 * 373 - 1 chunks do not fit 384
+            nttplan.plan(4096, 11, 384, 128, 12289, 65537)
+        with self.assertRaises(ValueError):
+            # 373 * 2047^2 exceeds 12289 * 65537
+            nttplan.plan(4096, 11, 768, 256, 12289, 65537)
+        with self.assertRaises(ValueError):
+            nttplan.plan(2048, 11, 384, 96, 12289, 65537)
+
+    def test_ring_for(self):
+        self.assertEqual(nttplan.ring_for(1024), nttplan.RINGS[1024])
+        self.assertEqual(nttplan.ring_for(1536), nttplan.RINGS[2048])
+        self.assertEqual(nttplan.ring_for(3072), nttplan.RINGS[4096])
+        with self.assertRaises(ValueError):
+            nttplan.ring_for(8192)
+
+
+if __name__ == '__main__':
+    unittest.main()
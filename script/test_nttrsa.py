@@ -1,5 +1,5 @@
 import unittest
-from nttrsa import NttRsa
+from nttrsa import NttRsa, fermat_reduce, fermat_mul2k, sliding_windows
 import random  # Add import for random
 
 
@@ -44,5 +44,29 @@ class TestNttRsa(unittest.TestCase):
         self.assertEqual((p * pinv) % modulus, 1)
 
 
+class TestFermat(unittest.TestCase):
+    def test_fermat_reduce(self):
+        for x in [0, 65536, 65537, 1 << 32, (1 << 32) - 1] + \
+                [random.randrange(1 << 32) for _ in range(1000)]:
+            self.assertEqual(fermat_reduce(x), x % 65537)
+
+    def test_fermat_mul2k(self):
+        for b in [0, 1, 65535, 65536] + [random.randrange(65537) for _ in range(100)]:
+            for s in range(64):
+                self.assertEqual(fermat_mul2k(b, s), (b << s) % 65537)
+
+
+class TestWindow(unittest.TestCase):
+    def test_sliding_windows(self):
+        self.assertEqual(sliding_windows(65537, 4), [(16, 1), (0, 1)])
+        self.assertEqual(sliding_windows(0b1101100, 3), [(5, 3), (2, 3)])
+        for _ in range(100):
+            e = random.getrandbits(200)
+            k = random.randint(1, 7)
+            windows = sliding_windows(e, k)
+            self.assertEqual(sum(v << s for s, v in windows), e)
+            self.assertTrue(all(v & 1 and v < (1 << k) for _, v in windows))
+
+
 if __name__ == "__main__":
     unittest.main()
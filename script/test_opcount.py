@@ -0,0 +1,93 @@
+import unittest
+from opcount import OpCounter, CostModel
+from rsa1024 import NttRsa1024_32b
+import random
+import threading
+
+
+class TestOpCounter(unittest.TestCase):
+    def test_nested(self):
+        counter = OpCounter()
+        counter.begin("expmod")
+        counter.begin("square")
+        counter.begin("square")  # merged into the outer square
+        counter.add("ntt", {"mul": 2})
+        counter.end("square")
+        counter.end("square")
+        counter.add("chunk", {"shift": 1})
+        counter.end("expmod")
+
+        self.assertEqual(counter.operations["square"]["calls"], 1)
+        self.assertEqual(counter.last["square"]["ntt"]["mul"], 2)
+        self.assertEqual(counter.last["expmod"]["ntt"]["mul"], 2)
+        self.assertEqual(counter.last["expmod"]["chunk"]["shift"], 1)
+        self.assertEqual(counter.totals["ntt"]["mul"], 2)
+        self.assertEqual(counter.stage_calls, {"ntt": 1, "chunk": 1})
+
+    def test_threads(self):
+        # a call in progress in another thread does not count here
+        counter = OpCounter()
+        counter.begin("square")
+        other = threading.Thread(target=lambda: (
+            counter.begin("multiply"), counter.add("ntt", {"mul": 5}),
+            counter.end("multiply")))
+        other.start()
+        other.join()
+        counter.add("ntt", {"mul": 2})
+        counter.end("square")
+
+        self.assertEqual(counter.last["square"]["ntt"]["mul"], 2)
+        self.assertEqual(counter.last["multiply"]["ntt"]["mul"], 5)
+        self.assertEqual(counter.totals["ntt"]["mul"], 7)
+
+    def test_cost_model(self):
+        model = CostModel(mul=2, mod=10)
+        cycles = model.cycles({"ntt": {"mul": 3, "mod": 1, "add": 4}})
+        self.assertEqual(cycles, {"ntt": 20, "total": 20})
+
+
+class TestNttRsaCount(unittest.TestCase):
+    def setUp(self):
+        self.rsa = NttRsa1024_32b()
+        self.rsa.setp(random.getrandbits(1023) | 1)
+        self.rsa.counter = OpCounter()
+
+    def test_square(self):
+        self.rsa.square(random.getrandbits(1000))
+        ops = self.rsa.counter.last["square"]
+        # 3 pairs of NTT with 6 rounds of 96 butterflies
+        self.assertEqual(ops["ntt"]["mul"], 3 * 2 * 6 * 96)
+        self.assertEqual(self.rsa.counter.stage_calls["ntt"], 3)
+        self.assertEqual(self.rsa.counter.stage_calls["crt"], 3)
+        self.assertEqual(self.rsa.counter.stage_calls["chunk"], 1)
+        self.assertEqual(self.rsa.counter.stage_calls["dechunk"], 1)
+
+    def test_expmod_public(self):
+        self.rsa.expmod_public(random.getrandbits(1000), 17)
+        self.assertEqual(self.rsa.counter.operations["square"]["calls"], 4)
+        # aR, the low set bit and the conversion back, the top bit is aR
+        self.assertEqual(self.rsa.counter.operations["multiply"]["calls"], 3)
+        export = self.rsa.counter.export(CostModel())
+        self.assertGreater(export["cycles"]["operations"]["expmod_public"]["total"],
+                           export["cycles"]["operations"]["square"]["total"] * 4)
+
+    def test_kernel_counts(self):
+        lazy = NttRsa1024_32b(kernel="lazy")
+        ref = self.rsa.stage_ops("ntt")
+        self.assertLess(lazy.stage_ops("ntt")["mod"], ref["mod"])
+        fermat = NttRsa1024_32b(kernel="fermat")
+        self.assertLess(fermat.stage_ops("ntt")["mul"], ref["mul"])
+        with self.assertRaises(ValueError):
+            self.rsa.stage_ops("unknown")
+
+    def test_basesqr_counts(self):
+        # 2 channels of 64 blocks, 8 multiplications and 5 additions each
+        ops = self.rsa.stage_ops("basesqr")
+        self.assertEqual(ops["mul"], 2 * 64 * 8)
+        self.assertEqual(ops["add"], 2 * 64 * 5)
+        self.assertEqual(ops["shift"], 0)
+        self.assertLess(ops["mul"], self.rsa.stage_ops("basemul")["mul"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+import unittest
+from rsa1024 import *
+from testkeys import getkey
+import random
+import threading
+
+
+class TestNttRsa1024_32b(unittest.TestCase):
+    def setUp(self):
+        self.rsa = NttRsa1024_32b()
+
+    def test_nttq1_x3(self):
+        xs = [1 if i == 3 else 0 for i in range(192)]
+        ys = self.rsa.ntt_q1(xs)
+        for i, p in enumerate(self.rsa.ntt_index):
+            self.assertEqual(ys[i*6], pow(6561, p, 12289))
+            self.assertEqual(ys[i*6+3], pow(6561, p+32, 12289))
+
+    def test_nttq2_x3(self):
+        xs = [1 if i == 3 else 0 for i in range(192)]
+        ys = self.rsa.ntt_q2(xs)
+        for i, p in enumerate(self.rsa.ntt_index):
+            self.assertEqual(ys[i*6], pow(4080, p, 65537))
+            self.assertEqual(ys[i*6+3], pow(4080, p+32, 65537))
+
+    def test_multiply_q1_q2(self):
+        a = [random.randrange(1 << 11) for _ in range(192)]
+        b = [random.randrange(1 << 11) for _ in range(192)]
+
+        # Schoolbook multiplication modulo x^192 - 1
+        c_schoolbook = [0] * 192
+        for i in range(192):
+            for j in range(192):
+                c_schoolbook[(i + j) % 192] += a[i] * b[j]
+
+        c1 = self.rsa.intt_q1(self.rsa.mul_q1(self.rsa.ntt_q1(a), self.rsa.ntt_q1(b)))
+        c2 = self.rsa.intt_q2(self.rsa.mul_q2(self.rsa.ntt_q2(a), self.rsa.ntt_q2(b)))
+        for i in range(192):
+            self.assertEqual(c_schoolbook[i] % self.rsa.q1, c1[i])
+            self.assertEqual(c_schoolbook[i] % self.rsa.q2, c2[i])
+
+    def test_sqr_q1_q2(self):
+        a = [random.randrange(12289) for _ in range(192)]
+        b = [random.randrange(12289) for _ in range(192)]
+        for q, mul, sqr in ((self.rsa.q1, self.rsa.mul_q1, self.rsa.sqr_q1),
+                            (self.rsa.q2, self.rsa.mul_q2, self.rsa.sqr_q2)):
+            # one block of a * b under x^3 - omega
+            zetas = self.rsa.zetas1 if q == self.rsa.q1 else self.rsa.zetas2
+            omega = zetas[(self.rsa.ntt_index[2] + 32) % 64]
+            a0, a1, a2, b0, b1, b2 = a[15:18] + b[15:18]
+            self.assertEqual(mul(a, b)[15:18],
+                             [(a0 * b0 + omega * (a2 * b1 + a1 * b2)) % q,
+                              (a1 * b0 + a0 * b1 + omega * (a2 * b2)) % q,
+                              (a2 * b0 + a1 * b1 + a0 * b2) % q])
+            self.assertEqual(sqr(a), mul(a, a))
+            # in place on the input
+            xs = a[:]
+            self.assertEqual(sqr(xs, xs), mul(a, a))
+            xs = a[:]
+            self.assertEqual(mul(xs, b, xs), mul(a, b))
+
+    def test_kernels(self):
+        xs = [random.randrange(12289) for _ in range(192)]
+        for kernel in ("fermat", "lazy", "merged"):
+            rsa = NttRsa1024_32b(kernel=kernel)
+            self.assertEqual(rsa.ntt_q1(xs), self.rsa.ntt_q1(xs))
+            self.assertEqual(rsa.intt_q1(xs), self.rsa.intt_q1(xs))
+            self.assertEqual(rsa.ntt_q2(xs), self.rsa.ntt_q2(xs))
+            self.assertEqual(rsa.intt_q2(xs), self.rsa.intt_q2(xs))
+
+    def test_karatsuba_kernel(self):
+        rsa = NttRsa1024_32b(kernel="karatsuba")
+        for q, mul in ((12289, "mul_q1"), (65537, "mul_q2")):
+            a = [random.randrange(q) for _ in range(192)]
+            b = [random.randrange(q) for _ in range(192)]
+            ref = getattr(self.rsa, mul)(a, b)
+            self.assertEqual(getattr(rsa, mul)(a, b), ref)
+            # in place on the first operand
+            self.assertEqual(getattr(rsa, mul)(a, b, a), ref)
+        p = random.getrandbits(1023) | 1
+        rsa.setp(p)
+        x, y = random.randrange(p), random.randrange(p)
+        self.assertEqual(rsa.multiply(x, y), x * y * pow(1 << 1024, -1, p) % p)
+        self.assertLess(rsa.stage_ops("basemul")["mul"],
+                        self.rsa.stage_ops("basemul")["mul"])
+
+    def test_out_buffers(self):
+        xs = [random.randrange(12289) for _ in range(192)]
+        ys = [random.randrange(12289) for _ in range(192)]
+        for kernel in ("reference", "fermat", "lazy", "merged"):
+            rsa = NttRsa1024_32b(kernel=kernel)
+            for f in (rsa.ntt_q1, rsa.intt_q1, rsa.ntt_q2, rsa.intt_q2):
+                out = [0] * 192
+                self.assertIs(f(xs, out), out)
+                self.assertEqual(out, f(xs))
+                # in place on the input
+                zs = xs[:]
+                self.assertEqual(f(zs, zs), out)
+            out = [0] * 192
+            self.assertIs(rsa.mul_q1(xs, ys, out), out)
+            self.assertEqual(out, rsa.mul_q1(xs, ys))
+
+    def test_scratch(self):
+        arenas = []
+        thread = threading.Thread(target=lambda: arenas.append(self.rsa.scratch()))
+        thread.start()
+        thread.join()
+        self.assertIs(self.rsa.scratch(), self.rsa.scratch())
+        self.assertIsNot(arenas[0], self.rsa.scratch())
+
+    def test_compact(self):
+        p = random.getrandbits(1023) | 1
+        a = random.getrandbits(1023) % p
+        b = random.getrandbits(1023) % p
+
+        self.rsa.setp(p)
+        bh = self.rsa.precompute(b)
+        compact = tuple(self.rsa.compact(h) for h in bh)
+        self.assertEqual(compact[0].itemsize, 4)
+        self.assertEqual(self.rsa.multiply_ntt(self.rsa.chunk(a), compact),
+                         self.rsa.multiply_ntt(self.rsa.chunk(a), bh))
+
+    def test_multiply(self):
+        p = random.getrandbits(1023) | 1
+        a = random.getrandbits(1023) % p
+        b = random.getrandbits(1023) % p
+
+        self.rsa.setp(p)
+        rinv = pow(1 << 1024, -1, p)
+        self.assertEqual(self.rsa.multiply(a, b), a * b * rinv % p)
+        self.assertEqual(self.rsa.square(a), a * a * rinv % p)
+
+    def test_expmod_public(self):
+        p = random.getrandbits(1023) | 1
+        a = random.getrandbits(1023) % p
+
+        self.rsa.setp(p)
+        self.assertEqual(self.rsa.expmod_public(a, 65537), pow(a, 65537, p))
+
+    def test_window_size(self):
+        # The table of a large window does not pay off for a short exponent
+        self.assertEqual(self.rsa.window_size(65537, sliding=True), 1)
+        self.assertGreaterEqual(self.rsa.window_size(random.getrandbits(1024)), 5)
+        self.assertGreaterEqual(
+            self.rsa.window_size(random.getrandbits(1024), sliding=True), 5)
+
+    def test_expmod_sliding(self):
+        p = random.getrandbits(1023) | 1
+        a = random.getrandbits(1023) % p
+
+        self.rsa.setp(p)
+        for e in (0, 1, 2, 3, 6, 65537, random.getrandbits(64)):
+            for window in (1, 3, 7):
+                stats = {}
+                self.assertEqual(self.rsa.expmod(a, e, window=window,
+                                                 sliding=True, stats=stats),
+                                 pow(a, e, p))
+                # no square is wasted on the initial R
+                if window == 1 and e > 0:
+                    self.assertEqual(stats["squares"], e.bit_length() - 1)
+
+    def test_expmod_fixed(self):
+        rsa = NttRsa1024_32b(kernel="lazy")
+        p = random.getrandbits(1023) | 1
+        a = random.getrandbits(1023) % p
+        d = random.getrandbits(1024)
+
+        rsa.setp(p)
+        stats = {}
+        self.assertEqual(rsa.expmod_private(a, d, window=5, stats=stats),
+                         pow(a, d, p))
+        # table of 2^5 entries, one multiply every 5 bits, one conversion
+        self.assertEqual(stats, {"window": 5, "sliding": False,
+                                 "squares": 1020, "multiplies": 31 + 204 + 1})
+
+    def test_multi_expmod_sliding(self):
+        p = random.getrandbits(1023) | 1
+        self.rsa.setp(p)
+        a, b, c = (random.getrandbits(1023) % p for _ in range(3))
+        for pairs in ([(a, 65537)], [(a, 0), (b, 0)], [(a, 5), (b, 0)],
+                      [(a, random.getrandbits(40)), (b, random.getrandbits(64)),
+                       (c, 65537)]):
+            gold = 1
+            for x, e in pairs:
+                gold = gold * pow(x, e, p) % p
+            stats = {}
+            self.assertEqual(self.rsa.multi_expmod(pairs, sliding=True,
+                                                   stats=stats), gold)
+            # one squaring chain, odd powers of 65537 need no table square
+            self.assertLess(stats["squares"],
+                            max(e.bit_length() for _, e in pairs) + len(pairs))
+
+    def test_multi_expmod_fixed(self):
+        rsa = NttRsa1024_32b(kernel="lazy")
+        p = random.getrandbits(1023) | 1
+        rsa.setp(p)
+        a, b = (random.getrandbits(1023) % p for _ in range(2))
+        x, y = random.getrandbits(1024), random.getrandbits(100)
+
+        stats = {}
+        self.assertEqual(rsa.multi_expmod([(a, x), (b, y)], stats=stats),
+                         pow(a, x, p) * pow(b, y, p) % p)
+        # joint table of 2^6 entries, one shared chain of 1023 squares
+        self.assertEqual(stats, {"window": 3, "sliding": False,
+                                 "squares": 1023, "multiplies": 63 + 341 + 1})
+        with self.assertRaises(ValueError):
+            rsa.multi_expmod([(a, x), (b, y)], window=4)
+
+    def test_decrypt_crt(self):
+        key = getkey(2048)
+        n, e, p, q = key["n"], key["e"], key["p"], key["q"]
+        d = pow(e, -1, (p - 1) * (q - 1))
+        m = random.randrange(n)
+        c = pow(m, e, n)
+
+        result = self.rsa.decrypt_crt(c, p, q, d % (p - 1), d % (q - 1),
+                                      pow(q, -1, p))
+        self.assertEqual(result, m)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 from rsa2048 import *
 import random
+from concurrent.futures import ThreadPoolExecutor
 
 
 class TestNttRsa2048_32b(unittest.TestCase):
@@ -121,6 +122,61 @@ class TestNttRsa2048_32b(unittest.TestCase):
         for i in range(384):
             self.assertEqual(c_schoolbook[i] % self.rsa.q2, c_ntt_result[i])
 
+    def test_fermat_kernel(self):
+        rsa = NttRsa2048_32b(kernel="fermat")
+        xs = [random.randrange(65537) for _ in range(384)]
+        self.assertEqual(rsa.ntt_q2(xs), self.rsa.ntt_q2(xs))
+        self.assertEqual(rsa.intt_q2(xs), self.rsa.intt_q2(xs))
+        # the first 5 rounds only use power of 2 twiddles
+        report = rsa.fermat_report()
+        self.assertEqual([g for _, _, g in report["ntt"]], [0, 0, 0, 0, 0, 16, 48])
+        self.assertEqual(report["intt"], report["ntt"][::-1])
+
+    def test_lazy_kernel(self):
+        rsa = NttRsa2048_32b(kernel="lazy")
+        rsa.check_bounds = True
+        for q, ntt, intt in [(12289, self.rsa.ntt_q1, self.rsa.intt_q1),
+                             (65537, self.rsa.ntt_q2, self.rsa.intt_q2)]:
+            xs = [random.randrange(q) for _ in range(384)]
+            lazy_ntt = rsa.ntt_q1 if q == 12289 else rsa.ntt_q2
+            lazy_intt = rsa.intt_q1 if q == 12289 else rsa.intt_q2
+            self.assertEqual(lazy_ntt(xs), ntt(xs))
+            self.assertEqual(lazy_intt(xs), intt(xs))
+
+    def test_lazy_kernel_reduce(self):
+        # products of 12289 fit 32 bits up to about 28q, the inverse
+        # doubles every round and has to reduce
+        q = 12289
+        rsa = NttRsa2048_32b(kernel="lazy")
+        rsa.check_bounds = True
+        ntt, intt = rsa.lazy_schedule[q]
+        self.assertFalse(any(ntt))
+        self.assertTrue(any(intt))
+        self.assertEqual(rsa.kernel_ops("intt", q)["mod"],
+                         rsa.kernel_ops("ntt", q)["mod"] + 384 * sum(intt))
+
+        xs = [random.randrange(q) for _ in range(384)]
+        self.assertEqual(rsa.ntt_lazy(xs[:], rsa.zetas1, q),
+                         self.rsa.ntt(xs[:], rsa.zetas1, q))
+        self.assertEqual(rsa.intt_lazy(xs[:], rsa.zetas1, q),
+                         self.rsa.intt(xs[:], rsa.zetas1, q))
+
+        # reduced products of 65537 overflow 32 bits, q2 runs the reference
+        self.assertNotIn(65537, rsa.lazy_schedule)
+        self.assertEqual(rsa.kernel_ops("ntt", 65537), self.rsa.kernel_ops("ntt", 65537))
+        with self.assertRaises(ValueError):
+            rsa.get_lazy_schedule((1 << 30) + 3)
+
+    def test_merged_kernel(self):
+        rsa = NttRsa2048_32b(kernel="merged")
+        self.assertEqual([(r, d) for r, d, _ in rsa.merged_schedule[12289][0]],
+                         [(4, 192), (4, 48), (4, 12), (2, 3)])
+        xs = [random.randrange(12289) for _ in range(384)]
+        self.assertEqual(rsa.ntt_q1(xs), self.rsa.ntt_q1(xs))
+        self.assertEqual(rsa.intt_q1(xs), self.rsa.intt_q1(xs))
+        self.assertEqual(rsa.ntt_q2(xs), self.rsa.ntt_q2(xs))
+        self.assertEqual(rsa.intt_q2(xs), self.rsa.intt_q2(xs))
+
     def test_square(self):
         # generate a random odd number as p
         p = random.getrandbits(2047) | 1
@@ -152,6 +208,82 @@ class TestNttRsa2048_32b(unittest.TestCase):
 
         self.assertEqual(product, gold)
 
+    def test_multiply_ntt(self):
+        p = random.getrandbits(2047) | 1
+        a = random.getrandbits(2047) % p
+        b = random.getrandbits(2047) % p
+
+        self.rsa.setp(p)
+        bh = self.rsa.precompute(b)
+        gold = (a * b * pow(1 << 2048, -1, p)) % p
+        product = self.rsa.multiply_ntt(self.rsa.chunk(a), bh)
+        self.assertEqual(self.rsa.dechunk(product), gold)
+
+    def test_square_n(self):
+        p = random.getrandbits(2047) | 1
+        while (a := random.getrandbits(2047)) > p:
+            pass
+
+        self.rsa.setp(p)
+        # square_n(a, k) = a^(2^k) * R^-(2^k - 1) mod p
+        k = 4
+        gold = pow(a, 1 << k, p) * pow(1 << 2048, -((1 << k) - 1), p) % p
+        self.assertEqual(self.rsa.square_n(a, k), gold)
+
+    def test_high_negative(self):
+        # t < lp gives negative result, p should be added back
+        p = random.getrandbits(2047) | 1
+        self.rsa.setp(p)
+        c = random.getrandbits(2000)
+        tl = self.rsa.chunk(1 << 2048)
+        lpl = self.rsa.chunk((c + 1) << 2048)
+        self.assertEqual(self.rsa.dechunk(self.rsa.high(tl, lpl)), p - c)
+
+    def test_square_batch(self):
+        p = random.getrandbits(2047) | 1
+        a_s = [random.getrandbits(2047) % p for _ in range(3)]
+
+        self.rsa.setp(p)
+        rinv = pow(1 << 2048, -1, p)
+        gold = [a * a * rinv % p for a in a_s]
+        self.assertEqual(self.rsa.square_batch(a_s), gold)
+
+    def test_multiply_batch(self):
+        p = random.getrandbits(2047) | 1
+        a_s = [random.getrandbits(2047) % p for _ in range(3)]
+        bs = [random.getrandbits(2047) % p for _ in range(3)]
+
+        self.rsa.setp(p)
+        rinv = pow(1 << 2048, -1, p)
+        gold = [a * b * rinv % p for a, b in zip(a_s, bs)]
+        self.assertEqual(self.rsa.multiply_batch(a_s, bs), gold)
+
+    def test_context_cache(self):
+        self.rsa.cache_size = 2
+        p1, p2, p3 = [random.getrandbits(2047) | 1 for _ in range(3)]
+        ctx1 = self.rsa.context(p1)
+        self.assertIs(self.rsa.context(p1), ctx1)
+        self.rsa.context(p2)
+        self.rsa.context(p3)  # evict p1
+        self.assertIsNot(self.rsa.context(p1), ctx1)
+        self.assertEqual(self.rsa.cache_hits, 1)
+        self.assertEqual(self.rsa.cache_misses, 4)
+        self.assertEqual(list(self.rsa.contexts), [p3, p1])
+
+    def test_multiply_context(self):
+        ps = [random.getrandbits(2047) | 1 for _ in range(2)]
+        jobs = [(ps[i % 2], random.getrandbits(2000), random.getrandbits(2000))
+                for i in range(4)]
+
+        def run(job):
+            p, a, b = job
+            return self.rsa.multiply(a, b, self.rsa.context(p))
+
+        with ThreadPoolExecutor(2) as pool:
+            products = list(pool.map(run, jobs))
+        for (p, a, b), product in zip(jobs, products):
+            self.assertEqual(product, a * b * pow(1 << 2048, -1, p) % p)
+
     def test_expmod_public(self):
         # generate a random odd number as p
         p = random.getrandbits(2047) | 1
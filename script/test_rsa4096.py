@@ -0,0 +1,58 @@
+import unittest
+from rsa3072 import NttRsa3072_32b
+from rsa4096 import NttRsa4096_32b
+import random
+
+
+class TestNttRsa4096_32b(unittest.TestCase):
+    def setUp(self):
+        self.rsa = NttRsa4096_32b()
+
+    def test_nttq1_x3(self):
+        xs = [1 if i == 3 else 0 for i in range(768)]
+        ys = self.rsa.ntt_q1(xs)
+        for i, p in enumerate(self.rsa.ntt_index):
+            self.assertEqual(ys[i*6], pow(233, p, 25601))
+            self.assertEqual(ys[i*6+3], pow(233, p+128, 25601))
+
+    def test_multiply_q1_q2(self):
+        a = [random.randrange(1 << 11) for _ in range(768)]
+        b = [random.randrange(1 << 11) for _ in range(768)]
+        # a * b modulo x^768 - 1 on a few coefficients
+        c1 = self.rsa.intt_q1(self.rsa.mul_q1(self.rsa.ntt_q1(a), self.rsa.ntt_q1(b)))
+        c2 = self.rsa.intt_q2(self.rsa.sqr_q2(self.rsa.ntt_q2(a)))
+        for k in (0, 1, 383, 767):
+            c = sum(a[i] * b[(k - i) % 768] for i in range(768))
+            self.assertEqual(c % self.rsa.q1, c1[k])
+            c = sum(a[i] * a[(k - i) % 768] for i in range(768))
+            self.assertEqual(c % self.rsa.q2, c2[k])
+
+    def test_kernels(self):
+        xs = [random.randrange(25601) for _ in range(768)]
+        for kernel in ("fermat", "lazy", "merged"):
+            rsa = NttRsa4096_32b(kernel=kernel)
+            self.assertEqual(rsa.ntt_q1(xs), self.rsa.ntt_q1(xs))
+            self.assertEqual(rsa.intt_q1(xs), self.rsa.intt_q1(xs))
+            self.assertEqual(rsa.ntt_q2(xs), self.rsa.ntt_q2(xs))
+            self.assertEqual(rsa.intt_q2(xs), self.rsa.intt_q2(xs))
+
+    def test_multiply(self):
+        for rsa in (self.rsa, NttRsa3072_32b(kernel="lazy")):
+            p = random.getrandbits(rsa.N) | 1 | (1 << (rsa.N - 1))
+            rsa.setp(p)
+            rinv = pow(1 << rsa.N, -1, p)
+            a = random.randrange(p)
+            b = random.randrange(p)
+            self.assertEqual(rsa.multiply(a, b), a * b * rinv % p)
+            self.assertEqual(rsa.square(a), a * a * rinv % p)
+
+    def test_expmod_public(self):
+        for rsa in (self.rsa, NttRsa3072_32b()):
+            p = random.getrandbits(rsa.N) | 1 | (1 << (rsa.N - 1))
+            rsa.setp(p)
+            a = random.randrange(p)
+            self.assertEqual(rsa.expmod_public(a, 65537), pow(a, 65537, p))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+import service
+from testkeys import getkey
+import random
+
+
+class TestService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        key = getkey(2048)
+        cls.key = {"n": key["n"], "e": key["e"]}
+
+    def test_percentile(self):
+        xs = list(range(1, 101))
+        self.assertEqual(service.percentile(xs, 50), 50)
+        self.assertEqual(service.percentile(xs, 99), 99)
+        self.assertEqual(service.percentile([3.0], 99), 3.0)
+
+    def test_verify(self):
+        async def scenario(path):
+            svc = service.SigningService({"main": self.key}, deadline=0.05)
+            server = await svc.start(unix=path)
+            reader, writer = await service.connect(unix=path)
+            n, e = self.key["n"], self.key["e"]
+            sigs = [random.randrange(n) for _ in range(4)]
+            # pipelined requests of the same key are batched
+            for i, s in enumerate(sigs):
+                data = pow(s, e, n) + (i == 3)
+                writer.write(json.dumps({"id": i, "op": "verify", "key": "main",
+                                         "data": format(data, "x"),
+                                         "signature": format(s, "x")}).encode() + b"\n")
+            writer.write(b'{"id": 9, "op": "verify", "key": "none", "data": "1", "signature": "1"}\n')
+            await writer.drain()
+            responses = {}
+            for _ in range(5):
+                response = json.loads(await reader.readline())
+                responses[response["id"]] = response
+            writer.write(b'{"id": 10, "op": "metrics"}\n')
+            await writer.drain()
+            metrics = json.loads(await reader.readline())["metrics"]
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            await svc.close()
+            return responses, metrics
+
+        with tempfile.TemporaryDirectory() as tmp:
+            responses, metrics = asyncio.run(scenario(os.path.join(tmp, "sock")))
+        self.assertEqual([responses[i]["valid"] for i in range(4)],
+                         [True, True, True, False])
+        self.assertIn("Unknown key", responses[9]["error"])
+        self.assertEqual(metrics["requests"], 5)
+        self.assertEqual(metrics["errors"], 1)
+        self.assertGreater(metrics["batch_size_max"], 1)
+        self.assertEqual(metrics["queue_depth"], {"main/public": 0})
+
+    def test_malformed(self):
+        async def scenario():
+            svc = service.SigningService({"main": self.key})
+            responses = [
+                await svc.handle({"id": 1, "op": "verify", "key": "main",
+                                  "data": 5, "signature": "1"}),
+                await svc.handle([1, 2]),
+                await svc.handle({"id": 3, "op": "sign", "key": "main",
+                                  "data": "1"}),
+            ]
+            await svc.close()
+            return responses, svc.get_metrics()
+
+        responses, metrics = asyncio.run(scenario())
+        self.assertEqual([r["id"] for r in responses], [1, None, 3])
+        self.assertTrue(all("error" in r for r in responses))
+        self.assertEqual(metrics["errors"], 3)
+
+    def test_keys(self):
+        async def scenario():
+            # a key without e only signs, services do not share transformers
+            svc = service.SigningService({"k": {"n": 3233, "d": 2753}})
+            other = service.SigningService({"k": {"n": 3233, "e": 17}})
+            response = await svc.handle({"id": 2, "op": "verify", "key": "k",
+                                         "data": "41", "signature": "1"})
+            self.assertEqual(set(svc.transformers), {("k", "private")})
+            self.assertEqual(set(other.transformers), {("k", "public")})
+            await svc.close()
+            await other.close()
+            return response
+
+        self.assertIn("no public exponent", asyncio.run(scenario())["error"])
+
+    def test_workers(self):
+        async def scenario():
+            # batches of one request run on both workers at once
+            svc = service.SigningService({"k": {"n": 3233, "e": 17}},
+                                         workers=2, max_batch=1)
+            results = await asyncio.gather(
+                *(svc.submit("k", "public", x) for x in range(2, 8)))
+            await svc.close()
+            return results, svc.get_metrics()
+
+        results, metrics = asyncio.run(scenario())
+        self.assertEqual(results, [pow(x, 17, 3233) for x in range(2, 8)])
+        self.assertEqual(metrics["batches"], 6)
+        self.assertEqual(metrics["batches_running_max"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
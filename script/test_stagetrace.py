@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+import unittest
+from stagetrace import Tracer, StageStats, CallbackSink, TraceFileSink
+from rsa1024 import NttRsa1024_32b
+import random
+
+
+class TestStageTrace(unittest.TestCase):
+    def setUp(self):
+        self.rsa = NttRsa1024_32b()
+        self.p = random.getrandbits(1023) | 1
+        self.rsa.setp(self.p)
+
+    def test_stats_square(self):
+        self.rsa.tracer = Tracer()
+        a = random.getrandbits(1000) % self.p
+        self.assertEqual(self.rsa.square(a),
+                         a * a * pow(1 << 1024, -1, self.p) % self.p)
+
+        stats = self.rsa.tracer.sink
+        self.assertEqual(stats.operations["square"]["count"], 1)
+        self.assertEqual(stats.stages["ntt"]["count"], 3)
+        self.assertEqual(stats.stages["high"]["count"], 1)
+        self.assertEqual(stats.stages["chunk"]["count"], 1)
+        self.assertEqual(stats.stages["dechunk"]["count"], 1)
+        name, seconds, breakdown = stats.calls[0]
+        self.assertEqual(name, "square")
+        self.assertLessEqual(sum(breakdown.values()), seconds)
+
+    def test_stats_expmod(self):
+        stats = StageStats()
+        self.rsa.tracer = Tracer(stats)
+        a = random.getrandbits(1000) % self.p
+        self.assertEqual(self.rsa.expmod_public(a, 65537), pow(a, 65537, self.p))
+
+        # nested square and multiply are aggregated into one expmod_public call
+        self.assertEqual(len(stats.calls), 1)
+        name, _, breakdown = stats.calls[0]
+        self.assertEqual(name, "expmod_public")
+        self.assertEqual(set(breakdown),
+                         {"chunk", "dechunk", "ntt", "basemul", "basesqr", "intt",
+                          "crt", "lower", "high"})
+        self.assertEqual(stats.operations["square"]["count"], 16)
+
+    def test_stats_max_calls(self):
+        stats = StageStats(max_calls=2)
+        for i in range(5):
+            stats.record("operation", f"op{i}", 0.0, 1.0, 0)
+        self.assertEqual([name for name, _, _ in stats.calls], ["op3", "op4"])
+        self.assertEqual(stats.operations["op0"]["count"], 1)
+        stats.reset()
+        self.assertEqual(len(stats.calls), 0)
+        self.assertEqual(stats.calls.maxlen, 2)
+
+    def test_callback(self):
+        records = []
+        self.rsa.tracer = Tracer(CallbackSink(
+            lambda kind, name, start, end, depth: records.append((kind, name, depth))))
+        self.rsa.multiply(random.getrandbits(1000) % self.p,
+                          random.getrandbits(1000) % self.p)
+
+        self.assertEqual(records[0], ("stage", "chunk", 1))
+        self.assertEqual(records[-1], ("operation", "multiply", 0))
+        # stages outside of an operation are not recorded
+        records.clear()
+        self.rsa.chunk(1)
+        self.assertEqual(records, [])
+
+    def test_trace_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            self.rsa.tracer = Tracer(TraceFileSink(path))
+            self.rsa.square(random.getrandbits(1000) % self.p)
+            self.rsa.tracer.close()
+            with open(path) as f:
+                events = json.load(f)
+        self.assertEqual(events[-1]["name"], "square")
+        self.assertEqual(events[-1]["cat"], "operation")
+        self.assertTrue(all(e["ph"] == "X" and e["dur"] >= 0 for e in events))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+# Random RSA keys of the tests
+import random
+
+
+def getprime(bits: int) -> int:
+    """Random prime of exactly bits bits by Miller-Rabin"""
+    while True:
+        n = random.getrandbits(bits) | (1 << (bits - 1)) | 1
+        d, s = n - 1, 0
+        while d % 2 == 0:
+            d, s = d // 2, s + 1
+        for _ in range(20):
+            x = pow(random.randrange(2, n - 1), d, n)
+            if x in (1, n - 1):
+                continue
+            for _ in range(s - 1):
+                x = x * x % n
+                if x == n - 1:
+                    break
+            else:
+                break
+        else:
+            return n
+
+
+def getkey(bits: int = 2048, e: int = 65537) -> dict:
+    """Random key with a modulus of exactly bits bits
+    Output: {"n", "e", "p", "q"}, the key file format of bulk.py
+    """
+    while True:
+        p, q = getprime(bits // 2), getprime(bits // 2)
+        n = p * q
+        if p != q and n.bit_length() == bits and (p - 1) * (q - 1) % e:
+            return {"n": n, "e": e, "p": p, "q": q}